@@ -0,0 +1,296 @@
+"""Asyncio handlers for the appointment read routes and the dashboard.
+
+These three routes spend nearly all their time waiting on MySQL, so here
+they run on an event loop over an aiomysql pool: a worker keeps many of
+them in flight at once instead of one per thread. Queries come from
+queries.py, the same definitions the blocking handlers in server.py use,
+and the profile cache, dashboard snapshot, tokens and logging are shared
+with server.py as well.
+
+`dispatcher(app)` builds the ASGI app used by `serve.py --mode async`:
+these routes go to the Quart app below and everything else (writes,
+NDJSON streams) to the Flask app through asgiref's WSGI adapter.
+"""
+import asyncio
+import re
+import time
+from datetime import date, timedelta
+from functools import wraps
+
+import aiomysql
+from quart import Quart, Response, request, jsonify, g
+
+from queries import build_list_query, paginate, InvalidListParams, PROFILE_QUERIES, APPOINTMENT_QUERY, DASHBOARD_PARTS
+from serializers import FastJSONProvider, convert_rows
+from dashboard import summarize
+from tokens import TokenError
+from http_cache import VERSIONS_QUERY, COMPRESSIBLE_TYPES, validators, not_modified, choose_encoding, compress
+import server
+
+config = server.app.config
+
+async_app = Quart(__name__)
+async_app.json = FastJSONProvider(async_app)
+
+db_pool = None
+dashboard_refresh = asyncio.Lock()
+
+# Requests the dispatcher hands to this app
+ASYNC_ROUTES = [
+    re.compile(r'^/api/appointments$'),
+    re.compile(r'^/api/appointments/\d+$'),
+    re.compile(r'^/api/dashboard/stats$'),
+]
+
+
+@async_app.before_serving
+async def open_pool():
+    global db_pool
+    db_pool = await aiomysql.create_pool(
+        host=config['MYSQL_HOST'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        db=config['MYSQL_DB'],
+        charset='utf8mb4',
+        autocommit=True,
+        minsize=config['ASYNC_POOL_MIN_SIZE'],
+        maxsize=config['ASYNC_POOL_MAX_SIZE'],
+        pool_recycle=config['MYSQL_POOL_MAX_AGE']
+    )
+
+
+@async_app.after_serving
+async def close_pool():
+    db_pool.close()
+    await db_pool.wait_closed()
+
+
+async def fetch_all(query, params=(), convert=True):
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            start = time.perf_counter()
+            await cursor.execute(query, params)
+            g.db_queries = g.get('db_queries', 0) + 1
+            g.db_seconds = g.get('db_seconds', 0.0) + time.perf_counter() - start
+            rows = await cursor.fetchall()
+            return convert_rows(cursor, rows) if convert else list(rows)
+
+
+async def cache_call(method, *args):
+    # The Redis backend does network I/O; keep it off the event loop
+    if server.profile_cache.backend == 'redis':
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def load_profile(entity, entity_id):
+    key = f'{entity}:{entity_id}'
+    profile = await cache_call(server.profile_cache.get, key)
+    if profile is not None:
+        return profile
+
+    rows = await fetch_all(PROFILE_QUERIES[entity], (entity_id,))
+    profile = rows[0] if rows else None
+    if profile is not None:
+        await cache_call(server.profile_cache.set, key, profile)
+    return profile
+
+
+async def compute_dashboard_stats(today):
+    """Run the independent dashboard counts concurrently, one pooled connection each"""
+    day_range = (today, today + timedelta(days=1))
+    results = await asyncio.gather(*(fetch_all(query, day_range if ranged else (), convert=False)
+                                     for query, ranged in DASHBOARD_PARTS))
+    return summarize([row for rows in results for row in rows])
+
+
+async def load_table_versions():
+    versions = server.table_versions.peek()
+    if versions is None:
+        versions = server.table_versions.store(await fetch_all(VERSIONS_QUERY, convert=False))
+    return versions
+
+
+@async_app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@async_app.after_request
+async def record_request(response):
+    # Shares server.metrics, so /metrics reports both paths under the same endpoints
+    server.metrics.observe(request.endpoint, response.status_code, time.perf_counter() - g.request_started,
+                           response.content_length, g.get('db_queries', 0), g.get('db_seconds', 0.0))
+    return response
+
+
+@async_app.after_request
+async def compress_response(response):
+    """Same rules as server.compress_response; registered after record_request so it runs first"""
+    if (request.method != 'GET' or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < config['HTTP_COMPRESS_MIN_BYTES']:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    data = await response.get_data()
+    response.set_data(await asyncio.to_thread(compress, data, encoding, config['HTTP_GZIP_LEVEL'],
+                                              config['HTTP_BROTLI_QUALITY']))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def require_auth(*roles):
+    """Async counterpart of server.require_auth, sharing its token signer and settings"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if config['AUTH_ENFORCE'] and not config['AUTH_TOKEN_KEYS_CONFIGURED']:
+                return jsonify({'error': 'Authentication is not configured'}), 503
+            header = request.headers.get('Authorization', '')
+            g.auth = None
+            if header.startswith('Bearer '):
+                try:
+                    g.auth = server.token_signer.verify(header[7:])
+                except TokenError as e:
+                    if config['AUTH_ENFORCE']:
+                        return jsonify({'error': str(e)}), 401
+            if config['AUTH_ENFORCE']:
+                if g.auth is None:
+                    return jsonify({'error': 'Authentication required'}), 401
+                if roles and g.auth['role'] not in roles:
+                    return jsonify({'error': 'Forbidden'}), 403
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def conditional(*tables):
+    """Async counterpart of server.conditional"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if not config['HTTP_CONDITIONAL']:
+                return await view(*args, **kwargs)
+            try:
+                etag, last_modified = validators(await load_table_versions(), tables, request.full_path)
+            except (aiomysql.Error, KeyError) as e:
+                async_app.logger.warning(f"Table versions unavailable, serving without validators: {str(e)}")
+                return await view(*args, **kwargs)
+
+            if not_modified(request, etag, last_modified):
+                response = Response('', status=304)
+            else:
+                response = await async_app.make_response(await view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.vary.update(('Accept-Encoding', 'Authorization'))
+            return response
+        return wrapper
+    return decorator
+
+# ==================== APPOINTMENTS ====================
+
+@async_app.route('/api/appointments', methods=['GET'])
+@require_auth('admin', 'doctor')
+@conditional('appointments', 'patients', 'doctors')
+async def get_all_appointments():
+    try:
+        query, params, limit = build_list_query('appointments', request.args)
+        appointments, next_cursor = paginate('appointments', await fetch_all(query, params), limit)
+
+        server.log_operation('GET_ALL', 'APPOINTMENT', {'count': len(appointments)})
+        return jsonify({'appointments': appointments, 'next_cursor': next_cursor}), 200
+
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        async_app.logger.error(f"Get appointments error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@async_app.route('/api/appointments/<int:appointment_id>', methods=['GET'])
+@require_auth()
+async def get_appointment(appointment_id):
+    try:
+        rows = await fetch_all(APPOINTMENT_QUERY, (appointment_id,))
+        if not rows:
+            return jsonify({'error': 'Appointment not found'}), 404
+        appointment = rows[0]
+        if server.is_outsider(g.auth, appointment):
+            return jsonify({'error': 'Forbidden'}), 403
+
+        patient, doctor = await asyncio.gather(load_profile('patient', appointment['patient_id']),
+                                               load_profile('doctor', appointment['doctor_id']))
+        if not patient or not doctor:
+            return jsonify({'error': 'Appointment not found'}), 404
+
+        appointment['patient_name'] = patient['name']
+        appointment['doctor_name'] = doctor['name']
+        appointment['specialization'] = doctor['specialization']
+
+        server.log_operation('GET', 'APPOINTMENT', {'id': appointment_id})
+        return jsonify({'appointment': appointment}), 200
+
+    except Exception as e:
+        async_app.logger.error(f"Get appointment error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+# ==================== DASHBOARD STATISTICS ====================
+
+@async_app.route('/api/dashboard/stats', methods=['GET'])
+@require_auth('admin')
+async def get_dashboard_stats():
+    try:
+        # Same snapshot the sync write routes keep current; one refresh at a time per worker
+        stats = server.dashboard_counters.peek()
+        if stats is None:
+            async with dashboard_refresh:
+                stats = server.dashboard_counters.peek()
+                if stats is None:
+                    today = date.today()
+                    stats = server.dashboard_counters.store(today, await compute_dashboard_stats(today))
+
+        server.log_operation('GET_STATS', 'DASHBOARD', {
+            'total_patients': stats['total_patients'],
+            'total_doctors': stats['total_doctors'],
+            'total_admins': stats['total_admins'],
+            'today_appointments': stats['today_appointments'],
+            'total_appointments': stats['total_appointments']
+        })
+        return jsonify({'stats': stats}), 200
+
+    except Exception as e:
+        async_app.logger.error(f"Get stats error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+# ==================== DISPATCH ====================
+
+def _is_async_request(scope):
+    if scope['method'] not in ('GET', 'HEAD') or not any(route.match(scope['path']) for route in ASYNC_ROUTES):
+        return False
+    # NDJSON streams stay on the sync server-side cursor path
+    headers = dict(scope.get('headers') or ())
+    return b'stream=1' not in scope.get('query_string', b'') \
+        and b'application/x-ndjson' not in headers.get(b'accept', b'')
+
+
+def dispatcher(wsgi_app):
+    """ASGI app sending the async routes here and the rest to the Flask app"""
+    from asgiref.wsgi import WsgiToAsgi
+    fallback = WsgiToAsgi(wsgi_app)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan' or scope['type'] == 'http' and _is_async_request(scope):
+            await async_app(scope, receive, send)
+        else:
+            await fallback(scope, receive, send)
+    return app
@@ -0,0 +1,251 @@
+"""Queryable audit trail of every create, update and delete.
+
+Mutating routes call `AuditWriter.record(event)` after their commit. The
+event goes on a bounded in-memory queue and a background thread writes
+whatever has queued up to the append-only `audit_log` table (migration
+10), up to `batch_size` rows per INSERT, so the request never waits on
+the audit write.
+
+Nothing is dropped silently: when the queue is full (after waiting at
+most `enqueue_timeout`) or a batch still fails after `retries` attempts,
+the events are handed to `spill` (the JSON log) and counted. A batch
+the server refuses because of one bad event (data or integrity error)
+is written again one event at a time, so only that event is spilled,
+without retries. `close()`
+writes everything queued before it and stops the thread; server.py calls
+it at exit and serve.py from each worker's exit hook. The thread is
+started on first use in each process, so forked workers get their own.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, date, timezone, timedelta
+from decimal import Decimal
+
+import MySQLdb
+
+from scheduling import to_date, to_seconds
+from serializers import format_timedelta
+
+AUDIT_COLUMNS = ('occurred_at', 'actor_role', 'actor_id', 'actor_username', 'action', 'entity', 'entity_id',
+                 'changes', 'endpoint', 'remote_addr')
+
+AUDIT_INSERT = (f"INSERT INTO audit_log ({', '.join(AUDIT_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(AUDIT_COLUMNS))})")
+
+# Never copied into an audit record
+SECRET_FIELDS = {'password'}
+
+_STOP = object()
+
+# The server refused a row; retrying the same batch cannot help
+ROW_ERRORS = (MySQLdb.DataError, MySQLdb.IntegrityError)
+
+
+def jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return format_timedelta(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _time(value):
+    return timedelta(seconds=to_seconds(value))
+
+
+# Columns that a request sends as a string but a row holds as a date/TIME; both sides go
+# through these before comparing, so '10:00' and timedelta(hours=10) are the same value
+CONVERTERS = {
+    'appointment_date': to_date,
+    'appointment_time': _time,
+}
+
+
+def normalized(field, value):
+    convert = CONVERTERS.get(field)
+    if convert is not None and value is not None:
+        try:
+            value = convert(value)
+        except ValueError:
+            pass
+    return jsonable(value)
+
+
+def diff(old, new, fields):
+    """{field: [old, new]} for the fields whose value changed"""
+    changes = {}
+    for field in fields:
+        before, after = normalized(field, old.get(field)), normalized(field, new.get(field))
+        if field in SECRET_FIELDS:
+            before = after = '[changed]'
+        if before != after or field in SECRET_FIELDS:
+            changes[field] = [before, after]
+    return changes
+
+
+def created(row):
+    return {field: [None, normalized(field, value)] for field, value in row.items() if field not in SECRET_FIELDS}
+
+
+def deleted(row):
+    return {field: [normalized(field, value), None] for field, value in row.items() if field not in SECRET_FIELDS}
+
+
+def audit_event(action, entity, entity_id, changes, actor, endpoint=None, remote_addr=None):
+    """One audit_log row; `actor` is (role, id, username), all None when anonymous"""
+    role, actor_id, username = actor
+    return (datetime.now(timezone.utc).replace(tzinfo=None), role, actor_id, username, action, entity,
+            entity_id, json.dumps(changes, separators=(',', ':')), endpoint, remote_addr)
+
+
+class AuditWriter:
+    def __init__(self, connect, batch_size=500, max_queue=50000, enqueue_timeout=0.0, retries=3, spill=None):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self._spill = spill or (lambda event, reason: None)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.overflowed = 0
+        self.failed_batches = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.max_depth = 0
+        self.write_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._pid = os.getpid()
+            self._closed = False
+            self._thread.start()
+
+    def record(self, event):
+        if self._closed:
+            self._spill_events([event], 'writer closed')
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(event, block=self.enqueue_timeout > 0, timeout=self.enqueue_timeout or None)
+        except queue.Full:
+            with self._lock:
+                self.overflowed += 1
+            self._spill_events([event], 'queue full')
+            return
+        depth = self._queue.qsize()
+        with self._lock:
+            self.enqueued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def _spill_events(self, events, reason):
+        with self._lock:
+            self.spilled += len(events)
+        for event in events:
+            self._spill(dict(zip(AUDIT_COLUMNS, event)), reason)
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                stopping = True
+            if batch:
+                conn = self._write(conn, batch)
+        if conn is not None:
+            conn.close()
+
+    def _write(self, conn, batch):
+        for attempt in range(self.retries):
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.cursor().executemany(AUDIT_INSERT, batch)
+                conn.commit()
+            except ROW_ERRORS:
+                conn.rollback()
+                if len(batch) > 1:
+                    # Write the events one by one so only the bad one is spilled
+                    for event in batch:
+                        conn = self._write(conn, [event])
+                    return conn
+                with self._lock:
+                    self.rejected += 1
+                self._spill_events(batch, 'rejected')
+                return conn
+            except MySQLdb.Error:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except MySQLdb.Error:
+                        pass
+                conn = None
+                time.sleep(0.2 * (attempt + 1))
+                continue
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+                self.write_seconds += time.perf_counter() - start
+            return conn
+        with self._lock:
+            self.failed_batches += 1
+        self._spill_events(batch, 'write failed')
+        return None
+
+    def close(self, timeout=10.0):
+        """Write every queued event, then stop the thread; True if it finished within `timeout`"""
+        self._closed = True
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+                'max_queue': self.max_queue,
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'batches': self.batches,
+                'avg_batch_size': round(self.written / self.batches, 1) if self.batches else 0,
+                'avg_batch_ms': round(self.write_seconds / self.batches * 1000, 3) if self.batches else 0,
+                'overflowed': self.overflowed,
+                'failed_batches': self.failed_batches,
+                'rejected': self.rejected,
+                'spilled': self.spilled,
+            }
@@ -0,0 +1,67 @@
+"""Cost of recording an audit event on the request path: write-behind vs inline INSERT.
+
+Needs migration 10 applied to the database configured in server.py. Run
+from the repository root:
+
+    python benchmarks/bench_audit.py [events]
+
+"inline" inserts and commits each event the way a handler would without
+the writer; "queued" is AuditWriter.record, timed per call, followed by
+the time close() needs to drain the backlog. Both write real rows into
+audit_log (which cannot be deleted), tagged entity='bench'.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import AuditWriter, AUDIT_INSERT, audit_event
+
+
+def event(i):
+    return audit_event('UPDATE', 'bench', i, {'status': ['Scheduled', 'Completed']}, ('admin', 1, 'bench'),
+                       'bench', '127.0.0.1')
+
+
+def percentiles(latencies):
+    latencies.sort()
+    return (latencies[len(latencies) // 2] * 1000,
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000)
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    from server import connect_mysql
+    conn = connect_mysql()
+    cursor = conn.cursor()
+    latencies = []
+    try:
+        for i in range(events):
+            start = time.perf_counter()
+            cursor.execute(AUDIT_INSERT, event(i))
+            conn.commit()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+    p50, p99 = percentiles(latencies)
+    print(f'inline  p50 {p50:8.3f} ms   p99 {p99:8.3f} ms')
+
+    writer = AuditWriter(connect_mysql, max_queue=events)
+    latencies = []
+    for i in range(events):
+        start = time.perf_counter()
+        writer.record(event(i))
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    writer.close(timeout=300)
+    drain = time.perf_counter() - start
+    p50, p99 = percentiles(latencies)
+    stats = writer.stats()
+    print(f'queued  p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   drain {drain * 1000:.0f} ms '
+          f"({stats['batches']} batches, avg {stats['avg_batch_size']} rows, {stats['spilled']} spilled)")
+
+
+if __name__ == '__main__':
+    main()
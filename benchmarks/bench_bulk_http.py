@@ -0,0 +1,61 @@
+"""Single-row POST /api/patients vs POST /api/patients:batch against a running server.
+
+Start the API with a scratch database, then run from the repository root:
+
+    python benchmarks/bench_bulk_http.py [rows] [base_url]
+
+Every run creates 2 x rows patients with unique usernames.
+"""
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def patient(prefix, i):
+    return {
+        'name': f'Bench Patient {i}',
+        'username': f'{prefix}_{i}',
+        'password': 'secret',
+        'email': f'{prefix}_{i}@example.com',
+        'phone': '555-0100',
+        'address': '1 Bench Street',
+    }
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    base = sys.argv[2] if len(sys.argv) > 2 else 'http://localhost:5000/api'
+    prefix = 'bench_' + uuid.uuid4().hex[:8]
+
+    start = time.perf_counter()
+    for i in range(rows):
+        status, _ = post(f'{base}/patients', patient(prefix + 's', i))
+        assert status == 201, status
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    status, body = post(f'{base}/patients:batch', {'patients': [patient(prefix + 'b', i) for i in range(rows)]})
+    batch = time.perf_counter() - start
+    assert status == 200, (status, body.get('failed'))
+
+    print(f'{rows} patients')
+    print(f'  single-row POST : {single:8.2f} s  {rows / single:10.0f} rows/s')
+    print(f'  :batch POST     : {batch:8.2f} s  {rows / batch:10.0f} rows/s')
+    print(f'  speedup         : {single / batch:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Per-call latency of log_operation: synchronous file logging vs the queued pipeline.
+
+Run from the repository root:
+
+    python benchmarks/bench_logging.py [threads] [calls_per_thread]
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_pipeline import setup_logging, stop_listener, OperationSampler
+
+DATA = {'id': 42, 'username': 'dr.house', 'name': 'Gregory House', 'updated_fields': ['name', 'phone']}
+
+
+def legacy_setup(path):
+    """The previous basicConfig: FileHandler + StreamHandler, plus print() per call"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    for handler in (logging.FileHandler(path), logging.StreamHandler(open(os.devnull, 'w'))):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def legacy_log(logger, operation):
+    log_message = f"Operation: {operation} | User Type: DOCTOR | Data: {DATA}"
+    logger.info(log_message)
+    print(f"[{datetime.now()}] {log_message}")
+
+
+def make_pipeline_log(sampler):
+    def pipeline_log(logger, operation):
+        if not sampler.should_log(operation):
+            return
+        logger.info(f"Operation: {operation} | User Type: DOCTOR",
+                    extra={'operation': operation, 'user_type': 'DOCTOR', 'data': DATA})
+    return pipeline_log
+
+
+def run(log, threads, calls):
+    logger = logging.getLogger('bench')
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for i in range(calls):
+            operation = 'GET' if i % 4 else 'UPDATE'
+            start = time.perf_counter()
+            log(logger, operation)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[int(len(latencies) * 0.99)] * 1e6,
+        'calls_per_s': len(latencies) / elapsed,
+    }
+
+
+def report(name, result):
+    print(f"  {name:<28} p50 {result['p50_us']:8.1f} us   p99 {result['p99_us']:8.1f} us   "
+          f"{result['calls_per_s']:10.0f} calls/s")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    directory = tempfile.mkdtemp()
+    real_stdout = sys.stdout
+
+    print(f'{threads} threads x {calls} calls (75% reads)')
+
+    legacy_setup(os.path.join(directory, 'legacy.log'))
+    sys.stdout = open(os.devnull, 'w')
+    legacy = run(legacy_log, threads, calls)
+    sys.stdout = real_stdout
+    report('sync FileHandler + print', legacy)
+
+    _, listener = setup_logging(os.path.join(directory, 'queued.log'), console=False)
+    queued = run(make_pipeline_log(OperationSampler()), threads, calls)
+    report('queued, no sampling', queued)
+    sampled = run(make_pipeline_log(OperationSampler({'GET': 0.1})), threads, calls)
+    report('queued, GET sampled at 10%', sampled)
+    stop_listener(listener)
+
+    print(f"  p99 improvement: {legacy['p99_us'] / sampled['p99_us']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
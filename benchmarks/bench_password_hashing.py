@@ -0,0 +1,68 @@
+"""Login throughput (password verifications per second) at each hashing cost.
+
+Run from the repository root:
+
+    python benchmarks/bench_password_hashing.py [seconds_per_setting] [threads]
+
+Every setting is measured with the verified-login cache disabled, so each
+login pays for one full derivation, and with `threads` concurrent callers
+against a pool of one KDF thread per CPU.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher
+
+SETTINGS = [
+    ('sha256 (legacy)', None),
+    ('pbkdf2_sha256 i=100000', {'scheme': 'pbkdf2_sha256', 'pbkdf2_iterations': 100000}),
+    ('pbkdf2_sha256 i=600000', {'scheme': 'pbkdf2_sha256', 'pbkdf2_iterations': 600000}),
+    ('scrypt n=2^14', {'scheme': 'scrypt', 'scrypt_n': 2 ** 14}),
+    ('scrypt n=2^15', {'scheme': 'scrypt', 'scrypt_n': 2 ** 15}),
+    ('scrypt n=2^16', {'scheme': 'scrypt', 'scrypt_n': 2 ** 16}),
+]
+
+
+def run(verify, seconds, threads):
+    count = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(i):
+        while time.perf_counter() < deadline:
+            assert verify()
+            count[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(count) / (time.perf_counter() - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    cores = os.cpu_count() or 1
+    print(f'{cores} cores, {threads} concurrent logins, {seconds:.0f} s per setting')
+    print(f'  {"setting":24} {"logins/s":>10} {"per core":>10} {"ms/login":>10}')
+    for label, options in SETTINGS:
+        if options is None:
+            hasher = PasswordHasher(verified_cache_size=0)
+            encoded = hashlib.sha256(b'correct horse').hexdigest()
+        else:
+            hasher = PasswordHasher(verified_cache_size=0, max_pending=threads, **options)
+            encoded = hasher.hash('correct horse')
+        rate = run(lambda: hasher.verify('correct horse', encoded), seconds, threads)
+        hasher.close()
+        print(f'  {label:24} {rate:10.0f} {rate / cores:10.1f} {1000 * cores / rate:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Latency of the /search queries against the database configured in server.py.
+
+Needs migration 7 applied and a populated patients table (bulk_io.py
+imports a million rows in a few minutes). Run from the repository root:
+
+    python benchmarks/bench_search.py [iterations]
+
+Queries are sampled from existing rows: name and phone prefixes for the
+prefix pass, and name substrings, which the prefix pass misses, for the
+FULLTEXT fallback.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb.cursors
+
+from search import run_search
+from serializers import convert_rows
+
+
+def fetch_rows(cursor, query, params):
+    cursor.execute(query, params)
+    return convert_rows(cursor, cursor.fetchall())
+
+
+def sample_terms(cursor, entity, count):
+    cursor.execute(f'SELECT name, phone FROM {entity} ORDER BY RAND() LIMIT %s', (count,))
+    rows = cursor.fetchall()
+    return {
+        'name prefix': [row['name'][:4] for row in rows],
+        'phone prefix': [row['phone'][:5] for row in rows],
+        'substring': [row['name'][1:6] for row in rows if len(row['name']) > 6],
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    from server import connect_mysql
+    conn = connect_mysql()
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        for entity in ('patients', 'doctors'):
+            cursor.execute(f'SELECT COUNT(*) AS count FROM {entity}')
+            print(f"{entity}: {cursor.fetchone()['count']} rows")
+            for kind, terms in sample_terms(cursor, entity, iterations).items():
+                if not terms:
+                    continue
+                latencies = []
+                for term in terms:
+                    start = time.perf_counter()
+                    run_search(cursor, entity, {'q': term}, fetch_rows)
+                    latencies.append(time.perf_counter() - start)
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2] * 1000
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                print(f'  {kind:<13} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   ({len(terms)} queries)')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
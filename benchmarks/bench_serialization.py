@@ -0,0 +1,102 @@
+"""Micro-benchmark: old recursive serialize_data + json vs the compiled row encoder.
+
+Run from the repository root:
+
+    python benchmarks/bench_serialization.py [rows]
+"""
+import copy
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializers
+from serializers import convert_rows, dumps_bytes
+
+
+def serialize_data(data):
+    """The previous server.py implementation, kept here as the baseline"""
+    if isinstance(data, dict):
+        return {key: serialize_data(value) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [serialize_data(item) for item in data]
+    elif isinstance(data, datetime):
+        return data.isoformat()
+    elif isinstance(data, date):
+        return data.isoformat()
+    elif isinstance(data, time):
+        return data.strftime('%H:%M:%S')
+    elif isinstance(data, timedelta):
+        total_seconds = int(data.total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    else:
+        return data
+
+
+class FakeCursor:
+    """Just enough of a DB-API cursor to carry a column description"""
+    description = (
+        ('id', 3), ('patient_id', 3), ('doctor_id', 3),
+        ('appointment_date', serializers.FIELD_DATE),
+        ('appointment_time', serializers.FIELD_TIME),
+        ('symptoms', 253), ('status', 253),
+        ('created_at', serializers.FIELD_DATETIME),
+        ('fee', serializers.FIELD_NEWDECIMAL),
+        ('patient_name', 253), ('doctor_name', 253), ('specialization', 253),
+    )
+
+
+def make_rows(count):
+    return [{
+        'id': i,
+        'patient_id': i % 5000,
+        'doctor_id': i % 200,
+        'appointment_date': date(2025, 1, 1) + timedelta(days=i % 365),
+        'appointment_time': timedelta(hours=9, minutes=(i % 16) * 30),
+        'symptoms': 'Headache and mild fever',
+        'status': 'Scheduled',
+        'created_at': datetime(2025, 1, 1, 8, 30, 15),
+        'fee': Decimal('150.00'),
+        'patient_name': f'Patient {i}',
+        'doctor_name': f'Doctor {i % 200}',
+        'specialization': 'Cardiology',
+    } for i in range(count)]
+
+
+def legacy(rows):
+    return json.dumps({'appointments': [serialize_data(row) for row in rows]},
+                      default=str, sort_keys=True).encode()
+
+
+def compiled(rows):
+    return dumps_bytes({'appointments': convert_rows(FakeCursor, rows)})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rows = make_rows(count)
+    repeat = 5
+
+    # compiled() converts in place, so each run gets a fresh copy of the rows
+    copies = [copy.deepcopy(rows) for _ in range(repeat)]
+    assert json.loads(legacy(rows)) == json.loads(compiled(copy.deepcopy(rows)))
+
+    legacy_time = min(timeit.repeat(lambda: legacy(rows), number=1, repeat=repeat))
+    compiled_time = min(timeit.repeat(lambda: compiled(copies.pop()), number=1, repeat=repeat))
+
+    backend = 'orjson' if serializers.orjson is not None else 'json'
+    print(f'{count} rows, best of {repeat}')
+    print(f'  serialize_data + json : {legacy_time * 1000:8.2f} ms')
+    print(f'  row encoder + {backend:<8}: {compiled_time * 1000:8.2f} ms')
+    print(f'  speedup               : {legacy_time / compiled_time:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Throughput and p50/p99 latency of the API under each serving mode.
+
+Starts the server once per mode on a scratch port, drives the read routes
+with persistent (keep-alive) connections from concurrent client threads,
+then stops it. Needs the MySQL database from server.py with some data in it.
+Run from the repository root:
+
+    python benchmarks/bench_serving.py [seconds] [clients] [modes...] [--gzip] [--revalidate]
+
+Modes: dev (python server.py), prefork, async (python serve.py --mode ...).
+--gzip sends Accept-Encoding: gzip, br; --revalidate makes each client
+send If-None-Match with the last ETag it got for a route, as a browser
+re-fetching an unchanged screen would. Compare runs with and without
+them for the bandwidth (KB/req) and latency difference.
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 5055
+
+ROUTES = [
+    '/api/doctors?limit=50',
+    '/api/patients?limit=50',
+    '/api/appointments?limit=50',
+    '/api/doctors/1',
+    '/api/dashboard/stats',
+]
+
+COMMANDS = {
+    'dev': [sys.executable, '-c',
+            f'import server; server.app.run(host="127.0.0.1", port={PORT}, threaded=True)'],
+    'prefork': [sys.executable, 'serve.py', '--mode', 'prefork', '--bind', f'127.0.0.1:{PORT}'],
+    'async': [sys.executable, 'serve.py', '--mode', 'async', '--bind', f'127.0.0.1:{PORT}'],
+}
+
+
+def wait_ready(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            conn.request('GET', '/api/db/pool')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def client(deadline, results, headers, revalidate):
+    conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=10)
+    etags = {}
+    i = 0
+    while time.perf_counter() < deadline:
+        path = ROUTES[i % len(ROUTES)]
+        i += 1
+        request_headers = dict(headers)
+        if revalidate and path in etags:
+            request_headers['If-None-Match'] = etags[path]
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=request_headers)
+            response = conn.getresponse()
+            results['bytes'].append(len(response.read()))
+            if response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+            if response.status == 304:
+                results['not_modified'].append(path)
+            if response.status >= 500:
+                results['errors'].append(response.status)
+        except (OSError, http.client.HTTPException):
+            results['errors'].append('conn')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=10)
+            continue
+        results['latencies'].append(time.perf_counter() - start)
+    conn.close()
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def run_mode(mode, seconds, clients, headers, revalidate):
+    process = subprocess.Popen(COMMANDS[mode], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready()
+        results = {'latencies': [], 'errors': [], 'bytes': [], 'not_modified': []}
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(deadline, results, headers, revalidate))
+                   for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    latencies = sorted(results['latencies'])
+    if not latencies:
+        print(f'  {mode:8} no successful requests ({len(results["errors"])} errors)')
+        return
+    print(f'  {mode:8} {len(latencies) / elapsed:10.0f} {percentile(latencies, 0.5):9.2f} '
+          f'{percentile(latencies, 0.99):9.2f} {sum(results["bytes"]) / len(latencies) / 1024:8.2f} '
+          f'{len(results["not_modified"]) / len(latencies):6.0%} {len(results["errors"]):8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the API under each serving mode')
+    parser.add_argument('seconds', nargs='?', type=float, default=15)
+    parser.add_argument('clients', nargs='?', type=int, default=64)
+    parser.add_argument('modes', nargs='*', help=f'any of {", ".join(COMMANDS)} (default: all)')
+    parser.add_argument('--gzip', action='store_true', help='send Accept-Encoding: gzip, br')
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with the last ETag')
+    args = parser.parse_args()
+    unknown = set(args.modes) - set(COMMANDS)
+    if unknown:
+        parser.error(f'unknown mode: {", ".join(sorted(unknown))}')
+
+    headers = {'Accept-Encoding': 'gzip, br'} if args.gzip else {}
+    print(f'{args.clients} keep-alive clients, {args.seconds:.0f} s per mode, {len(ROUTES)} routes round-robin'
+          + (', compressed' if args.gzip else '') + (', revalidating' if args.revalidate else ''))
+    print(f'  {"mode":8} {"req/s":>10} {"p50 ms":>9} {"p99 ms":>9} {"KB/req":>8} {"304":>6} {"errors":>8}')
+    for mode in args.modes or list(COMMANDS):
+        run_mode(mode, args.seconds, args.clients, headers, args.revalidate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Per-request cost of token verification vs decoding Flask's signed session cookie.
+
+Run from the repository root:
+
+    python benchmarks/bench_tokens.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from cache import LRUCache
+from tokens import TokenSigner
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    signer = TokenSigner({'old': 'previous key', 'new': 'current key'}, 'new', revoked=LRUCache(100000, 3660))
+    token, _ = signer.issue(42, 'dr.house', 'doctor')
+    old_signer = TokenSigner({'old': 'previous key'}, 'old')
+    old_token, _ = old_signer.issue(42, 'dr.house', 'doctor')
+
+    app = Flask(__name__)
+    app.secret_key = os.urandom(32)
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    cookie = serializer.dumps({'loggedin': True, 'id': 42, 'username': 'dr.house', 'user_type': 'doctor'})
+
+    print(f'{len(token)}-byte token, {len(cookie)}-byte session cookie, {iterations} iterations')
+    print(f'  issue token              : {timed(lambda: signer.issue(42, "dr.house", "doctor"), iterations):7.2f} us')
+    print(f'  verify token             : {timed(lambda: signer.verify(token), iterations):7.2f} us')
+    print(f'  verify previous key      : {timed(lambda: signer.verify(old_token), iterations):7.2f} us')
+    print(f'  decode session cookie    : {timed(lambda: serializer.loads(cookie), iterations):7.2f} us')
+
+
+if __name__ == '__main__':
+    main()
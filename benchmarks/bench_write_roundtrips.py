@@ -0,0 +1,106 @@
+"""Round-trips and latency of the update/delete handlers' SQL, before and after writes.py.
+
+Runs against the MySQL database configured in server.py (migrations 1-5
+applied). Each iteration is rolled back, so no data changes. Run from the
+repository root:
+
+    python benchmarks/bench_write_roundtrips.py [iterations]
+
+"check first" is the old handler pattern: SELECT the row (and COUNT its
+appointments before a delete), then write. "rowcount" is writes.py.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb.cursors
+
+from metrics import TimedConnection
+from writes import update_by_id, delete_account, write_appointment, is_referenced
+
+
+def old_update(cursor, doctor_id):
+    cursor.execute('SELECT * FROM doctors WHERE id = %s', (doctor_id,))
+    if cursor.fetchone():
+        cursor.execute('UPDATE doctors SET phone = %s WHERE id = %s', ('555-0199', doctor_id))
+
+
+def new_update(cursor, doctor_id):
+    update_by_id(cursor, 'doctors', doctor_id, {'phone': '555-0199'}, ['phone'])
+
+
+def old_delete(cursor, doctor_id):
+    cursor.execute('SELECT * FROM doctors WHERE id = %s', (doctor_id,))
+    if cursor.fetchone():
+        cursor.execute('SELECT COUNT(*) as count FROM appointments WHERE doctor_id = %s', (doctor_id,))
+        if not cursor.fetchone()['count']:
+            cursor.execute('DELETE FROM doctors WHERE id = %s', (doctor_id,))
+            cursor.execute('DELETE FROM users WHERE role = %s AND user_id = %s', ('doctor', doctor_id))
+
+
+def new_delete(cursor, doctor_id):
+    try:
+        delete_account(cursor, 'doctor', doctor_id)
+    except MySQLdb.IntegrityError as e:
+        if not is_referenced(e):
+            raise
+
+
+def old_appointment_update(cursor, appointment_id):
+    cursor.execute('SELECT * FROM appointments WHERE id = %s', (appointment_id,))
+    if cursor.fetchone():
+        cursor.execute('UPDATE appointments SET symptoms = %s WHERE id = %s', ('bench', appointment_id))
+
+
+def new_appointment_update(cursor, appointment_id):
+    write_appointment(cursor, appointment_id, 'UPDATE appointments SET symptoms = %s WHERE id = %s',
+                      ('bench', appointment_id))
+
+
+def measure(conn, fn, row_id, iterations):
+    counted = []
+    timed = TimedConnection(conn, lambda *args: counted.append(1))
+    cursor = timed.cursor(MySQLdb.cursors.DictCursor)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(cursor, row_id)
+        conn.rollback()
+    elapsed = time.perf_counter() - start
+    # rollback() is a round-trip in both variants and is left out of the count
+    return len(counted) / iterations, elapsed / iterations * 1000
+
+
+def first_id(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    from server import connect_mysql
+    conn = connect_mysql()
+    try:
+        doctor_id = first_id(conn, 'SELECT id FROM doctors ORDER BY id LIMIT 1')
+        appointment_id = first_id(conn, 'SELECT id FROM appointments ORDER BY id LIMIT 1')
+        print(f'{iterations} iterations, doctor {doctor_id}, appointment {appointment_id} (0 = none, measures the 404 path)')
+        cases = [
+            ('PUT /api/doctors/<id>', old_update, new_update, doctor_id),
+            ('DELETE /api/doctors/<id>', old_delete, new_delete, doctor_id),
+            ('PUT /api/appointments/<id>', old_appointment_update, new_appointment_update, appointment_id),
+        ]
+        for route, old, new, row_id in cases:
+            old_trips, old_ms = measure(conn, old, row_id, iterations)
+            new_trips, new_ms = measure(conn, new, row_id, iterations)
+            print(f'  {route:<28} check first: {old_trips:.1f} trips {old_ms:6.3f} ms'
+                  f'   rowcount: {new_trips:.1f} trips {new_ms:6.3f} ms')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""Batched, chunked writes behind the :batch endpoints.
+
+Each chunk is validated together, written with executemany (which
+MySQLdb turns into one multi-row INSERT) and committed as one
+transaction. If a chunk hits a constraint that the up-front checks could
+not see (another request took the username or slot in between), it is
+rolled back and replayed row by row so every item still gets its own
+result. Look-ups are per chunk too: one query for the usernames taken,
+one for the booked slots of every (doctor, day) in the chunk, and one
+SELECT ... FOR UPDATE for the appointments whose status changes.
+"""
+import re
+from contextlib import closing
+from datetime import datetime
+
+import MySQLdb
+import MySQLdb.cursors
+
+from identity import claim_username, claim_usernames, existing_usernames, is_duplicate
+from queries import booked_slots_query
+from scheduling import SlotError, to_minutes
+
+PATIENT_INSERT = '''INSERT INTO patients (name, username, password, email, phone, address, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)'''
+
+APPOINTMENT_INSERT = '''INSERT INTO appointments
+                        (patient_id, doctor_id, appointment_date, appointment_time, symptoms, status, created_at)
+                        VALUES (%s, %s, %s, %s, %s, 'Scheduled', %s)'''
+
+PATIENT_FIELDS = ['name', 'username', 'password', 'email', 'phone']
+APPOINTMENT_FIELDS = ['patient_id', 'doctor_id', 'appointment_date', 'appointment_time']
+
+
+class BatchError(ValueError):
+    """The batch request itself is malformed"""
+
+
+def batch_items(data, key, max_items):
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        raise BatchError(f'Expected a non-empty list in "{key}"')
+    if len(items) > max_items:
+        raise BatchError(f'At most {max_items} items per batch')
+    return items
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def created(index, row_id):
+    return {'index': index, 'status': 'created', 'id': row_id}
+
+
+def failed(index, error):
+    return {'index': index, 'status': 'error', 'error': error}
+
+
+def _missing_field(item, fields):
+    if not isinstance(item, dict):
+        return 'Item must be an object'
+    for field in fields:
+        if field not in item:
+            return f'Missing required field: {field}'
+    return None
+
+
+def _in_clause(values):
+    return ', '.join(['%s'] * len(values))
+
+
+# ---------- patients ----------
+
+def create_patients(conn, items, hash_passwords, chunk_size):
+    """Create patients; returns one result per item, in input order"""
+    results = [None] * len(items)
+    with closing(conn.cursor(MySQLdb.cursors.DictCursor)) as cursor:
+        pending = []
+        seen = set()
+
+        for index, item in enumerate(items):
+            error = _missing_field(item, PATIENT_FIELDS)
+            if not error and not re.match(r'[^@]+@[^@]+\.[^@]+', item['email']):
+                error = 'Invalid email address'
+            if not error and item['username'] in seen:
+                error = 'Duplicate username in batch'
+            if error:
+                results[index] = failed(index, error)
+                continue
+            seen.add(item['username'])
+            pending.append((index, item))
+
+        for chunk in chunked(pending, chunk_size):
+            taken = existing_usernames(cursor, [item['username'] for _, item in chunk])
+            rows = []
+            for index, item in chunk:
+                if item['username'] in taken:
+                    results[index] = failed(index, 'Username already exists')
+                else:
+                    rows.append((index, item))
+            if rows:
+                _insert_patients(conn, cursor, rows, results, hash_passwords)
+        return results
+
+
+def _insert_patients(conn, cursor, rows, results, hash_passwords):
+    now = datetime.now()
+    hashes = hash_passwords([item['password'] for _, item in rows])
+    values = [(item['name'], item['username'], hashed, item['email'], item['phone'], item.get('address', ''), now)
+              for (_, item), hashed in zip(rows, hashes)]
+    usernames = [item['username'] for _, item in rows]
+    try:
+        cursor.executemany(PATIENT_INSERT, values)
+        # Multi-row inserts need not get consecutive ids, so read them back by username
+        cursor.execute(f'SELECT id, username FROM patients WHERE username IN ({_in_clause(usernames)})', usernames)
+        ids = {row['username']: row['id'] for row in cursor.fetchall()}
+        claim_usernames(cursor, [(username, 'patient', ids[username]) for username in usernames])
+        conn.commit()
+    except MySQLdb.IntegrityError:
+        conn.rollback()
+        for (index, item), value in zip(rows, values):
+            try:
+                cursor.execute(PATIENT_INSERT, value)
+                patient_id = cursor.lastrowid
+                claim_username(cursor, item['username'], 'patient', patient_id)
+                conn.commit()
+                results[index] = created(index, patient_id)
+            except MySQLdb.IntegrityError as e:
+                conn.rollback()
+                results[index] = failed(index, 'Username already exists' if is_duplicate(e) else 'Constraint violation')
+        return
+    for index, item in rows:
+        results[index] = created(index, ids[item['username']])
+
+
+# ---------- appointments ----------
+
+def create_appointments(conn, items, slot_index, chunk_size):
+    """Create appointments; returns (results, created rows) with rows as inserted, plus their id"""
+    results = [None] * len(items)
+    with closing(conn.cursor(MySQLdb.cursors.DictCursor)) as cursor:
+        pending = []
+        seen = set()
+
+        for index, item in enumerate(items):
+            error = _missing_field(item, APPOINTMENT_FIELDS)
+            if not error:
+                try:
+                    row = {
+                        'patient_id': int(item['patient_id']),
+                        'doctor_id': int(item['doctor_id']),
+                        'appointment_date': slot_index.check_day(item['appointment_date']),
+                        'appointment_time': item['appointment_time'],
+                        'symptoms': item.get('symptoms', ''),
+                        'status': 'Scheduled',
+                    }
+                    slot = (row['doctor_id'], row['appointment_date'], slot_index.slot_of(row['appointment_time']))
+                except SlotError as e:
+                    error = str(e)
+                except (TypeError, ValueError):
+                    error = 'patient_id and doctor_id must be integers'
+            if not error and slot in seen:
+                error = 'Duplicate slot in batch'
+            if error:
+                results[index] = failed(index, error)
+                continue
+            seen.add(slot)
+            pending.append((index, row))
+
+        inserted = []
+        for chunk in chunked(pending, chunk_size):
+            _load_booked_days(cursor, slot_index, [(row['doctor_id'], row['appointment_date']) for _, row in chunk])
+            rows = []
+            for index, row in chunk:
+                if slot_index.is_booked(row['doctor_id'], row['appointment_date'], row['appointment_time']):
+                    results[index] = failed(index, 'Doctor already has an appointment in this slot')
+                else:
+                    rows.append((index, row))
+            if rows:
+                _insert_appointments(conn, cursor, rows, results, inserted)
+        return results, inserted
+
+
+def _load_booked_days(cursor, slot_index, days):
+    """Read the booked slots of every (doctor_id, day) the slot index lacks in one query"""
+    missing = slot_index.unloaded(days)
+    if not missing:
+        return
+    cursor.execute(booked_slots_query(len(missing)), [value for key in missing for value in key])
+    booked = {key: [] for key in missing}
+    for row in cursor.fetchall():
+        booked[(row['doctor_id'], row['appointment_date'])].append(row['booked_time'])
+    slot_index.prime(booked)
+
+
+def _slot_key(doctor_id, appointment_date, appointment_time):
+    return (int(doctor_id), str(appointment_date)[:10], to_minutes(appointment_time))
+
+
+def _insert_appointments(conn, cursor, rows, results, inserted):
+    now = datetime.now()
+    values = [(row['patient_id'], row['doctor_id'], row['appointment_date'], row['appointment_time'],
+               row['symptoms'], now) for _, row in rows]
+    try:
+        cursor.executemany(APPOINTMENT_INSERT, values)
+        # Read the ids back through the unique (doctor_id, appointment_date, booked_time) key
+        keys = [(row['doctor_id'], row['appointment_date'], row['appointment_time']) for _, row in rows]
+        cursor.execute(f'''SELECT id, doctor_id, appointment_date, appointment_time FROM appointments
+                           WHERE (doctor_id, appointment_date, booked_time) IN
+                           ({', '.join(['(%s, %s, %s)'] * len(keys))})''',
+                       [value for key in keys for value in key])
+        ids = {_slot_key(r['doctor_id'], r['appointment_date'], r['appointment_time']): r['id']
+               for r in cursor.fetchall()}
+        conn.commit()
+    except MySQLdb.IntegrityError:
+        conn.rollback()
+        for (index, row), value in zip(rows, values):
+            try:
+                cursor.execute(APPOINTMENT_INSERT, value)
+                conn.commit()
+                results[index] = created(index, cursor.lastrowid)
+                inserted.append(dict(row, id=cursor.lastrowid))
+            except MySQLdb.IntegrityError as e:
+                conn.rollback()
+                results[index] = failed(index, 'Doctor already has an appointment in this slot'
+                                        if is_duplicate(e) else 'Unknown patient or doctor')
+        return
+    for index, row in rows:
+        row_id = ids[_slot_key(row['doctor_id'], row['appointment_date'], row['appointment_time'])]
+        results[index] = created(index, row_id)
+        inserted.append(dict(row, id=row_id))
+
+
+# ---------- appointment status ----------
+
+def update_appointment_statuses(conn, updates, chunk_size, doctor_id=None):
+    """Apply {'id', 'status'} updates; returns (results, [(old row, new status)]).
+
+    With `doctor_id`, appointments of other doctors fail with 'Forbidden'.
+    """
+    results = [None] * len(updates)
+    with closing(conn.cursor(MySQLdb.cursors.DictCursor)) as cursor:
+        pending = []
+        seen = set()
+
+        for index, item in enumerate(updates):
+            error = _missing_field(item, ['id', 'status'])
+            if not error:
+                try:
+                    appointment_id = int(item['id'])
+                except (TypeError, ValueError):
+                    error = 'id must be an integer'
+            if not error and (not isinstance(item['status'], str) or not 0 < len(item['status']) <= 20):
+                error = 'status must be a string of 1-20 characters'
+            if not error and appointment_id in seen:
+                error = 'Duplicate id in batch'
+            if error:
+                results[index] = failed(index, error)
+                continue
+            seen.add(appointment_id)
+            pending.append((index, appointment_id, item['status']))
+
+        changes = []
+        for chunk in chunked(pending, chunk_size):
+            ids = [appointment_id for _, appointment_id, _ in chunk]
+            # Locked until the chunk commits, so the old rows handed back stay true
+            cursor.execute(f'''SELECT id, doctor_id, appointment_date, appointment_time, status
+                               FROM appointments WHERE id IN ({_in_clause(ids)}) FOR UPDATE''', ids)
+            current = {row['id']: row for row in cursor.fetchall()}
+
+            rows = []
+            for index, appointment_id, status in chunk:
+                if appointment_id not in current:
+                    results[index] = failed(index, 'Appointment not found')
+                elif doctor_id is not None and current[appointment_id]['doctor_id'] != doctor_id:
+                    results[index] = failed(index, 'Forbidden')
+                else:
+                    rows.append((index, current[appointment_id], status))
+            if rows:
+                _update_statuses(conn, cursor, rows, results, changes)
+        return results, changes
+
+
+def _update_statuses(conn, cursor, rows, results, changes):
+    by_status = {}
+    for _, old, status in rows:
+        by_status.setdefault(status, []).append(old['id'])
+    try:
+        for status, ids in by_status.items():
+            cursor.execute(f'UPDATE appointments SET status = %s WHERE id IN ({_in_clause(ids)})', [status] + ids)
+        conn.commit()
+    except MySQLdb.IntegrityError:
+        # Un-cancelling into a slot that has been re-booked since
+        conn.rollback()
+        for index, old, status in rows:
+            try:
+                cursor.execute('UPDATE appointments SET status = %s WHERE id = %s', (status, old['id']))
+                conn.commit()
+                results[index] = {'index': index, 'status': 'updated', 'id': old['id']}
+                changes.append((old, status))
+            except MySQLdb.IntegrityError:
+                conn.rollback()
+                results[index] = failed(index, 'Doctor already has an appointment in this slot')
+        return
+    for index, old, status in rows:
+        results[index] = {'index': index, 'status': 'updated', 'id': old['id']}
+        changes.append((old, status))
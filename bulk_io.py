@@ -0,0 +1,382 @@
+"""Offline CSV import/export for admins, doctors, patients and appointments.
+
+Usage (from the repository root, using the MySQL settings in server.py):
+
+    python bulk_io.py import patients patients.csv --workers 4
+    python bulk_io.py import patients patients.csv --resume      # continue after a crash
+    python bulk_io.py export appointments appointments.csv
+
+Imports stream the file in chunks; each chunk is one multi-row INSERT
+transaction run by one of `--workers` threads, each with its own
+connection. Completed chunks are recorded in a checkpoint file next to
+the CSV, so `--resume` skips them. Replaying a chunk that was committed
+just before a crash is harmless: ON DUPLICATE KEY UPDATE id = id leaves
+rows that hit a unique key (username, booked slot) as they are. Unlike
+INSERT IGNORE it does not coerce bad values or skip foreign key errors;
+a chunk that the server refuses is retried row by row, and the rows it
+still refuses are reported as REJECTED lines, as are rows that fail
+validation (missing fields; for appointments ids, date, slot grid and
+status). Rows whose username belongs to another role are skipped and
+reported as CONFLICT lines. Passwords are hashed with
+server.hash_passwords unless `--prehashed` is given. Exports stream from
+an unbuffered server-side cursor, so memory stays flat.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import MySQLdb.cursors
+
+from scheduling import APPOINTMENT_STATUSES, SlotError, SlotIndex, to_date
+
+ENTITIES = {
+    'admins': {
+        'role': 'admin',
+        'columns': ['name', 'username', 'password', 'email', 'phone', 'created_at'],
+        'required': ['name', 'username', 'password', 'email', 'phone'],
+        'defaults': {},
+        'export': ['id', 'name', 'username', 'email', 'phone', 'created_at'],
+    },
+    'doctors': {
+        'role': 'doctor',
+        'columns': ['name', 'username', 'password', 'email', 'phone', 'specialization', 'created_at'],
+        'required': ['name', 'username', 'password', 'email', 'phone'],
+        'defaults': {'specialization': 'General'},
+        'export': ['id', 'name', 'username', 'email', 'phone', 'specialization', 'created_at'],
+    },
+    'patients': {
+        'role': 'patient',
+        'columns': ['name', 'username', 'password', 'email', 'phone', 'address', 'created_at'],
+        'required': ['name', 'username', 'password', 'email', 'phone'],
+        'defaults': {'address': ''},
+        'export': ['id', 'name', 'username', 'email', 'phone', 'address', 'created_at'],
+    },
+    'appointments': {
+        'role': None,
+        'columns': ['patient_id', 'doctor_id', 'appointment_date', 'appointment_time', 'symptoms', 'status',
+                    'created_at'],
+        'required': ['patient_id', 'doctor_id', 'appointment_date', 'appointment_time'],
+        'defaults': {'symptoms': '', 'status': 'Scheduled'},
+        'validate': 'appointment',
+        'export': ['id', 'patient_id', 'doctor_id', 'appointment_date', 'appointment_time', 'symptoms', 'status',
+                   'created_at'],
+    },
+}
+
+
+class Progress:
+    """Thread-safe counters printed to stderr at most every `interval` seconds"""
+
+    def __init__(self, label, interval=2.0):
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.written = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def add(self, rows, written=0, skipped=0, conflicts=(), rejected=()):
+        with self._lock:
+            self.rows += rows
+            self.written += written
+            self.skipped += skipped
+            for username in conflicts:
+                print(f'CONFLICT  username {username!r} already belongs to another account', file=sys.stderr)
+            for line, reason in rejected:
+                print(f'REJECTED  line {line}: {reason}', file=sys.stderr)
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                self._print(now)
+
+    def _print(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        print(f'{self.label}: {self.rows} rows, {self.written} written, {self.skipped} skipped/invalid, '
+              f'{self.rows / elapsed:.0f} rows/s', file=sys.stderr)
+
+    def finish(self):
+        with self._lock:
+            self._print(time.monotonic())
+
+
+class Checkpoint:
+    """Completed chunk numbers for one (file, entity, chunk size), persisted as JSON"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('key') != self.key:
+            raise SystemExit(f'Checkpoint {self.path} belongs to a different file or chunk size')
+        self.done = set(state['done'])
+
+    def mark(self, chunk_no):
+        with self._lock:
+            self.done.add(chunk_no)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'key': self.key, 'done': sorted(self.done)}, f)
+            os.replace(tmp, self.path)
+
+
+def read_chunks(path, chunk_size):
+    """Yield (chunk number, rows) without holding more than one chunk in memory"""
+    with open(path, newline='', encoding='utf-8') as f:
+        chunk = []
+        chunk_no = 0
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk_no, chunk
+                chunk = []
+                chunk_no += 1
+        if chunk:
+            yield chunk_no, chunk
+
+
+def validate_appointment(record, slot_index):
+    """Normalize an appointment record in place; returns why it is invalid, or None"""
+    try:
+        record['patient_id'] = int(record['patient_id'])
+        record['doctor_id'] = int(record['doctor_id'])
+    except ValueError:
+        return 'patient_id and doctor_id must be integers'
+    try:
+        record['appointment_date'] = to_date(record['appointment_date'])
+        slot_index.slot_of(record['appointment_time'])
+    except SlotError as e:
+        return str(e)
+    if record['status'] not in APPOINTMENT_STATUSES:
+        return f"status must be one of {', '.join(APPOINTMENT_STATUSES)}"
+    return None
+
+
+def prepare_rows(spec, rows, hash_passwords, prehashed, slot_index=None, first_line=2):
+    """CSV dicts -> (value tuples in spec['columns'] order, their CSV line numbers, [(line, reason)] rejected)"""
+    now = datetime.now()
+    records = []
+    lines = []
+    rejected = []
+    for line, row in enumerate(rows, first_line):
+        missing = [field for field in spec['required'] if not row.get(field)]
+        if missing:
+            rejected.append((line, f'Missing required field: {missing[0]}'))
+            continue
+        record = dict(spec['defaults'])
+        record.update({key: value for key, value in row.items() if value not in (None, '')})
+        record.setdefault('created_at', now)
+        if spec.get('validate') == 'appointment':
+            error = validate_appointment(record, slot_index)
+            if error:
+                rejected.append((line, error))
+                continue
+        records.append(record)
+        lines.append(line)
+    if 'password' in spec['columns'] and not prehashed:
+        for record, hashed in zip(records, hash_passwords([record['password'] for record in records])):
+            record['password'] = hashed
+    return [tuple(record.get(column) for column in spec['columns']) for record in records], lines, rejected
+
+
+def claimed_elsewhere(cursor, role, usernames, locking=False):
+    """The subset of `usernames` that `users` assigns to a role other than `role`.
+
+    A locking read sees the latest commits instead of the transaction's snapshot.
+    """
+    if not usernames:
+        return set()
+    cursor.execute(f"SELECT username FROM users WHERE role <> %s AND username IN ({', '.join(['%s'] * len(usernames))})"
+                   + (' LOCK IN SHARE MODE' if locking else ''), [role] + usernames)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def insert_rows(cursor, sql, rows, lines):
+    """Run `sql` for every row, one statement per row if the server refuses the batch.
+
+    Returns (rows accepted, [(line, reason)] refused). A refused statement
+    is undone on its own, so the transaction carries on with the rest.
+    """
+    try:
+        cursor.executemany(sql, rows)
+        return len(rows), []
+    except (MySQLdb.DataError, MySQLdb.IntegrityError):
+        pass
+    accepted = 0
+    rejected = []
+    for row, line in zip(rows, lines):
+        try:
+            cursor.execute(sql, row)
+            accepted += 1
+        except (MySQLdb.DataError, MySQLdb.IntegrityError) as e:
+            rejected.append((line, e.args[-1]))
+    return accepted, rejected
+
+
+def import_chunk(conn, entity, spec, values, lines, attempts=3):
+    """Insert one chunk in one transaction.
+
+    Returns (rows accepted, usernames taken by another role, [(line,
+    reason)] refused by the server); rows already present from an earlier
+    run count as accepted. Rows whose username another role already holds
+    are left out, since their `users` entry could never be written and the
+    account could not log in. A username claimed concurrently between that
+    check and the commit makes the chunk roll back and start over.
+    """
+    cursor = conn.cursor()
+    columns = ', '.join(spec['columns'])
+    placeholders = ', '.join(['%s'] * len(spec['columns']))
+    insert = f'INSERT INTO {entity} ({columns}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE id = id'
+    try:
+        for _ in range(attempts):
+            conflicts = set()
+            rows, row_lines = values, lines
+            if spec['role']:
+                column = spec['columns'].index('username')
+                conflicts = claimed_elsewhere(cursor, spec['role'], [value[column] for value in values])
+                kept = [i for i, value in enumerate(values) if value[column] not in conflicts]
+                rows, row_lines = [values[i] for i in kept], [lines[i] for i in kept]
+            if not rows:
+                conn.commit()
+                return 0, conflicts, []
+            written, rejected = insert_rows(cursor, insert, rows, row_lines)
+            if spec['role']:
+                usernames = [value[column] for value in rows]
+                cursor.execute(f'''INSERT INTO users (username, role, user_id, created_at)
+                                   SELECT username, %s, id, created_at FROM {entity}
+                                   WHERE username IN ({', '.join(['%s'] * len(usernames))})
+                                   ON DUPLICATE KEY UPDATE username = username''',
+                               [spec['role']] + usernames)
+                if claimed_elsewhere(cursor, spec['role'], usernames, locking=True):
+                    conn.rollback()
+                    continue
+            conn.commit()
+            return written, conflicts, rejected
+        raise RuntimeError(f'{entity}: usernames kept being claimed while importing a chunk')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_import(connect, hash_passwords, entity, path, workers=4, chunk_size=5000, resume=False, prehashed=False,
+               slot_index=None):
+    spec = ENTITIES[entity]
+    # Only the slot grid is used; nothing is loaded
+    slot_index = slot_index or SlotIndex(lambda doctor_id, day: ())
+    checkpoint = Checkpoint(path + f'.{entity}.checkpoint',
+                            f'{os.path.abspath(path)}:{os.path.getsize(path)}:{entity}:{chunk_size}')
+    if resume:
+        checkpoint.load()
+    elif os.path.exists(checkpoint.path):
+        raise SystemExit(f'{checkpoint.path} exists; pass --resume or delete it')
+
+    progress = Progress(f'import {entity}')
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+    # At most two chunks queued per worker, so memory does not grow with the file
+    slots = threading.BoundedSemaphore(workers * 2)
+
+    def worker(chunk_no, rows):
+        try:
+            if not hasattr(local, 'conn'):
+                local.conn = connect()
+                with connections_lock:
+                    connections.append(local.conn)
+            values, lines, invalid = prepare_rows(spec, rows, hash_passwords, prehashed, slot_index,
+                                                  chunk_no * chunk_size + 2)
+            written, conflicts, refused = import_chunk(local.conn, entity, spec, values, lines) \
+                if values else (0, set(), [])
+            checkpoint.mark(chunk_no)
+            progress.add(len(rows), written, len(rows) - written, sorted(conflicts), invalid + refused)
+        finally:
+            slots.release()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_no, rows in read_chunks(path, chunk_size):
+            if chunk_no in checkpoint.done:
+                progress.add(len(rows))
+                continue
+            slots.acquire()
+            futures.append(pool.submit(worker, chunk_no, rows))
+            # Surface worker errors early and drop finished futures
+            for future in [future for future in futures if future.done()]:
+                future.result()
+                futures.remove(future)
+    for future in futures:
+        future.result()
+    for conn in connections:
+        conn.close()
+
+    progress.finish()
+    if os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    return progress
+
+
+def run_export(connect, entity, path):
+    spec = ENTITIES[entity]
+    progress = Progress(f'export {entity}')
+    conn = connect()
+    try:
+        cursor = conn.cursor(MySQLdb.cursors.SSCursor)
+        cursor.execute(f"SELECT {', '.join(spec['export'])} FROM {entity} ORDER BY id")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(spec['export'])
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                progress.add(len(rows), len(rows))
+        cursor.close()
+    finally:
+        conn.close()
+    progress.finish()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk CSV import/export for the hospital database')
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='load a CSV file into a table')
+    imp.add_argument('entity', choices=sorted(ENTITIES))
+    imp.add_argument('path')
+    imp.add_argument('--workers', type=int, default=4)
+    imp.add_argument('--chunk-size', type=int, default=5000)
+    imp.add_argument('--resume', action='store_true', help='skip chunks recorded in the checkpoint file')
+    imp.add_argument('--prehashed', action='store_true', help='the password column is already hashed')
+    exp = sub.add_parser('export', help='stream a table to a CSV file (passwords are never exported)')
+    exp.add_argument('entity', choices=sorted(ENTITIES))
+    exp.add_argument('path')
+    args = parser.parse_args(argv)
+
+    from server import connect_mysql, hash_passwords, slot_index
+    if args.command == 'import':
+        run_import(connect_mysql, hash_passwords, args.entity, args.path, args.workers, args.chunk_size,
+                   args.resume, args.prehashed, slot_index)
+    else:
+        run_export(connect_mysql, args.entity, args.path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
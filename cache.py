@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from serializers import dumps_bytes
+
+
+class LRUCache:
+    """Bounded in-process cache with least-recently-used eviction and a TTL"""
+
+    backend = 'local'
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached"""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items):
+        for key, value in items.items():
+            self.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+class RedisCache:
+    """Cache shared by every worker, stored in Redis (or anything speaking its API).
+
+    Hit/miss counters are per process; evictions come from the server's
+    own `evicted_keys` statistic.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, client, ttl=300, prefix='hms:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, dumps_bytes(value), ex=self.ttl)
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached, in one MGET"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        raws = self.client.mget([self.prefix + key for key in keys])
+        found = {key: json.loads(raw) for key, raw in zip(keys, raws) if raw is not None}
+        with self._lock:
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self.prefix + key, dumps_bytes(value), ex=self.ttl)
+        pipeline.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+        with self._lock:
+            self._invalidations += 1
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        try:
+            evictions = self.client.info('stats').get('evicted_keys', 0)
+        except Exception:
+            evictions = None
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+def create_cache(backend='local', maxsize=10000, ttl=300, redis_url=None):
+    if backend == 'local':
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if backend == 'redis':
+        import redis
+        return RedisCache(redis.Redis.from_url(redis_url), ttl=ttl)
+    raise ValueError(f'Unknown cache backend: {backend}')
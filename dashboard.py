@@ -0,0 +1,133 @@
+import copy
+import threading
+import time
+from datetime import date
+
+TOTALS = {
+    'patients': 'total_patients',
+    'doctors': 'total_doctors',
+    'admins': 'total_admins',
+    'appointments': 'total_appointments',
+}
+
+
+def summarize(rows):
+    """Fold the (metric, label, specialization, count) rows of DASHBOARD_QUERY into stats"""
+    stats = {
+        'total_patients': 0,
+        'total_doctors': 0,
+        'total_admins': 0,
+        'today_appointments': 0,
+        'total_appointments': 0,
+        'appointments_by_status': {},
+        'today_by_doctor': {},
+        'today_by_specialization': {},
+    }
+    for row in rows:
+        metric = row['metric']
+        count = int(row['count'])
+        if metric in TOTALS:
+            stats[TOTALS[metric]] = count
+        elif metric == 'status':
+            stats['appointments_by_status'][row['label']] = count
+        elif metric == 'today':
+            stats['today_appointments'] += count
+            doctor_key = str(int(row['label']))
+            stats['today_by_doctor'][doctor_key] = stats['today_by_doctor'].get(doctor_key, 0) + count
+            specialization = row['specialization'] or 'Unknown'
+            by_spec = stats['today_by_specialization']
+            by_spec[specialization] = by_spec.get(specialization, 0) + count
+    return stats
+
+
+def _bump(counts, key, delta):
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+class DashboardCounters:
+    """Cached dashboard snapshot, kept current by incremental updates.
+
+    `compute(today)` is the expensive query. It runs at most once per
+    `ttl` seconds (or when the day rolls over); concurrent pollers that
+    find the snapshot stale wait for the single in-flight computation
+    instead of each running their own. Between refreshes the write routes
+    adjust the snapshot in place, so the numbers stay exact for this
+    process and are reconciled with the database on the next refresh.
+    """
+
+    def __init__(self, compute, ttl=30):
+        self._compute = compute
+        self.ttl = ttl
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._day = None
+        self._expires_at = 0.0
+        self.refreshes = 0
+
+    def _fresh(self):
+        return (self._snapshot is not None
+                and self._day == date.today()
+                and time.monotonic() < self._expires_at)
+
+    def get(self):
+        with self._lock:
+            if self._fresh():
+                return copy.deepcopy(self._snapshot)
+
+        with self._refresh_lock:
+            with self._lock:
+                if self._fresh():
+                    return copy.deepcopy(self._snapshot)
+            today = date.today()
+            return self.store(today, self._compute(today))
+
+    def peek(self):
+        """A copy of the snapshot while it is fresh, else None"""
+        with self._lock:
+            return copy.deepcopy(self._snapshot) if self._fresh() else None
+
+    def store(self, today, snapshot):
+        """Install a freshly computed snapshot; also used by the async dashboard route"""
+        with self._lock:
+            self._snapshot = snapshot
+            self._day = today
+            self._expires_at = time.monotonic() + self.ttl
+            self.refreshes += 1
+            return copy.deepcopy(snapshot)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def entity_changed(self, table, delta):
+        """A patient, doctor or admin row was created (+1) or deleted (-1)"""
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot[TOTALS[table]] += delta
+
+    def appointment_changed(self, old=None, new=None):
+        """Move one appointment's contribution from `old` to `new`.
+
+        Each side is a dict with doctor_id, appointment_date, status and
+        specialization; pass only `new` for a create and only `old` for a
+        delete.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            today = self._day.isoformat()
+            for row, delta in ((old, -1), (new, 1)):
+                if row is None:
+                    continue
+                snapshot['total_appointments'] += delta
+                _bump(snapshot['appointments_by_status'], row['status'], delta)
+                if str(row['appointment_date'])[:10] == today:
+                    snapshot['today_appointments'] += delta
+                    _bump(snapshot['today_by_doctor'], str(row['doctor_id']), delta)
+                    _bump(snapshot['today_by_specialization'], row.get('specialization') or 'Unknown', delta)
@@ -0,0 +1,296 @@
+import threading
+import time
+from collections import deque
+
+
+# UnitOfWork modes
+READ_WRITE = 'READ WRITE'
+READ_ONLY = 'READ ONLY'
+AUTOCOMMIT = 'AUTOCOMMIT'
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+def default_ping(conn):
+    """Liveness check run on every borrow"""
+    if hasattr(conn, 'ping'):
+        conn.ping()
+    else:
+        # DB-API drivers without ping(), e.g. sqlite3 in local testing
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections.
+
+    `connect` is any zero-argument callable returning a new connection, so
+    the pool works with MySQLdb in production and sqlite3 as a stand-in.
+    Connections are opened lazily (the first checkout fills the pool up to
+    `min_size`), pinged on borrow, recycled once older than `max_age`
+    seconds and rolled back before they go back on the idle stack.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, max_age=3600, ping=default_ping):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self._connect = connect
+        self._ping = ping
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._warmed = False
+
+        self._in_use = 0
+        self._checkouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._broken = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self._created += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+        _close_quietly(conn)
+
+    def _expired(self, conn):
+        born = self._born.get(id(conn))
+        return born is None or time.monotonic() - born > self.max_age
+
+    def _warm(self):
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        opened = 0
+        try:
+            for _ in range(missing):
+                conn = self._open()
+                with self._cond:
+                    self._idle.append(conn)
+                    self._cond.notify()
+                opened += 1
+        finally:
+            if opened < missing:
+                with self._cond:
+                    self._size -= missing - opened
+                    self._cond.notify_all()
+
+    def _replace(self, conn):
+        """Swap a stale or dead connection for a fresh one of the same slot"""
+        self._discard(conn)
+        try:
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def acquire(self):
+        if not self._warmed:
+            self._warm()
+
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO keeps the most recently used (warmest) connections busy
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        elif self._expired(conn):
+            with self._cond:
+                self._recycled += 1
+            conn = self._replace(conn)
+        else:
+            try:
+                self._ping(conn)
+            except Exception:
+                with self._cond:
+                    self._broken += 1
+                conn = self._replace(conn)
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        return conn
+
+    def release(self, conn, discard=False, rollback=True):
+        """Return a connection; any open transaction is rolled back first.
+
+        rollback=False skips that round-trip for a connection whose last
+        unit of work already ended with a COMMIT or ROLLBACK.
+        """
+        if not discard and rollback:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        recycle = not discard and self._expired(conn)
+        if discard or recycle:
+            self._discard(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or recycle:
+                self._size -= 1
+                if recycle:
+                    self._recycled += 1
+                else:
+                    self._broken += 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on release"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._warmed = False
+        for conn in idle:
+            self._discard(conn)
+
+    def after_fork(self, max_size=None):
+        """Forget connections inherited from a parent process without closing them.
+
+        Closing would end the parent's sessions on the shared sockets; the
+        child opens its own connections on first use. `max_size` gives the
+        child a different (usually smaller) share of the server's connections.
+        """
+        if max_size is not None:
+            if max_size < 1:
+                raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+            self.max_size = max_size
+            self.min_size = min(self.min_size, max_size)
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}
+        self._size = 0
+        self._in_use = 0
+        self._warmed = False
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'broken': self._broken,
+                'timeouts': self._timeouts,
+                'wait_total_ms': round(self._wait_total * 1000, 3),
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+class UnitOfWork:
+    """One handler's transaction on a checked-out connection.
+
+    READ_WRITE starts implicitly with the first statement (connections run
+    with autocommit off); READ_ONLY sends START TRANSACTION READ ONLY, so
+    InnoDB allocates no transaction id or undo segment for it and refuses
+    writes. Both end with the COMMIT or ROLLBACK chosen by end().
+    AUTOCOMMIT makes every statement its own transaction, for reads of a
+    single statement that need no snapshot and no COMMIT. The session's
+    autocommit flag is only switched when the mode needs the other value,
+    so consecutive requests of one kind on a connection pay for it once.
+    """
+
+    def __init__(self, mode=READ_WRITE):
+        if mode not in (READ_WRITE, READ_ONLY, AUTOCOMMIT):
+            raise ValueError(f'Unknown transaction mode: {mode}')
+        self.conn = None
+        self.mode = mode
+        self.started = None
+        self.outcome = None
+
+    @property
+    def active(self):
+        return self.started is not None and self.outcome is None
+
+    def begin(self, conn):
+        self.conn = conn
+        autocommit = self.mode == AUTOCOMMIT
+        if self.conn.get_autocommit() != autocommit:
+            self.conn.autocommit(autocommit)
+        self.started = time.perf_counter()
+        if self.mode == READ_ONLY:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute('START TRANSACTION READ ONLY')
+            finally:
+                cursor.close()
+
+    def end(self, success):
+        """COMMIT when `success`, else ROLLBACK; returns the seconds since begin()"""
+        if self.mode == AUTOCOMMIT:
+            self.outcome = 'autocommit'
+        elif success:
+            self.outcome = 'commit'
+            try:
+                self.conn.commit()
+            except Exception:
+                self.outcome = 'rollback'
+                self.conn.rollback()
+                raise
+        else:
+            self.outcome = 'rollback'
+            self.conn.rollback()
+        return time.perf_counter() - self.started
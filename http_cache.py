@@ -0,0 +1,136 @@
+"""Conditional GETs and response compression for the read routes.
+
+Validators come from `table_version_shards` (migration 11): each table
+has 64 counter rows, and triggers on every insert, update and delete
+bump the row of the writing connection (CONNECTION_ID() modulo the
+shard count), so every write path (handlers, batch routes, bulk_io.py)
+moves it. A table's version is the sum of its shards: counters only
+grow, so the sum changes with every committed write, while concurrent
+transactions no longer queue on a single row per table (migration 6's
+table_versions) until they commit. A route's ETag is a hash of the
+request path and query string with the versions of the tables it reads;
+Last-Modified is the newest of their `updated_at`. Both are known after
+one read of a small table, so a matching If-None-Match is answered with
+304 before the route's own query runs.
+
+The versions are read before the route's query, so a write landing in
+between only makes the next ETag differ from the one sent (an extra full
+response), never a stale 304. Second-resolution Last-Modified can't tell
+apart two writes in the same second; clients that send If-None-Match are
+matched on the ETag alone.
+
+Only bodies read straight from the database are tagged. The profile
+cache can lag a table's version by its TTL, so routes that take rows
+from it (the profile, appointment and timeline GETs) carry no
+validators: a stale profile must not be sent under the new version's
+strong ETag, and a cache hit should not cost a versions read.
+
+Large JSON bodies are compressed with brotli (when the `brotli` package
+is installed) or gzip, per Accept-Encoding. A compressed body gets its
+own strong ETag (`<etag>-br`, `<etag>-gzip`); revalidation accepts any
+of the variants.
+"""
+import gzip
+import hashlib
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VERSIONS_QUERY = '''SELECT name, CAST(SUM(version) AS UNSIGNED) AS version, MAX(updated_at) AS updated_at
+                    FROM table_version_shards GROUP BY name'''
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain')
+
+ENCODINGS = ('br', 'gzip')
+
+
+class TableVersions:
+    """Per-process view of the table versions.
+
+    With `ttl` 0 every lookup reads the table; a positive `ttl` reuses a
+    read for that long, which can hand out a 304 for up to `ttl` seconds
+    after a write made by another process.
+    """
+
+    def __init__(self, load, ttl=0.0):
+        self._load = load
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions = None
+        self._expires_at = 0.0
+
+    def peek(self):
+        with self._lock:
+            if self._versions is not None and time.monotonic() < self._expires_at:
+                return self._versions
+        return None
+
+    def store(self, rows):
+        """Index VERSIONS_QUERY rows as {table: (version, updated_at)}"""
+        versions = {row['name']: (row['version'], row['updated_at']) for row in rows}
+        if self.ttl > 0:
+            with self._lock:
+                self._versions = versions
+                self._expires_at = time.monotonic() + self.ttl
+        return versions
+
+    def get(self):
+        versions = self.peek()
+        if versions is None:
+            versions = self.store(self._load())
+        return versions
+
+    def invalidate(self):
+        with self._lock:
+            self._versions = None
+
+
+def validators(versions, tables, key):
+    """(etag, last_modified) of the response `key` (path + query) built from `tables`"""
+    digest = hashlib.blake2b(key.encode(), digest_size=16)
+    last_modified = None
+    for table in tables:
+        version, updated_at = versions[table]
+        digest.update(f'|{table}:{version}'.encode())
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    return digest.hexdigest(), last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Whether the client's cached copy (If-None-Match, else If-Modified-Since) is current"""
+    if request.if_none_match:
+        return any(request.if_none_match.contains_weak(tag)
+                   for tag in (etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS)))
+    since = request.if_modified_since
+    return since is not None and last_modified is not None \
+        and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+
+
+def choose_encoding(accept_encoding):
+    """Preferred encoding the client accepts (q > 0), or None"""
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted and (encoding != 'br' or brotli is not None):
+            return encoding
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
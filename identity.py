@@ -0,0 +1,81 @@
+"""Unified username -> (role, id) index backed by the `users` table.
+
+The unique key on users.username is what makes usernames unique across
+admins, doctors and patients; callers insert and let the constraint
+reject duplicates instead of checking each table first.
+"""
+import MySQLdb
+import MySQLdb.cursors
+
+ROLE_TABLES = {'admin': 'admins', 'doctor': 'doctors', 'patient': 'patients'}
+
+# MySQL error code for a duplicate entry on a unique key
+ER_DUP_ENTRY = 1062
+
+# One unique-index probe on users plus a primary key lookup in the role table
+LOGIN_QUERY = '''SELECT u.role, u.user_id AS id, u.username,
+                        COALESCE(a.name, d.name, p.name) AS name,
+                        COALESCE(a.password, d.password, p.password) AS password
+                 FROM users u
+                 LEFT JOIN admins a ON u.role = 'admin' AND a.id = u.user_id
+                 LEFT JOIN doctors d ON u.role = 'doctor' AND d.id = u.user_id
+                 LEFT JOIN patients p ON u.role = 'patient' AND p.id = u.user_id
+                 WHERE u.username = %s'''
+
+RELEASE_USERNAME = 'DELETE FROM users WHERE role = %s AND user_id = %s'
+
+
+def is_duplicate(error):
+    return isinstance(error, MySQLdb.IntegrityError) and error.args and error.args[0] == ER_DUP_ENTRY
+
+
+def claim_username(cursor, username, role, user_id):
+    """Register a freshly inserted role row; raises IntegrityError if the username is taken"""
+    cursor.execute('INSERT INTO users (username, role, user_id, created_at) VALUES (%s, %s, %s, NOW())',
+                   (username, role, user_id))
+
+
+def claim_usernames(cursor, rows):
+    """Bulk form of claim_username for (username, role, user_id) tuples"""
+    cursor.executemany('INSERT INTO users (username, role, user_id, created_at) VALUES (%s, %s, %s, NOW())', rows)
+
+
+def existing_usernames(cursor, usernames):
+    """The subset of `usernames` already claimed by some account"""
+    if not usernames:
+        return set()
+    placeholders = ', '.join(['%s'] * len(usernames))
+    cursor.execute(f'SELECT username FROM users WHERE username IN ({placeholders})', list(usernames))
+    return {row['username'] for row in cursor.fetchall()}
+
+
+def release_username(cursor, role, user_id):
+    cursor.execute(RELEASE_USERNAME, (role, user_id))
+
+
+def find_account(cursor, username):
+    """Resolve a login by username alone; returns role, id, username, name and password hash"""
+    cursor.execute(LOGIN_QUERY, (username,))
+    return cursor.fetchone()
+
+
+def backfill(conn):
+    """Index every existing admin/doctor/patient in `users`.
+
+    Safe to re-run: rows already present are skipped. Returns the
+    (role, id, username) of rows whose username is already claimed by
+    another account, which have to be renamed by hand.
+    """
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    inserted = 0
+    conflicts = []
+    for role, table in ROLE_TABLES.items():
+        cursor.execute(f'''INSERT IGNORE INTO users (username, role, user_id, created_at)
+                           SELECT username, %s, id, created_at FROM {table}''', (role,))
+        inserted += cursor.rowcount
+        cursor.execute(f'''SELECT t.id, t.username FROM {table} t
+                           LEFT JOIN users u ON u.role = %s AND u.user_id = t.id
+                           WHERE u.id IS NULL''', (role,))
+        conflicts.extend((role, row['id'], row['username']) for row in cursor.fetchall())
+        conn.commit()
+    return inserted, conflicts
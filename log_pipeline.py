@@ -0,0 +1,118 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with the `extra=` fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the request thread.
+
+    When the bounded queue is full the record is dropped and counted
+    instead of waiting for the writer thread to catch up.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record can be handed over
+        # as-is; message formatting happens on the writer thread instead
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class OperationSampler:
+    """Per-operation sampling for log_operation; unlisted operations are always logged"""
+
+    def __init__(self, rates=None, default=1.0):
+        self.rates = dict(rates or {})
+        self.default = default
+
+    def should_log(self, operation):
+        rate = self.rates.get(operation, self.default)
+        return rate >= 1.0 or random.random() < rate
+
+
+def stop_listener(listener):
+    """Flush and stop the writer thread; safe to call more than once"""
+    if getattr(listener, '_thread', None) is not None:
+        listener.stop()
+
+
+def restart_listener(queue_handler, listener):
+    """Give a forked worker its own queue and writer thread; threads do not survive fork()"""
+    queue_handler.queue = listener.queue = queue.Queue(maxsize=queue_handler.queue.maxsize)
+    listener._thread = None
+    listener.start()
+
+
+def setup_logging(path, rotation='size', max_bytes=50 * 1024 * 1024, backup_count=10,
+                  when='midnight', console=True, level=logging.INFO, queue_size=10000):
+    """Route the root logger through a queue to a background writer thread.
+
+    Request threads only pay for putting a record on the queue; the
+    QueueListener thread formats the records as JSON and writes them to a
+    size- or time-rotated file (and stderr if `console`). Returns
+    (queue_handler, listener); the listener is stopped and flushed at exit.
+    """
+    if rotation == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    elif rotation == 'time':
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8')
+    else:
+        raise ValueError(f'Unknown log rotation: {rotation}')
+
+    formatter = JSONFormatter()
+    handlers = [file_handler]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return queue_handler, listener
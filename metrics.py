@@ -0,0 +1,241 @@
+"""Per-route request and database metrics in Prometheus text format.
+
+Each endpoint gets one RouteStats, created up front from the app's URL
+map, holding plain integer arrays: request counts per status class,
+latency / response size / DB time / transaction time histogram buckets,
+and query, transaction outcome and leaked cursor counts.
+Recording a request is a dict lookup, a few bisects and additions under
+the route's lock; nothing is allocated per request. Metrics are per
+process; under gunicorn each worker reports its own numbers and the
+scraper aggregates them.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+# How a request's unit of work ended (db.UnitOfWork.outcome)
+TRANSACTION_OUTCOMES = ('commit', 'rollback', 'autocommit')
+
+# Requests that matched no route (404s, bad methods) share one label set
+UNMATCHED = '<unmatched>'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; cumulated only when exported
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class RouteStats:
+    __slots__ = ('labels', 'lock', 'status', 'latency', 'size', 'db_time', 'db_queries', 'tx_time', 'tx_outcomes',
+                 'leaked_cursors')
+
+    def __init__(self, endpoint):
+        self.labels = f'endpoint="{endpoint}"'
+        self.lock = threading.Lock()
+        self.status = [0] * len(STATUS_CLASSES)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.db_queries = 0
+        self.tx_time = Histogram(LATENCY_BUCKETS)
+        self.tx_outcomes = [0] * len(TRANSACTION_OUTCOMES)
+        self.leaked_cursors = 0
+
+
+class TimedCursor:
+    """Cursor proxy that reports every execute/executemany.
+
+    `record(query, args, seconds, rowcount)` is called after each
+    statement, whether or not it raised.
+    """
+
+    __slots__ = ('_cursor', '_record', 'closed')
+
+    def __init__(self, cursor, record):
+        self._cursor = cursor
+        self._record = record
+        self.closed = False
+
+    def _timed(self, method, query, args):
+        start = time.perf_counter()
+        try:
+            return method(query, *args)
+        finally:
+            self._record(query, args[0] if args else None, time.perf_counter() - start,
+                         getattr(self._cursor, 'rowcount', -1))
+
+    def execute(self, query, *args):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, (args,))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Connection proxy whose cursors are TimedCursors; `raw` goes back to the pool"""
+
+    __slots__ = ('raw', '_record', '_cursors')
+
+    def __init__(self, conn, record):
+        self.raw = conn
+        self._record = record
+        self._cursors = []
+
+    def cursor(self, *args, **kwargs):
+        cursor = TimedCursor(self.raw.cursor(*args, **kwargs), self._record)
+        self._cursors.append(cursor)
+        return cursor
+
+    def close_cursors(self):
+        """Close every cursor still open; returns how many there were"""
+        still_open = [cursor for cursor in self._cursors if not cursor.closed]
+        for cursor in still_open:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors = []
+        return len(still_open)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class Metrics:
+    def __init__(self):
+        self._routes = {UNMATCHED: RouteStats(UNMATCHED)}
+        self._lock = threading.Lock()
+        self._gauges = []
+
+    def preallocate(self, endpoints):
+        with self._lock:
+            for endpoint in endpoints:
+                if endpoint not in self._routes:
+                    self._routes[endpoint] = RouteStats(endpoint)
+
+    def add_gauges(self, collect):
+        """`collect()` returns {name: value}; read at scrape time only"""
+        self._gauges.append(collect)
+
+    def _route(self, endpoint):
+        stats = self._routes.get(endpoint or UNMATCHED)
+        if stats is None:
+            # Routes registered after preallocate(); rare, so take the slow path once
+            self.preallocate([endpoint])
+            stats = self._routes[endpoint]
+        return stats
+
+    def observe(self, endpoint, status, seconds, size, db_queries, db_seconds):
+        stats = self._route(endpoint)
+        with stats.lock:
+            stats.status[min(max(status // 100, 1), 5) - 1] += 1
+            stats.latency.observe(seconds)
+            if size is not None:
+                stats.size.observe(size)
+            stats.db_queries += db_queries
+            stats.db_time.observe(db_seconds)
+
+    def observe_transaction(self, endpoint, outcome, seconds):
+        stats = self._route(endpoint)
+        with stats.lock:
+            stats.tx_outcomes[TRANSACTION_OUTCOMES.index(outcome)] += 1
+            stats.tx_time.observe(seconds)
+
+    def observe_leaked_cursors(self, endpoint, count):
+        stats = self._route(endpoint)
+        with stats.lock:
+            stats.leaked_cursors += count
+
+    def render(self):
+        with self._lock:
+            routes = list(self._routes.values())
+        out = ['# HELP http_requests_total Requests by endpoint and status class',
+               '# TYPE http_requests_total counter']
+        snapshots = []
+        for stats in routes:
+            with stats.lock:
+                snapshots.append((stats.labels, list(stats.status), _copy(stats.latency), _copy(stats.size),
+                                  _copy(stats.db_time), _copy(stats.tx_time), list(stats.tx_outcomes),
+                                  stats.leaked_cursors, stats.db_queries))
+        for labels, status, *_ in snapshots:
+            for status_class, count in zip(STATUS_CLASSES, status):
+                if count:
+                    out.append(f'http_requests_total{{{labels},status="{status_class}"}} {count}')
+
+        sections = [
+            ('http_request_duration_seconds', 'Request latency', 2),
+            ('http_response_size_bytes', 'Response body size', 3),
+            ('db_request_seconds', 'Time spent in cursor.execute per request', 4),
+            ('db_transaction_seconds', "Time from the start to the end of a route's unit of work", 5),
+        ]
+        for name, help_text, index in sections:
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} histogram')
+            for snapshot in snapshots:
+                if any(snapshot[index].counts):
+                    out.extend(snapshot[index].lines(name, snapshot[0]))
+
+        out.append('# HELP db_queries_total Statements executed, by endpoint')
+        out.append('# TYPE db_queries_total counter')
+        for labels, *_, db_queries in snapshots:
+            if db_queries:
+                out.append(f'db_queries_total{{{labels}}} {db_queries}')
+
+        out.append('# HELP db_transactions_total Units of work by endpoint and outcome')
+        out.append('# TYPE db_transactions_total counter')
+        for labels, *_, outcomes, _, _ in snapshots:
+            for outcome, count in zip(TRANSACTION_OUTCOMES, outcomes):
+                if count:
+                    out.append(f'db_transactions_total{{{labels},outcome="{outcome}"}} {count}')
+
+        out.append('# HELP db_cursors_leaked_total Cursors still open when the request ended, by endpoint')
+        out.append('# TYPE db_cursors_leaked_total counter')
+        for labels, *_, leaked, _ in snapshots:
+            if leaked:
+                out.append(f'db_cursors_leaked_total{{{labels}}} {leaked}')
+
+        for collect in self._gauges:
+            for name, value in collect().items():
+                out.append(f'# TYPE {name} gauge')
+                out.append(f'{name} {value}')
+        return '\n'.join(out) + '\n'
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.bounds)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    return copy
@@ -0,0 +1,372 @@
+"""Versioned schema migrations for the hospital management database.
+
+Usage (from the repository root, using the MySQL settings in server.py):
+
+    python migrations.py status       # show applied / pending versions
+    python migrations.py upgrade      # apply pending migrations
+    python migrations.py explain      # fail if a route query does a full table scan
+    python migrations.py backfill-users   # index existing accounts in `users`
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import MySQLdb.cursors
+
+from queries import LIST_QUERIES, PROFILE_QUERIES, DASHBOARD_QUERY, BOOKED_SLOTS_QUERY, build_list_query
+import identity
+import writes
+from http_cache import VERSIONS_QUERY
+from search import prefix_query, fuzzy_query
+import reports
+
+# (version, description, statements). Never edit an applied migration; add a new one.
+MIGRATIONS = [
+    (1, 'create core tables', [
+        '''CREATE TABLE IF NOT EXISTS admins (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            phone VARCHAR(20) NOT NULL,
+            created_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+        '''CREATE TABLE IF NOT EXISTS doctors (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            phone VARCHAR(20) NOT NULL,
+            specialization VARCHAR(100) NOT NULL DEFAULT 'General',
+            created_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+        '''CREATE TABLE IF NOT EXISTS patients (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            phone VARCHAR(20) NOT NULL,
+            address TEXT,
+            created_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+        '''CREATE TABLE IF NOT EXISTS appointments (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT NOT NULL,
+            doctor_id INT NOT NULL,
+            appointment_date DATE NOT NULL,
+            appointment_time TIME NOT NULL,
+            symptoms TEXT,
+            status VARCHAR(20) NOT NULL DEFAULT 'Scheduled',
+            created_at DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    ]),
+    (2, 'indexes for the route query patterns', [
+        # Registration/creation uniqueness checks and login (username AND password)
+        'ALTER TABLE admins ADD UNIQUE INDEX uq_admins_username (username)',
+        'ALTER TABLE doctors ADD UNIQUE INDEX uq_doctors_username (username)',
+        'ALTER TABLE patients ADD UNIQUE INDEX uq_patients_username (username)',
+        # Keyset pagination ORDER BY name, id (InnoDB appends the primary key)
+        'ALTER TABLE admins ADD INDEX idx_admins_name (name)',
+        'ALTER TABLE doctors ADD INDEX idx_doctors_name (name)',
+        'ALTER TABLE patients ADD INDEX idx_patients_name (name)',
+        # ?specialization= filter on the doctor list, still ordered by name
+        'ALTER TABLE doctors ADD INDEX idx_doctors_specialization_name (specialization, name)',
+        # Appointment list ORDER BY appointment_date, id and the dashboard "today" range
+        'ALTER TABLE appointments ADD INDEX idx_appointments_date (appointment_date)',
+        # ?doctor_id= / ?patient_id= filters and the delete guards' COUNT(*)
+        'ALTER TABLE appointments ADD INDEX idx_appointments_doctor_date (doctor_id, appointment_date)',
+        'ALTER TABLE appointments ADD INDEX idx_appointments_patient_date (patient_id, appointment_date)',
+        # ?status= filter and the dashboard per-status GROUP BY
+        'ALTER TABLE appointments ADD INDEX idx_appointments_status_date (status, appointment_date)',
+    ]),
+    (3, 'users identity index (run backfill-users afterwards)', [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL,
+            role ENUM('admin', 'doctor', 'patient') NOT NULL,
+            user_id INT NOT NULL,
+            created_at DATETIME NOT NULL,
+            UNIQUE KEY uq_users_username (username),
+            UNIQUE KEY uq_users_role_user (role, user_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    ]),
+    (4, 'one active appointment per doctor slot', [
+        # booked_time is NULL for cancelled appointments so they free their slot;
+        # INVISIBLE keeps it out of SELECT * and positional INSERTs
+        '''ALTER TABLE appointments
+           ADD COLUMN booked_time TIME
+               AS (IF(status = 'Cancelled', NULL, appointment_time)) STORED INVISIBLE,
+           ADD UNIQUE INDEX uq_appointments_doctor_slot (doctor_id, appointment_date, booked_time)''',
+    ]),
+    (5, 'appointment foreign keys (delete guards)', [
+        # Deleting a doctor/patient with appointments fails with error 1451 instead of
+        # the handlers counting appointments first; the existing (x_id, appointment_date)
+        # indexes back the constraint checks. Orphaned rows must be removed before upgrading.
+        '''ALTER TABLE appointments
+           ADD CONSTRAINT fk_appointments_patient FOREIGN KEY (patient_id)
+               REFERENCES patients (id) ON DELETE RESTRICT,
+           ADD CONSTRAINT fk_appointments_doctor FOREIGN KEY (doctor_id)
+               REFERENCES doctors (id) ON DELETE RESTRICT''',
+    ]),
+    (6, 'table version markers for HTTP validators (http_cache.py)', [
+        '''CREATE TABLE IF NOT EXISTS table_versions (
+            name VARCHAR(64) PRIMARY KEY,
+            version BIGINT UNSIGNED NOT NULL,
+            updated_at DATETIME(6) NOT NULL
+        ) ENGINE=InnoDB''',
+        'INSERT IGNORE INTO table_versions VALUES '
+        + ', '.join(f"('{table}', 1, UTC_TIMESTAMP(6))" for table in ('admins', 'doctors', 'patients', 'appointments')),
+    ] + [
+        # Row-level: a bulk insert bumps once per row, all on the same primary key row
+        f"""CREATE TRIGGER trg_{table}_version_{event.lower()} AFTER {event} ON {table} FOR EACH ROW
+            UPDATE table_versions SET version = version + 1, updated_at = UTC_TIMESTAMP(6)
+            WHERE name = '{table}'"""
+        for table in ('admins', 'doctors', 'patients', 'appointments') for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    (7, 'search indexes (search.py)', [
+        # Prefix pass: name and username are already indexed; phone is not
+        'ALTER TABLE patients ADD INDEX idx_patients_phone (phone)',
+        'ALTER TABLE doctors ADD INDEX idx_doctors_phone (phone)',
+        # Fuzzy pass: ngram tokens (ngram_token_size, default 2) match inside words
+        'ALTER TABLE patients ADD FULLTEXT INDEX ft_patients_search (name, username, phone) WITH PARSER ngram',
+        'ALTER TABLE doctors ADD FULLTEXT INDEX ft_doctors_search (name, username, specialization) WITH PARSER ngram',
+    ]),
+    (8, 'covering indexes for the doctor/patient appointment timelines', [
+        # Every column of the timeline SELECT, in keyset order (id spelled out so it
+        # sorts before the payload columns). They supersede the (x_id, appointment_date)
+        # indexes, which are dropped in the same statement so the foreign keys stay indexed.
+        '''ALTER TABLE appointments
+           ADD INDEX idx_appointments_doctor_timeline
+               (doctor_id, appointment_date, appointment_time, id, status, patient_id),
+           DROP INDEX idx_appointments_doctor_date''',
+        '''ALTER TABLE appointments
+           ADD INDEX idx_appointments_patient_timeline
+               (patient_id, appointment_date, appointment_time, id, status, doctor_id),
+           DROP INDEX idx_appointments_patient_date''',
+    ]),
+    (9, 'daily appointment rollup for reports (run `reports.py rebuild` afterwards)', [
+        '''CREATE TABLE IF NOT EXISTS appointment_daily_rollup (
+            day DATE NOT NULL,
+            doctor_id INT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            appointments INT NOT NULL,
+            PRIMARY KEY (day, doctor_id, status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+        '''CREATE TRIGGER trg_appointments_rollup_insert AFTER INSERT ON appointments FOR EACH ROW
+           INSERT INTO appointment_daily_rollup (day, doctor_id, status, appointments)
+           VALUES (NEW.appointment_date, NEW.doctor_id, NEW.status, 1)
+           ON DUPLICATE KEY UPDATE appointments = appointments + 1''',
+        '''CREATE TRIGGER trg_appointments_rollup_delete AFTER DELETE ON appointments FOR EACH ROW
+           UPDATE appointment_daily_rollup SET appointments = appointments - 1
+           WHERE day = OLD.appointment_date AND doctor_id = OLD.doctor_id AND status = OLD.status''',
+        '''CREATE TRIGGER trg_appointments_rollup_update AFTER UPDATE ON appointments FOR EACH ROW
+           BEGIN
+               IF NOT (NEW.appointment_date <=> OLD.appointment_date AND NEW.doctor_id <=> OLD.doctor_id
+                       AND NEW.status <=> OLD.status) THEN
+                   UPDATE appointment_daily_rollup SET appointments = appointments - 1
+                   WHERE day = OLD.appointment_date AND doctor_id = OLD.doctor_id AND status = OLD.status;
+                   INSERT INTO appointment_daily_rollup (day, doctor_id, status, appointments)
+                   VALUES (NEW.appointment_date, NEW.doctor_id, NEW.status, 1)
+                   ON DUPLICATE KEY UPDATE appointments = appointments + 1;
+               END IF;
+           END''',
+    ]),
+    (10, 'append-only audit trail (audit.py)', [
+        '''CREATE TABLE IF NOT EXISTS audit_log (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            occurred_at DATETIME(6) NOT NULL,
+            actor_role VARCHAR(20),
+            actor_id INT,
+            actor_username VARCHAR(50),
+            action VARCHAR(20) NOT NULL,
+            entity VARCHAR(20) NOT NULL,
+            entity_id INT NOT NULL,
+            changes JSON NOT NULL,
+            endpoint VARCHAR(100),
+            remote_addr VARCHAR(45),
+            INDEX idx_audit_entity (entity, entity_id, id),
+            INDEX idx_audit_actor (actor_role, actor_id, id),
+            INDEX idx_audit_occurred (occurred_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    ] + [
+        # History is never rewritten, not even through the application's own account
+        f"""CREATE TRIGGER trg_audit_log_no_{event.lower()} BEFORE {event} ON audit_log FOR EACH ROW
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'audit_log is append-only'"""
+        for event in ('UPDATE', 'DELETE')
+    ]),
+    (11, 'sharded table versions, so writers no longer queue on one row per table (http_cache.py)', [
+        '''CREATE TABLE IF NOT EXISTS table_version_shards (
+            name VARCHAR(64) NOT NULL,
+            shard SMALLINT UNSIGNED NOT NULL,
+            version BIGINT UNSIGNED NOT NULL,
+            updated_at DATETIME(6) NOT NULL,
+            PRIMARY KEY (name, shard)
+        ) ENGINE=InnoDB''',
+        # Shard 0 carries the old counter on, so no version is ever handed out twice
+        '''INSERT IGNORE INTO table_version_shards
+           SELECT name, 0, version, updated_at FROM table_versions''',
+        'INSERT IGNORE INTO table_version_shards VALUES '
+        + ', '.join(f"('{table}', {shard}, 0, UTC_TIMESTAMP(6))"
+                    for table in ('admins', 'doctors', 'patients', 'appointments') for shard in range(64)),
+    ] + [
+        # Each connection bumps its own shard row, so concurrent transactions only wait
+        # on each other when their connection ids share a shard
+        f"""CREATE TRIGGER trg_{table}_shard_{event.lower()} AFTER {event} ON {table} FOR EACH ROW
+            UPDATE table_version_shards SET version = version + 1, updated_at = UTC_TIMESTAMP(6)
+            WHERE name = '{table}' AND shard = CONNECTION_ID() % 64"""
+        for table in ('admins', 'doctors', 'patients', 'appointments') for event in ('INSERT', 'UPDATE', 'DELETE')
+    ] + [
+        f'DROP TRIGGER IF EXISTS trg_{table}_version_{event.lower()}'
+        for table in ('admins', 'doctors', 'patients', 'appointments') for event in ('INSERT', 'UPDATE', 'DELETE')
+    ] + [
+        'DROP TABLE table_versions',
+    ]),
+]
+
+
+def ensure_version_table(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+                          version INT PRIMARY KEY,
+                          description VARCHAR(255) NOT NULL,
+                          applied_at DATETIME NOT NULL
+                      ) ENGINE=InnoDB''')
+
+
+def applied_versions(cursor):
+    ensure_version_table(cursor)
+    cursor.execute('SELECT version FROM schema_migrations ORDER BY version')
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def upgrade(conn, target=None):
+    """Apply every pending migration up to `target` (all of them by default)"""
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    done = applied_versions(cursor)
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        # MySQL DDL commits implicitly, so each migration is recorded right after it runs
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute('INSERT INTO schema_migrations VALUES (%s, %s, NOW())', (version, description))
+        conn.commit()
+        applied.append(version)
+        print(f'Applied migration {version}: {description}')
+    if not applied:
+        print('Schema is up to date')
+    return applied
+
+
+def status(conn):
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    done = applied_versions(cursor)
+    for version, description, _ in MIGRATIONS:
+        state = 'applied' if version in done else 'pending'
+        print(f'{version:>4}  {state:<8} {description}')
+    return [version for version, _, _ in MIGRATIONS if version not in done]
+
+
+def explain_cases():
+    """(route, query, params) for every query pattern the routes issue"""
+    today = date.today()
+    cases = []
+
+    for entity, spec in LIST_QUERIES.items():
+        scope = 1 if 'scope' in spec else None
+        query, params, _ = build_list_query(entity, {}, scope=scope)
+        cases.append((f'GET /api/{entity}', query, params))
+        for name in spec['filters']:
+            sample = {'doctor_id': '1', 'patient_id': '1', 'status': 'Scheduled',
+                      'date_from': today.isoformat(), 'date_to': today.isoformat(),
+                      'specialization': 'General', 'entity': 'appointment', 'entity_id': '1',
+                      'actor_role': 'admin', 'actor_id': '1', 'action': 'UPDATE'}[name]
+            query, params, _ = build_list_query(entity, {name: sample}, scope=scope)
+            cases.append((f'GET /api/{entity}?{name}=', query, params))
+
+    for entity, query in PROFILE_QUERIES.items():
+        cases.append((f'GET /api/{entity}s/<id>', query, (1,)))
+
+    cases.append(('POST /api/login', identity.LOGIN_QUERY, ('x',)))
+    cases.append(('DELETE /api/<role>s/<id> identity', identity.RELEASE_USERNAME, ('doctor', 1)))
+
+    for table in ('admins', 'doctors', 'patients', 'appointments'):
+        cases.append((f'PUT /api/{table}/<id>', f'UPDATE {table} SET created_at = created_at WHERE id = %s', (1,)))
+        cases.append((f'DELETE /api/{table}/<id>', f'DELETE FROM {table} WHERE id = %s', (1,)))
+
+    cases.append(('GET /api/appointments/<id>', 'SELECT * FROM appointments WHERE id = %s', (1,)))
+    cases.append(('PUT/DELETE /api/appointments/<id> lock',
+                  writes.LOCK_APPOINTMENT, (1,)))
+    cases.append(('GET conditional check', VERSIONS_QUERY, ()))
+    cases.append(('GET /api/reports/*', reports.ROLLUP_QUERY, (today - timedelta(days=30), today)))
+    for entity in ('patients', 'doctors'):
+        cases.append((f'GET /api/{entity}/search prefix', *prefix_query(entity, '555', 20)))
+        cases.append((f'GET /api/{entity}/search fuzzy', *fuzzy_query(entity, 'smith', 20, [1])))
+    cases.append(('GET /api/dashboard/stats', DASHBOARD_QUERY, (today, today + timedelta(days=1))))
+    cases.append(('GET /api/doctors/<id>/availability', BOOKED_SLOTS_QUERY, (1, today)))
+    return cases
+
+
+def explain(conn, min_rows=0):
+    """EXPLAIN every route query; return the ones that scan a whole table.
+
+    Tables whose row estimate is below `min_rows` are ignored, since the
+    optimizer legitimately prefers a scan on tiny tables.
+    """
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    failures = []
+    for route, query, params in explain_cases():
+        cursor.execute('EXPLAIN ' + query, params)
+        for row in cursor.fetchall():
+            table = row.get('table') or ''
+            # <union1,2>, <derived2> etc. are temporary results, not base tables
+            if table.startswith('<'):
+                continue
+            if row.get('type') == 'ALL' and (row.get('rows') or 0) >= min_rows:
+                failures.append((route, table, row.get('rows')))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hospital management schema migrations')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help='list applied and pending migrations')
+    up = sub.add_parser('upgrade', help='apply pending migrations')
+    up.add_argument('--to', type=int, dest='target', help='stop after this version')
+    ex = sub.add_parser('explain', help='fail if any route query does a full table scan')
+    ex.add_argument('--min-rows', type=int, default=0,
+                    help='ignore scans of tables estimated below this many rows')
+    sub.add_parser('backfill-users', help='index existing admins/doctors/patients in users')
+    args = parser.parse_args(argv)
+
+    from server import connect_mysql
+    conn = connect_mysql()
+    try:
+        if args.command == 'status':
+            status(conn)
+        elif args.command == 'upgrade':
+            upgrade(conn, args.target)
+        elif args.command == 'backfill-users':
+            inserted, conflicts = identity.backfill(conn)
+            print(f'Indexed {inserted} accounts')
+            for role, user_id, username in conflicts:
+                print(f'CONFLICT  {role} {user_id}: username {username!r} already belongs to another account')
+            if conflicts:
+                return 1
+        else:
+            failures = explain(conn, args.min_rows)
+            for route, table, rows in failures:
+                print(f'FULL SCAN  {route}: table {table} (~{rows} rows)')
+            if failures:
+                return 1
+            print(f'OK: {len(explain_cases())} route queries use indexes')
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Versioned password hashing with a bounded pool for the KDF work.
+
+Stored hashes carry their scheme and cost so they can be upgraded in place:
+
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+    <64 hex chars>                                    legacy unsalted SHA-256
+
+hashlib's scrypt and pbkdf2_hmac release the GIL, so a thread pool sized to
+the CPU count runs them in parallel without a process pool. At most
+`max_workers` derivations run at once and at most `max_pending` requests
+wait for one; beyond that HasherBusy is raised instead of queueing forever,
+so a burst of logins cannot starve every other request thread. Batch
+hashing takes the same slots and keeps at most `max_workers` derivations
+in flight, so a login queues behind one pool-width of batch work, not the
+whole batch.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+
+
+class HasherBusy(RuntimeError):
+    """Too many password derivations are already queued"""
+
+
+def _legacy(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _is_legacy(encoded):
+    return len(encoded) == 64 and '$' not in encoded
+
+
+class PasswordHasher:
+    def __init__(self, scheme='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1, pbkdf2_iterations=600000,
+                 max_workers=None, max_pending=64, timeout=10.0, verified_cache_size=10000,
+                 verified_cache_ttl=300):
+        if scheme not in SCHEMES:
+            raise ValueError(f'Unknown password scheme: {scheme}')
+        self.scheme = scheme
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='kdf')
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_pending)
+        # Repeat logins with the same password skip the KDF; keys are HMACs under a per-process secret
+        self._verified = LRUCache(maxsize=verified_cache_size, ttl=verified_cache_ttl) \
+            if verified_cache_size else None
+        self._cache_key = os.urandom(32)
+        self._lock = threading.Lock()
+        self.derivations = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    # ---------- encoding ----------
+
+    def _derive(self, scheme, params, salt, password):
+        if scheme == 'scrypt':
+            n, r, p = params
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                  maxmem=128 * r * (n + p + 2), dklen=32)
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params[0])
+
+    def _encode(self, password):
+        salt = os.urandom(16)
+        if self.scheme == 'scrypt':
+            digest = self._derive('scrypt', self.scrypt_params, salt, password)
+            n, r, p = self.scrypt_params
+            return f'scrypt${n}${r}${p}${salt.hex()}${digest.hex()}'
+        digest = self._derive('pbkdf2_sha256', (self.pbkdf2_iterations,), salt, password)
+        return f'pbkdf2_sha256${self.pbkdf2_iterations}${salt.hex()}${digest.hex()}'
+
+    def _check(self, password, encoded):
+        if _is_legacy(encoded):
+            return hmac.compare_digest(_legacy(password), encoded)
+        parts = encoded.split('$')
+        if parts[0] not in SCHEMES:
+            return False
+        try:
+            scheme, params, salt, digest = parts[0], [int(value) for value in parts[1:-2]], parts[-2], parts[-1]
+            expected = self._derive(scheme, params, bytes.fromhex(salt), password)
+        except (ValueError, IndexError):
+            return False
+        return hmac.compare_digest(expected.hex(), digest)
+
+    def _submit(self, fn, *args):
+        """Queue one derivation on the pool; its slot is released when it finishes"""
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy('Password hashing is saturated, try again later')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.derivations += 1
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        return self._submit(fn, *args).result()
+
+    # ---------- public API ----------
+
+    def hash(self, password):
+        return self._run(self._encode, password)
+
+    def hash_many(self, passwords):
+        """Hash a list on the pool, preserving order, at most `max_workers` at a time"""
+        hashes = []
+        in_flight = deque()
+        for password in passwords:
+            if len(in_flight) >= self.max_workers:
+                hashes.append(in_flight.popleft().result())
+            in_flight.append(self._submit(self._encode, password))
+        hashes.extend(future.result() for future in in_flight)
+        return hashes
+
+    def verify(self, password, encoded):
+        if not encoded:
+            return False
+        key = None
+        if self._verified is not None:
+            key = hmac.new(self._cache_key, f'{encoded}\0{password}'.encode(), hashlib.sha256).digest()
+            if self._verified.get(key):
+                return True
+        if _is_legacy(encoded):
+            ok = self._check(password, encoded)
+        else:
+            ok = self._run(self._check, password, encoded)
+        if ok and key is not None:
+            self._verified.set(key, True)
+        return ok
+
+    def needs_rehash(self, encoded):
+        """True for legacy hashes and hashes made with another scheme or cost"""
+        if _is_legacy(encoded):
+            return True
+        parts = encoded.split('$')
+        if parts[0] != self.scheme:
+            return True
+        if self.scheme == 'scrypt':
+            return tuple(int(value) for value in parts[1:4]) != self.scrypt_params
+        return int(parts[1]) != self.pbkdf2_iterations
+
+    def note_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {'scheme': self.scheme, 'max_workers': self.max_workers, 'derivations': self.derivations,
+                     'rejected': self.rejected, 'rehashed': self.rehashed}
+        if self.scheme == 'scrypt':
+            stats['scrypt_n'], stats['scrypt_r'], stats['scrypt_p'] = self.scrypt_params
+        else:
+            stats['pbkdf2_iterations'] = self.pbkdf2_iterations
+        if self._verified is not None:
+            stats['verified_cache'] = self._verified.stats()
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,136 @@
+"""Opt-in SQL profiling: what each request sent to MySQL, and what looks wrong.
+
+With SQL_PROFILE on, every statement a request executes is recorded with
+its normalized text, parameters, duration and row count. At the end of
+the request the statements are checked for:
+
+    duplicates   the same statement with the same parameters run twice
+    repeats      the same normalized statement run `repeat_threshold`+
+                 times with different parameters (the N+1 pattern)
+    slow         statements slower than `slow_ms`
+    over budget  more than `max_queries` round-trips
+
+The result goes into an X-Query-Report header and a per-endpoint
+aggregate served at /debug/queries, so a CI run can fail on any route
+that regressed. Not meant for production traffic: it keeps parameters.
+"""
+import re
+import threading
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_ROW_LIST = re.compile(r'\(\s*\(%s(?:,\s*%s)*\)(?:\s*,\s*\(%s(?:,\s*%s)*\))+\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+
+
+def normalize(sql):
+    """Statement text with literals and variable-length IN lists folded"""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _ROW_LIST.sub('((...))', sql)
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def _freeze(args):
+    if isinstance(args, (list, tuple)):
+        return tuple(_freeze(arg) for arg in args)
+    if isinstance(args, dict):
+        return tuple(sorted(args.items()))
+    return args
+
+
+class QueryProfiler:
+    def __init__(self, slow_ms=100, max_queries=10, repeat_threshold=3, keep_slowest=20):
+        self.slow_ms = slow_ms
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+        self.keep_slowest = keep_slowest
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def analyze(self, statements):
+        """statements: [(sql, args, seconds, rowcount)] in execution order"""
+        by_text = {}
+        seen = {}
+        duplicates = {}
+        slow = []
+        total = 0.0
+        for sql, args, seconds, rowcount in statements:
+            text = normalize(sql)
+            total += seconds
+            entry = by_text.setdefault(text, {'count': 0, 'ms': 0.0, 'rows': 0})
+            entry['count'] += 1
+            entry['ms'] += seconds * 1000
+            entry['rows'] += max(rowcount, 0)
+            try:
+                key = (text, _freeze(args))
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] == 2:
+                    duplicates[text] = duplicates.get(text, 0) + 1
+            except TypeError:
+                pass
+            if seconds * 1000 >= self.slow_ms:
+                slow.append({'sql': text, 'ms': round(seconds * 1000, 3), 'rows': rowcount})
+        repeats = {text: entry['count'] for text, entry in by_text.items()
+                   if entry['count'] >= self.repeat_threshold}
+        return {
+            'queries': len(statements),
+            'db_ms': round(total * 1000, 3),
+            'over_budget': len(statements) > self.max_queries,
+            'duplicates': duplicates,
+            'repeats': repeats,
+            'slow': slow,
+            'statements': by_text,
+        }
+
+    @staticmethod
+    def header(report):
+        return (f"queries={report['queries']}; db_ms={report['db_ms']}; dup={len(report['duplicates'])}; "
+                f"repeat={len(report['repeats'])}; slow={len(report['slow'])}; "
+                f"over_budget={int(report['over_budget'])}")
+
+    @staticmethod
+    def flagged(report):
+        return bool(report['duplicates'] or report['repeats'] or report['slow'] or report['over_budget'])
+
+    def record(self, endpoint, report):
+        with self._lock:
+            agg = self._endpoints.setdefault(endpoint or '<unmatched>', {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'flagged_requests': 0,
+                'duplicates': {}, 'repeats': {}, 'slow': [], 'statements': {},
+            })
+            agg['requests'] += 1
+            agg['queries'] += report['queries']
+            agg['max_queries'] = max(agg['max_queries'], report['queries'])
+            agg['db_ms'] += report['db_ms']
+            agg['flagged_requests'] += self.flagged(report)
+            for field in ('duplicates', 'repeats'):
+                for text, count in report[field].items():
+                    agg[field][text] = max(agg[field].get(text, 0), count)
+            for text, entry in report['statements'].items():
+                total = agg['statements'].setdefault(text, {'count': 0, 'ms': 0.0})
+                total['count'] += entry['count']
+                total['ms'] += entry['ms']
+            agg['slow'] = sorted(agg['slow'] + report['slow'], key=lambda item: -item['ms'])[:self.keep_slowest]
+
+    def summary(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, agg in self._endpoints.items():
+                endpoints[endpoint] = dict(agg, db_ms=round(agg['db_ms'], 3),
+                                           avg_queries=round(agg['queries'] / agg['requests'], 2),
+                                           statements={text: {'count': entry['count'], 'ms': round(entry['ms'], 3)}
+                                                       for text, entry in agg['statements'].items()})
+        return {
+            'slow_ms': self.slow_ms,
+            'max_queries': self.max_queries,
+            'repeat_threshold': self.repeat_threshold,
+            'flagged': sorted(endpoint for endpoint, agg in endpoints.items() if agg['flagged_requests']),
+            'endpoints': endpoints,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
@@ -0,0 +1,265 @@
+import base64
+import json
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidListParams(ValueError):
+    """Raised when a list request has a bad limit, cursor or filter value"""
+
+
+def _parse_int(value):
+    return int(value)
+
+
+def _parse_date(value):
+    return date.fromisoformat(value).isoformat()
+
+
+# Every list route is described here once: the base SELECT, the columns of the
+# keyset sort key (the last one must be unique, so `id` is always appended),
+# the sort direction and the filters a client may pass as query parameters.
+LIST_QUERIES = {
+    'admins': {
+        'select': 'SELECT id, name, username, email, phone, created_at FROM admins',
+        'order_by': [('name', 'name'), ('id', 'id')],
+        'direction': 'ASC',
+        'filters': {},
+    },
+    'doctors': {
+        'select': 'SELECT id, name, username, email, phone, specialization, created_at FROM doctors',
+        'order_by': [('name', 'name'), ('id', 'id')],
+        'direction': 'ASC',
+        'filters': {
+            'specialization': ('specialization = %s', str),
+        },
+    },
+    'patients': {
+        'select': 'SELECT id, name, username, email, phone, address, created_at FROM patients',
+        'order_by': [('name', 'name'), ('id', 'id')],
+        'direction': 'ASC',
+        'filters': {},
+    },
+    'appointments': {
+        'select': '''SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization
+                     FROM appointments a
+                     JOIN patients p ON a.patient_id = p.id
+                     JOIN doctors d ON a.doctor_id = d.id''',
+        'order_by': [('a.appointment_date', 'appointment_date'), ('a.id', 'id')],
+        'direction': 'DESC',
+        'filters': {
+            'doctor_id': ('a.doctor_id = %s', _parse_int),
+            'patient_id': ('a.patient_id = %s', _parse_int),
+            'status': ('a.status = %s', str),
+            'date_from': ('a.appointment_date >= %s', _parse_date),
+            'date_to': ('a.appointment_date <= %s', _parse_date),
+            'specialization': ('d.specialization = %s', str),
+        },
+    },
+    # One doctor's schedule / one patient's history. No joins: every column is in
+    # the (owner, date, time, id, ...) covering index from migration 8, and the
+    # other party's name comes from the profile cache. `scope` takes the owner id.
+    'doctor_appointments': {
+        'select': 'SELECT id, patient_id, doctor_id, appointment_date, appointment_time, status FROM appointments',
+        'scope': 'doctor_id = %s',
+        'order_by': [('appointment_date', 'appointment_date'), ('appointment_time', 'appointment_time'),
+                     ('id', 'id')],
+        'direction': 'ASC',
+        'filters': {
+            'status': ('status = %s', str),
+            'date_from': ('appointment_date >= %s', _parse_date),
+            'date_to': ('appointment_date <= %s', _parse_date),
+        },
+    },
+    'patient_appointments': {
+        'select': 'SELECT id, patient_id, doctor_id, appointment_date, appointment_time, status FROM appointments',
+        'scope': 'patient_id = %s',
+        'order_by': [('appointment_date', 'appointment_date'), ('appointment_time', 'appointment_time'),
+                     ('id', 'id')],
+        'direction': 'DESC',
+        'filters': {
+            'status': ('status = %s', str),
+            'date_from': ('appointment_date >= %s', _parse_date),
+            'date_to': ('appointment_date <= %s', _parse_date),
+        },
+    },
+    # Newest first. An entity + entity_id or actor_role + actor_id filter uses the
+    # matching (..., id) index of migration 10; occurred_at dates are UTC.
+    'audit': {
+        'select': '''SELECT id, occurred_at, actor_role, actor_id, actor_username, action, entity, entity_id,
+                            changes, endpoint, remote_addr FROM audit_log''',
+        'order_by': [('id', 'id')],
+        'direction': 'DESC',
+        'filters': {
+            'entity': ('entity = %s', str),
+            'entity_id': ('entity_id = %s', _parse_int),
+            'actor_role': ('actor_role = %s', str),
+            'actor_id': ('actor_id = %s', _parse_int),
+            'action': ('action = %s', str),
+            'date_from': ('occurred_at >= %s', _parse_date),
+            'date_to': ('occurred_at < %s + INTERVAL 1 DAY', _parse_date),
+        },
+    },
+}
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row on a page into an opaque token"""
+    values = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidListParams('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidListParams('Invalid cursor')
+    return values
+
+
+def parse_limit(args):
+    raw = args.get('limit')
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise InvalidListParams('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise InvalidListParams(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+
+def _keyset_predicate(columns, op):
+    # (c1, c2) > (v1, v2) written out as c1 > v1 OR (c1 = v1 AND c2 > v2) so
+    # MySQL can use a range scan on the (c1, c2) index
+    parts = []
+    for i, column in enumerate(columns):
+        terms = [f'{prev} = %s' for prev in columns[:i]]
+        terms.append(f'{column} {op} %s')
+        parts.append('(' + ' AND '.join(terms) + ')')
+    return '(' + ' OR '.join(parts) + ')'
+
+
+def _keyset_params(values):
+    params = []
+    for i in range(len(values)):
+        params.extend(values[:i + 1])
+    return params
+
+
+def build_list_query(entity, args, paginated=True, scope=None):
+    """Build the SQL for one page of a list route.
+
+    Returns (query, params, limit). One extra row is fetched so that
+    `paginate` can tell whether another page exists. With paginated=False
+    the LIMIT is dropped (limit is None) for streaming the full result;
+    filters and `after` still apply so an interrupted export can resume.
+    `scope` is the value for the spec's `scope` condition (the owner id of
+    a timeline), which is always applied.
+    """
+    spec = LIST_QUERIES[entity]
+    limit = parse_limit(args) if paginated else None
+    conditions = []
+    params = []
+    if 'scope' in spec:
+        conditions.append(spec['scope'])
+        params.append(scope)
+
+    for name, (condition, convert) in spec['filters'].items():
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            params.append(convert(value))
+        except ValueError:
+            raise InvalidListParams(f'Invalid value for {name}')
+        conditions.append(condition)
+
+    columns = [column for column, _ in spec['order_by']]
+    after = args.get('after')
+    if after:
+        values = decode_cursor(after, len(columns))
+        op = '>' if spec['direction'] == 'ASC' else '<'
+        conditions.append(_keyset_predicate(columns, op))
+        params.extend(_keyset_params(values))
+
+    query = spec['select']
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY ' + ', '.join(f"{column} {spec['direction']}" for column in columns)
+    if paginated:
+        query += ' LIMIT %s'
+        params.append(limit + 1)
+    return query, params, limit
+
+
+def paginate(entity, rows, limit):
+    """Trim the look-ahead row and compute the cursor for the next page"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    keys = [key for _, key in LIST_QUERIES[entity]['order_by']]
+    last = rows[-1]
+    return rows, encode_cursor([last[key] for key in keys])
+
+
+# Single-row profile lookups, keyed by the entity name used in cache keys
+PROFILE_QUERIES = {
+    'admin': 'SELECT id, name, username, email, phone, created_at FROM admins WHERE id = %s',
+    'doctor': 'SELECT id, name, username, email, phone, specialization, created_at FROM doctors WHERE id = %s',
+    'patient': 'SELECT id, name, username, email, phone, address, created_at FROM patients WHERE id = %s',
+}
+
+
+def profiles_query(entity, count):
+    """PROFILE_QUERIES[entity] for `count` ids at once"""
+    return PROFILE_QUERIES[entity].replace('WHERE id = %s', f"WHERE id IN ({', '.join(['%s'] * count)})")
+
+
+# Single appointment row; names are filled in from the profile cache
+APPOINTMENT_QUERY = 'SELECT * FROM appointments WHERE id = %s'
+
+
+# The independent dashboard counts. Each yields (metric, label,
+# specialization, count) rows; the second item says whether the query takes
+# today's [start, end) range. Today's rows are grouped by doctor so the
+# per-doctor and per-specialization breakdowns and today's total all come
+# from the same index range scan on appointment_date.
+DASHBOARD_PARTS = [
+    ("SELECT 'patients' AS metric, NULL AS label, NULL AS specialization, COUNT(*) AS count FROM patients", False),
+    ("SELECT 'doctors' AS metric, NULL AS label, NULL AS specialization, COUNT(*) AS count FROM doctors", False),
+    ("SELECT 'admins' AS metric, NULL AS label, NULL AS specialization, COUNT(*) AS count FROM admins", False),
+    ("SELECT 'appointments' AS metric, NULL AS label, NULL AS specialization, COUNT(*) AS count FROM appointments",
+     False),
+    ("SELECT 'status' AS metric, status AS label, NULL AS specialization, COUNT(*) AS count "
+     "FROM appointments GROUP BY status", False),
+    ("""SELECT 'today' AS metric, a.doctor_id AS label, d.specialization, COUNT(*) AS count
+        FROM appointments a
+        LEFT JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.appointment_date >= %s AND a.appointment_date < %s
+        GROUP BY a.doctor_id, d.specialization""", True),
+]
+
+# Every dashboard figure in one round-trip for the blocking driver
+DASHBOARD_QUERY = '\nUNION ALL\n'.join(query for query, _ in DASHBOARD_PARTS)
+
+
+# Booked slots of one doctor on one day, answered from the unique
+# (doctor_id, appointment_date, booked_time) index alone
+BOOKED_SLOTS_QUERY = '''SELECT booked_time FROM appointments
+                        WHERE doctor_id = %s AND appointment_date = %s AND booked_time IS NOT NULL'''
+
+
+def booked_slots_query(count):
+    """BOOKED_SLOTS_QUERY for `count` (doctor_id, appointment_date) pairs at once"""
+    return (f'''SELECT doctor_id, appointment_date, booked_time FROM appointments
+                WHERE (doctor_id, appointment_date) IN ({', '.join(['(%s, %s)'] * count)})
+                AND booked_time IS NOT NULL''')
@@ -0,0 +1,190 @@
+"""Appointment reports served from a daily rollup instead of the live table.
+
+`appointment_daily_rollup` (migration 9) holds one row per (day, doctor,
+status) with its appointment count. Triggers on `appointments` keep it
+current on every insert and delete, and on updates that move an
+appointment to another day, doctor or status, so each write costs one
+primary-key upsert and the report routes never read `appointments`.
+
+A report loads the rollup rows of its date range (a primary-key range
+scan of roughly days x active doctors x statuses rows) into columns and
+aggregates them in memory, so any grouping over any range is one small
+query. Specializations are taken from the doctor profiles at report
+time, so a doctor's history follows a change of specialization.
+
+Usage (from the repository root, using the MySQL settings in server.py):
+
+    python reports.py rebuild [--from DATE] [--to DATE]   # backfill / repair the rollup
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+import MySQLdb
+
+ROLLUP_QUERY = '''SELECT day, doctor_id, status, appointments FROM appointment_daily_rollup
+                  WHERE day >= %s AND day <= %s AND appointments > 0'''
+
+GROUPINGS = ('day', 'week', 'month', 'doctor', 'specialization', 'status')
+
+# Appointments that were never attended; a past appointment still 'Scheduled' counts as one too
+NO_SHOW_STATUSES = ('No-Show',)
+CANCELLED_STATUSES = ('Cancelled',)
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 3660
+
+# MySQL error code for a deadlock; the rebuild retries the chunk
+ER_LOCK_DEADLOCK = 1213
+
+
+class InvalidReportParams(ValueError):
+    """Raised when a report request has a bad date range or grouping"""
+
+
+def parse_report_params(args, today=None, max_days=MAX_DAYS):
+    """(date_from, date_to, group_by) from the query string"""
+    today = today or date.today()
+    try:
+        date_to = date.fromisoformat(args['date_to']) if args.get('date_to') else today
+        date_from = (date.fromisoformat(args['date_from']) if args.get('date_from')
+                     else date_to - timedelta(days=DEFAULT_DAYS - 1))
+    except ValueError:
+        raise InvalidReportParams('date_from and date_to must be YYYY-MM-DD')
+    if date_from > date_to:
+        raise InvalidReportParams('date_from must not be after date_to')
+    if (date_to - date_from).days >= max_days:
+        raise InvalidReportParams(f'date range must be at most {max_days} days')
+
+    group_by = [name for name in args.get('group_by', 'day').split(',') if name]
+    unknown = [name for name in group_by if name not in GROUPINGS]
+    if unknown or len(set(group_by)) != len(group_by):
+        raise InvalidReportParams(f"group_by must be distinct values from: {', '.join(GROUPINGS)}")
+    return date_from, date_to, group_by
+
+
+class RollupFrame:
+    """Rollup rows of one date range, stored column-wise"""
+
+    __slots__ = ('day', 'doctor_id', 'status', 'count')
+
+    def __init__(self, rows):
+        self.day = [row['day'] for row in rows]
+        self.doctor_id = [row['doctor_id'] for row in rows]
+        self.status = [row['status'] for row in rows]
+        self.count = [int(row['appointments']) for row in rows]
+
+    def __len__(self):
+        return len(self.count)
+
+    def key_column(self, grouping, specializations):
+        """One grouping key per row, computed once per distinct input value"""
+        if grouping == 'doctor':
+            return self.doctor_id
+        if grouping == 'status':
+            return self.status
+        if grouping == 'specialization':
+            lookup = {doctor_id: specializations.get(doctor_id) or 'Unknown' for doctor_id in set(self.doctor_id)}
+            return [lookup[doctor_id] for doctor_id in self.doctor_id]
+        if grouping == 'week':
+            lookup = {day: (day - timedelta(days=day.weekday())).isoformat() for day in set(self.day)}
+        elif grouping == 'month':
+            lookup = {day: day.strftime('%Y-%m') for day in set(self.day)}
+        else:
+            lookup = {day: day.isoformat() for day in set(self.day)}
+        return [lookup[day] for day in self.day]
+
+    def group_sum(self, group_by, specializations, values):
+        """{key tuple: sum of `values`} over the rows"""
+        keys = zip(*(self.key_column(grouping, specializations) for grouping in group_by)) if group_by \
+            else [()] * len(self)
+        totals = {}
+        for key, value in zip(keys, values):
+            if value:
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+def _rows(group_by, totals_by_measure):
+    keys = sorted(set().union(*totals_by_measure.values()))
+    return [dict(zip(group_by, key), **{measure: totals.get(key, 0)
+                                         for measure, totals in totals_by_measure.items()})
+            for key in keys]
+
+
+def appointment_counts(frame, group_by, specializations):
+    """Appointments per group, all statuses"""
+    return _rows(group_by, {'appointments': frame.group_sum(group_by, specializations, frame.count)})
+
+
+def no_show_rates(frame, group_by, specializations, today=None, no_show_statuses=NO_SHOW_STATUSES):
+    """Per group: past, non-cancelled appointments, how many were missed, and the rate"""
+    today = today or date.today()
+    due = [count if day < today and status not in CANCELLED_STATUSES else 0
+           for day, status, count in zip(frame.day, frame.status, frame.count)]
+    missed = [count if status in no_show_statuses or status == 'Scheduled' else 0
+              for status, count in zip(frame.status, due)]
+    rows = _rows(group_by, {'appointments': frame.group_sum(group_by, specializations, due),
+                            'no_shows': frame.group_sum(group_by, specializations, missed)})
+    for row in rows:
+        row['no_show_rate'] = round(row['no_shows'] / row['appointments'], 4) if row['appointments'] else None
+    return rows
+
+
+def rebuild(conn, date_from, date_to, chunk_days=31, retries=3):
+    """Recompute the rollup for [date_from, date_to] from `appointments`, one chunk per transaction"""
+    cursor = conn.cursor()
+    rebuilt = 0
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=chunk_days - 1), date_to)
+        for attempt in range(retries):
+            try:
+                cursor.execute('DELETE FROM appointment_daily_rollup WHERE day >= %s AND day <= %s', (start, end))
+                # Locking read: writes in the chunk wait for the commit, then their triggers apply on top
+                cursor.execute('''INSERT INTO appointment_daily_rollup (day, doctor_id, status, appointments)
+                                  SELECT appointment_date, doctor_id, status, COUNT(*) FROM appointments
+                                  WHERE appointment_date >= %s AND appointment_date <= %s
+                                  GROUP BY appointment_date, doctor_id, status''', (start, end))
+                rebuilt += cursor.rowcount
+                conn.commit()
+                break
+            except MySQLdb.OperationalError as e:
+                conn.rollback()
+                if e.args[0] != ER_LOCK_DEADLOCK or attempt == retries - 1:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+        start = end + timedelta(days=1)
+    return rebuilt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Maintain the appointment reporting rollup')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rb = sub.add_parser('rebuild', help='recompute the rollup from appointments')
+    rb.add_argument('--from', dest='date_from', type=date.fromisoformat, help='first day (default: earliest)')
+    rb.add_argument('--to', dest='date_to', type=date.fromisoformat, help='last day (default: latest)')
+    rb.add_argument('--chunk-days', type=int, default=31)
+    args = parser.parse_args(argv)
+
+    from server import connect_mysql
+    conn = connect_mysql()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(appointment_date), MAX(appointment_date) FROM appointments')
+        earliest, latest = cursor.fetchone()
+        date_from = args.date_from or earliest
+        date_to = args.date_to or latest
+        if date_from is None or date_to is None:
+            print('No appointments to roll up')
+            return 0
+        rows = rebuild(conn, date_from, date_to, args.chunk_days)
+        print(f'Rebuilt {date_from} .. {date_to}: {rows} rollup rows')
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Per-doctor, per-day slot bookkeeping for appointment conflict checks.
+
+A doctor's day is a fixed grid of slots; the booked slots of one
+(doctor, day) are kept as a bitmask, so availability is a handful of bit
+operations. Days are loaded lazily from the database and dropped after
+`ttl` seconds or when the index exceeds `max_days` entries. The unique
+key on (doctor_id, appointment_date, booked_time) in the database is
+what actually prevents double booking; this index only answers quickly.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as day_time, timedelta
+
+# Every status an appointment may have; appointments in FREE_STATUSES no longer hold their slot
+APPOINTMENT_STATUSES = ('Scheduled', 'Completed', 'Cancelled', 'No-Show')
+FREE_STATUSES = {'Cancelled'}
+
+
+class SlotError(ValueError):
+    """The requested date/time is not a bookable slot"""
+
+
+def to_seconds(value):
+    """Seconds since midnight from a TIME column (timedelta), time or 'HH:MM[:SS]' string; SlotError otherwise"""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, str):
+        parts = value.split(':')
+        if len(parts) not in (2, 3):
+            raise SlotError(f'Invalid time: {value}')
+        try:
+            hours, minutes, seconds = [int(part) for part in parts] + [0] * (3 - len(parts))
+        except ValueError:
+            raise SlotError(f'Invalid time: {value}')
+        if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+            raise SlotError(f'Invalid time: {value}')
+        return hours * 3600 + minutes * 60 + seconds
+    if isinstance(value, day_time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    raise SlotError(f'Invalid time: {value!r}')
+
+
+def to_minutes(value):
+    """Minutes since midnight, seconds dropped"""
+    return to_seconds(value) // 60
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise SlotError(f'Invalid date: {value}')
+
+
+class SlotIndex:
+    def __init__(self, load, day_start='09:00', day_end='17:00', slot_minutes=30,
+                 horizon_days=90, ttl=300, max_days=500000):
+        self._load = load
+        self.start = to_minutes(day_start)
+        self.end = to_minutes(day_end)
+        self.slot_minutes = slot_minutes
+        self.horizon_days = horizon_days
+        self.ttl = ttl
+        self.max_days = max_days
+        self.slot_count = (self.end - self.start) // slot_minutes
+        self.labels = [f'{(self.start + i * slot_minutes) // 60:02d}:{(self.start + i * slot_minutes) % 60:02d}'
+                       for i in range(self.slot_count)]
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def slot_of(self, appointment_time):
+        """Index of the slot starting at `appointment_time`; SlotError if off the grid"""
+        seconds = to_seconds(appointment_time)
+        minutes = seconds // 60
+        offset = minutes - self.start
+        # booked_time keeps the seconds, so 09:00:30 would escape the unique key on 09:00:00
+        if seconds % 60 or offset < 0 or minutes >= self.end or offset % self.slot_minutes:
+            raise SlotError(f'Appointments start on {self.slot_minutes}-minute slots '
+                            f'between {self.labels[0]} and {self.labels[-1]}')
+        return offset // self.slot_minutes
+
+    def check_day(self, day, today=None):
+        day = to_date(day)
+        today = today or date.today()
+        if day < today or day > today + timedelta(days=self.horizon_days):
+            raise SlotError(f'Date must be within the next {self.horizon_days} days')
+        return day
+
+    def _mask(self, doctor_id, day):
+        key = (doctor_id, day)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._days.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._days.move_to_end(key)
+                return entry[1]
+
+        mask = self._build_mask(self._load(doctor_id, day))
+        with self._lock:
+            self.loads += 1
+            self._store(key, now, mask)
+        return mask
+
+    def _build_mask(self, booked_times):
+        mask = 0
+        for appointment_time in booked_times:
+            try:
+                mask |= 1 << self.slot_of(appointment_time)
+            except SlotError:
+                # Legacy rows off the grid block the slot they fall into
+                offset = to_minutes(appointment_time) - self.start
+                if 0 <= offset < self.slot_count * self.slot_minutes:
+                    mask |= 1 << (offset // self.slot_minutes)
+        return mask
+
+    def _store(self, key, loaded_at, mask):
+        # Called with self._lock held
+        self._days[key] = (loaded_at, mask)
+        self._days.move_to_end(key)
+        while len(self._days) > self.max_days:
+            self._days.popitem(last=False)
+
+    def unloaded(self, days):
+        """The (doctor_id, day) pairs of `days` with no fresh entry, for loading in bulk"""
+        now = time.monotonic()
+        keys = {(doctor_id, to_date(day)) for doctor_id, day in days}
+        with self._lock:
+            return [key for key in keys if key not in self._days or now - self._days[key][0] >= self.ttl]
+
+    def prime(self, booked):
+        """Cache {(doctor_id, day): [booked times]} read by the caller in one query"""
+        now = time.monotonic()
+        masks = {(doctor_id, to_date(day)): self._build_mask(times) for (doctor_id, day), times in booked.items()}
+        with self._lock:
+            self.loads += len(masks)
+            for key, mask in masks.items():
+                self._store(key, now, mask)
+
+    def is_booked(self, doctor_id, day, appointment_time):
+        return bool(self._mask(doctor_id, to_date(day)) >> self.slot_of(appointment_time) & 1)
+
+    def free_slots(self, doctor_id, day):
+        mask = self._mask(doctor_id, to_date(day))
+        return [label for i, label in enumerate(self.labels) if not mask >> i & 1]
+
+    def _update(self, doctor_id, day, appointment_time, booked):
+        key = (doctor_id, to_date(day))
+        try:
+            bit = 1 << self.slot_of(appointment_time)
+        except SlotError:
+            self.forget(doctor_id, day)
+            return
+        with self._lock:
+            entry = self._days.get(key)
+            # Days that are not loaded will be read fresh from the database
+            if entry is not None:
+                self._days[key] = (entry[0], entry[1] | bit if booked else entry[1] & ~bit)
+
+    def book(self, doctor_id, day, appointment_time):
+        self._update(doctor_id, day, appointment_time, True)
+
+    def release(self, doctor_id, day, appointment_time):
+        self._update(doctor_id, day, appointment_time, False)
+
+    def forget(self, doctor_id, day):
+        with self._lock:
+            self._days.pop((doctor_id, to_date(day)), None)
+
+    def stats(self):
+        with self._lock:
+            return {'days_cached': len(self._days), 'loads': self.loads,
+                    'slot_minutes': self.slot_minutes, 'horizon_days': self.horizon_days}
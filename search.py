@@ -0,0 +1,131 @@
+"""Ranked, bounded search over patients and doctors.
+
+Two passes, each one statement:
+
+    prefix  name / username / phone starting with the query, from the
+            B-tree indexes (one LIMITed range scan per column)
+    fuzzy   only when the prefix pass did not fill the page: the ngram
+            FULLTEXT index (migration 7) ranked by relevance, which finds
+            substrings and partial overlaps ("mith", "smiht" -> "Smith")
+
+Prefix hits rank above fuzzy ones: a username prefix first, then a phone
+or name prefix. Doctor searches gather up to SEARCH_FACET_CANDIDATES
+matches regardless of ?specialization= so the facet counts show every
+specialization the query hits; the filter and limit are applied to that
+candidate set.
+"""
+from collections import Counter
+
+from queries import InvalidListParams
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MAX_QUERY_LENGTH = 100
+# Below this the ngram index matches on one bigram, i.e. most of the table
+MIN_FUZZY_LENGTH = 3
+FACET_CANDIDATES = 500
+
+SEARCH_SPECS = {
+    'patients': {
+        'columns': 'id, name, username, email, phone, address, created_at',
+        'fulltext': 'name, username, phone',
+        'facets': (),
+    },
+    'doctors': {
+        'columns': 'id, name, username, email, phone, specialization, created_at',
+        'fulltext': 'name, username, specialization',
+        'facets': ('specialization',),
+    },
+}
+
+# Rank of each prefix branch; fuzzy hits (scored by FULLTEXT relevance) always follow prefix hits
+PREFIX_RANKS = (('username', 3), ('phone', 2), ('name', 2))
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_search(args):
+    """(q, limit, fuzzy, specialization) from the query string; InvalidListParams when invalid"""
+    q = ' '.join(args.get('q', '').split())
+    if not q:
+        raise InvalidListParams('q is required')
+    if len(q) > MAX_QUERY_LENGTH:
+        raise InvalidListParams(f'q must be at most {MAX_QUERY_LENGTH} characters')
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise InvalidListParams('limit must be an integer')
+    if limit < 1 or limit > MAX_LIMIT:
+        raise InvalidListParams(f'limit must be between 1 and {MAX_LIMIT}')
+    fuzzy = args.get('fuzzy', '1') != '0'
+    return q, limit, fuzzy, args.get('specialization') or None
+
+
+def prefix_query(entity, q, limit):
+    """Rows matching on a column prefix, best rank first"""
+    spec = SEARCH_SPECS[entity]
+    pattern = escape_like(q) + '%'
+    branches = []
+    params = []
+    for column, rank in PREFIX_RANKS:
+        # Usernames have no spaces and phone numbers start with a digit or +
+        if column == 'username' and ' ' in q or column == 'phone' and not (q[0].isdigit() or q[0] == '+'):
+            continue
+        branches.append(f'(SELECT id, {rank} AS score FROM {entity} WHERE {column} LIKE %s '
+                        f'ORDER BY {column} LIMIT %s)')
+        params.extend([pattern, limit])
+    query = f'''SELECT {', '.join('t.' + column for column in spec['columns'].split(', '))}, hits.score
+                FROM (SELECT id, MAX(score) AS score
+                      FROM ({' UNION ALL '.join(branches)}) ranked
+                      GROUP BY id ORDER BY score DESC, id LIMIT %s) hits
+                JOIN {entity} t ON t.id = hits.id
+                ORDER BY hits.score DESC, t.name, t.id'''
+    params.append(limit)
+    return query, params
+
+
+def fuzzy_query(entity, q, limit, exclude_ids):
+    spec = SEARCH_SPECS[entity]
+    params = [q, q]
+    query = (f"SELECT {spec['columns']}, MATCH({spec['fulltext']}) AGAINST (%s) AS score "
+             f"FROM {entity} WHERE MATCH({spec['fulltext']}) AGAINST (%s)")
+    if exclude_ids:
+        query += f" AND id NOT IN ({', '.join(['%s'] * len(exclude_ids))})"
+        params.extend(exclude_ids)
+    query += ' ORDER BY score DESC, id LIMIT %s'
+    params.append(limit)
+    return query, params
+
+
+def run_search(cursor, entity, args, fetch_rows, facet_candidates=FACET_CANDIDATES):
+    """Execute a search; `fetch_rows(cursor, query, params)` returns converted dict rows.
+
+    Returns {'results': [...], 'facets': {...}} with each result carrying
+    `match` ('prefix' or 'fuzzy') and a `score`.
+    """
+    q, limit, fuzzy, specialization = parse_search(args)
+    spec = SEARCH_SPECS[entity]
+    wanted = facet_candidates if spec['facets'] else limit
+
+    rows = fetch_rows(cursor, *prefix_query(entity, q, wanted))
+    for row in rows:
+        row['match'] = 'prefix'
+    if fuzzy and len(rows) < wanted and len(q) >= MIN_FUZZY_LENGTH:
+        more = fetch_rows(cursor, *fuzzy_query(entity, q, wanted - len(rows), [row['id'] for row in rows]))
+        for row in more:
+            row['match'] = 'fuzzy'
+        rows.extend(more)
+
+    facets = {facet: dict(Counter(row[facet] for row in rows).most_common()) for facet in spec['facets']}
+    truncated = len(rows) >= facet_candidates
+    if specialization and 'specialization' in spec['facets']:
+        rows = [row for row in rows if row['specialization'] == specialization]
+    for row in rows:
+        row['score'] = float(row['score'])
+    result = {'results': rows[:limit]}
+    if spec['facets']:
+        result['facets'] = facets
+        result['facets_truncated'] = truncated
+    return result
@@ -0,0 +1,129 @@
+import json
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# MySQL column type codes (MySQLdb.constants.FIELD_TYPE), copied here so the
+# encoder can be built and benchmarked without a database driver installed
+FIELD_DECIMAL = 0
+FIELD_TIMESTAMP = 7
+FIELD_DATE = 10
+FIELD_TIME = 11
+FIELD_DATETIME = 12
+FIELD_NEWDATE = 14
+FIELD_NEWDECIMAL = 246
+
+
+def format_timedelta(value):
+    """MySQL TIME columns come back as timedelta; render them as HH:MM:SS"""
+    total_seconds = int(value.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _time(value):
+    # Some drivers hand back datetime.time instead of timedelta for TIME
+    if isinstance(value, timedelta):
+        return format_timedelta(value)
+    return value.strftime('%H:%M:%S')
+
+
+COLUMN_CONVERTERS = {
+    FIELD_DECIMAL: str,
+    FIELD_NEWDECIMAL: str,
+    FIELD_TIMESTAMP: _isoformat,
+    FIELD_DATE: _isoformat,
+    FIELD_NEWDATE: _isoformat,
+    FIELD_DATETIME: _isoformat,
+    FIELD_TIME: _time,
+}
+
+
+def row_converter(description):
+    """Compile a converter for rows of one result set.
+
+    The cursor description is inspected once per query and only the columns
+    whose type needs conversion are touched for each row. Dict rows are
+    converted in place and returned.
+    """
+    conversions = []
+    for name, type_code, *_ in description or ():
+        convert_value = COLUMN_CONVERTERS.get(type_code)
+        if convert_value is not None:
+            conversions.append((name, convert_value))
+
+    if not conversions:
+        return lambda row: row
+
+    def convert(row):
+        for name, convert_value in conversions:
+            value = row[name]
+            if value is not None:
+                row[name] = convert_value(value)
+        return row
+
+    return convert
+
+
+def convert_row(cursor, row):
+    """Convert a single row fetched from `cursor` to JSON-ready values"""
+    if row is None:
+        return None
+    return row_converter(cursor.description)(row)
+
+
+def convert_rows(cursor, rows):
+    """Convert every row fetched from `cursor` to JSON-ready values"""
+    convert = row_converter(cursor.description)
+    return [convert(row) for row in rows]
+
+
+def _default(obj):
+    # Only reached for values that did not go through a row converter
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, time):
+        return obj.strftime('%H:%M:%S')
+    if isinstance(obj, timedelta):
+        return format_timedelta(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj):
+    """Encode `obj` straight to JSON bytes with the fastest available backend"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when it is installed"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault('default', _default)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1,163 @@
+"""Production entry point: the API behind gunicorn instead of Flask's dev server.
+
+    python serve.py                      # SERVER_MODE from server.py (prefork)
+    python serve.py --mode async --workers 8 --bind 0.0.0.0:8000
+
+Modes:
+    prefork  gunicorn master + `gthread` workers: each worker is a process
+             with a thread pool, and keep-alive connections are held open
+             without tying up a thread.
+    async    gunicorn master + uvicorn workers: an event loop per worker
+             owns the sockets (cheap idle keep-alive, slow clients). The
+             appointment reads and dashboard run natively on aiomysql
+             (async_server.py); the WSGI app runs on asgiref's thread pool.
+
+With SERVER_PRELOAD the app is imported once in the master and workers
+are forked from it, so they share its memory copy-on-write. Anything
+that must not cross a fork (the log writer thread, pooled connections)
+is reset in post_fork.
+
+Database connections: every worker has its own pool (plus an aiomysql
+pool in async mode and the audit writer's connection), so the pools are
+cut down per worker until workers x connections fits in
+MYSQL_MAX_CONNECTIONS less MYSQL_RESERVED_CONNECTIONS. Startup fails if
+even one connection per pool does not fit; lower --workers or raise the
+server's max_connections (and the setting) together.
+
+Graceful reload: `kill -HUP <master pid>` starts new workers and lets the
+old ones finish in-flight requests within SERVER_GRACEFUL_TIMEOUT. With
+preload, HUP reuses the already-imported code; to deploy new code without
+dropping connections use `kill -USR2` (new master) and then `-TERM` the
+old master.
+"""
+import argparse
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+MODES = {
+    'prefork': 'gthread',
+    'async': 'uvicorn.workers.UvicornWorker',
+}
+
+
+def default_workers(mode, cores=None):
+    cores = cores or os.cpu_count() or 1
+    # gthread workers wait on MySQL most of the time, so oversubscribe the cores;
+    # an event loop per core is enough for async workers
+    return 2 * cores + 1 if mode == 'prefork' else cores
+
+
+def default_threads(pool_max_size):
+    # One pooled connection per thread, leaving headroom for streamed responses
+    return max(2, min(8, pool_max_size // 2))
+
+
+def connection_budget(config, mode, workers):
+    """(pool, async pool) max sizes per worker so that all workers fit in MYSQL_MAX_CONNECTIONS"""
+    available = (config['MYSQL_MAX_CONNECTIONS'] - config['MYSQL_RESERVED_CONNECTIONS']) // workers
+    if config['AUDIT_ENABLED']:
+        available -= 1
+    uses_async = mode == 'async' and config['SERVER_ASYNC_ROUTES']
+    pool_size = config['MYSQL_POOL_MAX_SIZE']
+    async_size = config['ASYNC_POOL_MAX_SIZE'] if uses_async else 0
+    if pool_size + async_size > available:
+        # Shrink both pools in proportion to their configured sizes
+        async_size = async_size * available // (pool_size + async_size)
+        pool_size = available - async_size
+    if pool_size < 1 or (uses_async and async_size < 1):
+        raise SystemExit(f"{workers} workers do not fit in MYSQL_MAX_CONNECTIONS={config['MYSQL_MAX_CONNECTIONS']} "
+                         f"(reserving {config['MYSQL_RESERVED_CONNECTIONS']}); use fewer workers")
+    return pool_size, async_size
+
+
+def post_fork(server, worker):
+    from server import app, log_queue_handler, log_listener, pool
+    from log_pipeline import restart_listener
+    restart_listener(log_queue_handler, log_listener)
+    mode = 'async' if server.cfg.worker_class_str == MODES['async'] else 'prefork'
+    pool_size, async_size = connection_budget(app.config, mode, server.cfg.workers)
+    pool.after_fork(pool_size)
+    app.config['MYSQL_POOL_MAX_SIZE'] = pool_size
+    if async_size:
+        app.config['ASYNC_POOL_MAX_SIZE'] = async_size
+        app.config['ASYNC_POOL_MIN_SIZE'] = min(app.config['ASYNC_POOL_MIN_SIZE'], async_size)
+
+
+def worker_exit(server, worker):
+    from server import log_listener, pool, audit_writer, app
+    from log_pipeline import stop_listener
+    # Workers leave through os._exit, so atexit never runs here; spilled events still need the log
+    audit_writer.close(app.config['AUDIT_CLOSE_TIMEOUT'])
+    pool.close()
+    stop_listener(log_listener)
+
+
+class APIServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from server import app
+        if self.options['worker_class'] == MODES['async']:
+            if app.config['SERVER_ASYNC_ROUTES']:
+                from async_server import dispatcher
+                return dispatcher(app)
+            from asgiref.wsgi import WsgiToAsgi
+            return WsgiToAsgi(app)
+        return app
+
+
+def build_options(config, mode=None, bind=None, workers=None, threads=None):
+    mode = mode or config['SERVER_MODE']
+    if mode not in MODES:
+        raise SystemExit(f'Unknown server mode: {mode} (expected one of {", ".join(MODES)})')
+    workers = workers or config['SERVER_WORKERS'] or default_workers(mode)
+    # Fail here rather than in every forked worker
+    pool_size, async_size = connection_budget(config, mode, workers)
+    options = {
+        'bind': bind or config['SERVER_BIND'],
+        'worker_class': MODES[mode],
+        'workers': workers,
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS'] // 10,
+        'preload_app': config['SERVER_PRELOAD'],
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        # The app's own JSON logs already cover requests
+        'accesslog': None,
+    }
+    if mode == 'prefork':
+        options['threads'] = threads or config['SERVER_THREADS'] or default_threads(pool_size)
+    return options, pool_size, async_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the hospital API under gunicorn')
+    parser.add_argument('--mode', choices=sorted(MODES))
+    parser.add_argument('--bind')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int, help='threads per prefork worker')
+    args = parser.parse_args(argv)
+
+    from server import app
+    options, pool_size, async_size = build_options(app.config, args.mode, args.bind, args.workers, args.threads)
+    print(f"Serving on {options['bind']}: {options['workers']} x {options['worker_class']}"
+          + (f", {options['threads']} threads each" if 'threads' in options else '')
+          + f", {pool_size} pooled" + (f" + {async_size} async" if async_size else '') + " DB connections each",
+          file=sys.stderr)
+    APIServer(options).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,81 @@
-from flask import Flask, request, jsonify, session
-from flask_mysqldb import MySQL
+from flask import Flask, request, jsonify, session, Response, stream_with_context, g
+import MySQLdb
 import MySQLdb.cursors
+from MySQLdb.constants import CLIENT
+import os
 import re
-from datetime import datetime, date, time, timedelta
-import hashlib
+import time
+from functools import wraps
+from datetime import datetime, date, timedelta
 import logging
-from flask_cors import CORS
+import atexit
 import json
+from flask_cors import CORS
+from queries import build_list_query, paginate, InvalidListParams, PROFILE_QUERIES, profiles_query, APPOINTMENT_QUERY, DASHBOARD_QUERY, BOOKED_SLOTS_QUERY
+from serializers import FastJSONProvider, convert_row, convert_rows, row_converter, dumps_bytes
+from db import ConnectionPool, UnitOfWork, READ_WRITE, READ_ONLY, AUTOCOMMIT
+from cache import create_cache
+from dashboard import DashboardCounters, summarize
+from identity import ROLE_TABLES, claim_username, find_account, is_duplicate
+from log_pipeline import setup_logging, OperationSampler
+from scheduling import SlotIndex, SlotError, FREE_STATUSES, to_date, to_seconds
+from passwords import PasswordHasher, HasherBusy
+from tokens import TokenSigner, TokenError, parse_key_ring
+from metrics import Metrics, TimedConnection
+from profiler import QueryProfiler
+from http_cache import TableVersions, VERSIONS_QUERY, COMPRESSIBLE_TYPES, validators, not_modified, choose_encoding, compress
+from writes import update_by_id, delete_account, write_appointment, is_referenced
+from audit import AuditWriter, audit_event, diff, created, deleted
+from search import run_search
+from reports import (RollupFrame, InvalidReportParams, ROLLUP_QUERY, parse_report_params, appointment_counts,
+                     no_show_rates)
+from bulk import BatchError, batch_items, create_patients, create_appointments, update_appointment_statuses
 
 app = Flask(__name__)
-app.secret_key = 'hospital_management_secret_key_2025'
+# Session cookie key from the environment; a random one (sessions end on restart) when unset
+app.secret_key = os.environ.get('HOSPITAL_SECRET_KEY') or os.urandom(32)
 
 # Initialize CORS
 CORS(app) 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('hospital_api.log'),
-        logging.StreamHandler()
-    ]
+# Logging configuration
+app.config['LOG_FILE'] = 'hospital_api.log'
+app.config['LOG_ROTATION'] = 'size'            # 'size' or 'time'
+app.config['LOG_MAX_BYTES'] = 50 * 1024 * 1024
+app.config['LOG_ROTATE_WHEN'] = 'midnight'
+app.config['LOG_BACKUP_COUNT'] = 10
+app.config['LOG_CONSOLE'] = True
+app.config['LOG_ECHO_STDOUT'] = False          # the old extra print() in log_operation
+# Fraction of log_operation calls kept per operation; writes are always logged
+app.config['LOG_SAMPLE_RATES'] = {'GET': 0.1, 'GET_ALL': 0.1, 'GET_STATS': 0.01, 'GET_AVAILABILITY': 0.01}
+
+# Non-blocking logging: records go on a queue, a background thread writes them as JSON
+log_queue_handler, log_listener = setup_logging(
+    app.config['LOG_FILE'],
+    rotation=app.config['LOG_ROTATION'],
+    max_bytes=app.config['LOG_MAX_BYTES'],
+    backup_count=app.config['LOG_BACKUP_COUNT'],
+    when=app.config['LOG_ROTATE_WHEN'],
+    console=app.config['LOG_CONSOLE'],
+    level=logging.INFO
 )
+log_sampler = OperationSampler(app.config['LOG_SAMPLE_RATES'])
+
+# Serving (see serve.py): 'prefork' = gunicorn gthread workers, 'async' = gunicorn + uvicorn workers
+app.config['SERVER_MODE'] = 'prefork'
+app.config['SERVER_BIND'] = '0.0.0.0:5000'
+app.config['SERVER_WORKERS'] = None            # None = sized from the CPU count
+app.config['SERVER_THREADS'] = None            # per prefork worker; None = sized from the pool
+app.config['SERVER_KEEPALIVE'] = 5
+app.config['SERVER_TIMEOUT'] = 30
+app.config['SERVER_GRACEFUL_TIMEOUT'] = 30
+app.config['SERVER_MAX_REQUESTS'] = 10000      # recycle workers to bound memory growth
+app.config['SERVER_PRELOAD'] = True
+app.config['SERVER_ASYNC_ROUTES'] = True       # async mode: serve appointment/dashboard reads from async_server
+app.config['DEV_SERVER_DEBUG'] = False         # Werkzeug debugger/reloader for `python server.py`
+
+# Rows fetched from the server-side cursor per NDJSON chunk
+STREAM_BATCH_SIZE = 1000
 
 # MySQL Configuration
 app.config['MYSQL_HOST'] = 'localhost'
@@ -30,63 +83,529 @@ app.config['MYSQL_USER'] = 'root'
 app.config['MYSQL_PASSWORD'] = 'Akashbr'
 app.config['MYSQL_DB'] = 'hospital_management'
 
-mysql = MySQL(app)
-
-# Custom JSON Encoder
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, date):
-            return obj.isoformat()
-        if isinstance(obj, time):
-            return obj.strftime('%H:%M:%S')
-        if isinstance(obj, timedelta):
-            # Convert timedelta to time string (HH:MM:SS)
-            total_seconds = int(obj.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            seconds = total_seconds % 60
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        return super().default(obj)
-
-# Set the custom JSON encoder
-app.json_encoder = CustomJSONEncoder
-
-# Helper function to serialize data manually
-def serialize_data(data):
-    """Manually serialize data to handle datetime/timedelta objects"""
-    if isinstance(data, dict):
-        return {key: serialize_data(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [serialize_data(item) for item in data]
-    elif isinstance(data, datetime):
-        return data.isoformat()
-    elif isinstance(data, date):
-        return data.isoformat()
-    elif isinstance(data, time):
-        return data.strftime('%H:%M:%S')
-    elif isinstance(data, timedelta):
-        total_seconds = int(data.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-    else:
-        return data
+# Connection pool configuration
+app.config['MYSQL_POOL_MIN_SIZE'] = 2
+app.config['MYSQL_POOL_MAX_SIZE'] = 20
+app.config['MYSQL_POOL_TIMEOUT'] = 5.0
+app.config['MYSQL_POOL_MAX_AGE'] = 3600
+
+# aiomysql pool of the async routes (async_server.py), per worker; sized for in-flight requests
+app.config['ASYNC_POOL_MIN_SIZE'] = 2
+app.config['ASYNC_POOL_MAX_SIZE'] = 50
+
+# The MySQL server's max_connections, shared by all gunicorn workers: serve.py shrinks the pools
+# above so workers x (pool + async pool + audit writer) stays within it, less the reserve
+app.config['MYSQL_MAX_CONNECTIONS'] = 151
+app.config['MYSQL_RESERVED_CONNECTIONS'] = 10   # migrations, bulk_io, reports and admin sessions
+
+def connect_mysql():
+    return MySQLdb.connect(
+        host=app.config['MYSQL_HOST'],
+        user=app.config['MYSQL_USER'],
+        passwd=app.config['MYSQL_PASSWORD'],
+        db=app.config['MYSQL_DB'],
+        charset='utf8mb4',
+        # UPDATE rowcount = rows matched, not rows changed, so it can answer "not found" (see writes.py)
+        client_flag=CLIENT.FOUND_ROWS
+    )
+
+pool = ConnectionPool(
+    connect_mysql,
+    min_size=app.config['MYSQL_POOL_MIN_SIZE'],
+    max_size=app.config['MYSQL_POOL_MAX_SIZE'],
+    timeout=app.config['MYSQL_POOL_TIMEOUT'],
+    max_age=app.config['MYSQL_POOL_MAX_AGE']
+)
+
+# Per-route request/DB metrics, exported at /metrics
+metrics = Metrics()
+
+# SQL profiling (development/CI only): per-request statement log, X-Query-Report header, /debug/queries
+app.config['SQL_PROFILE'] = False
+app.config['SQL_PROFILE_SLOW_MS'] = 100
+app.config['SQL_PROFILE_MAX_QUERIES'] = 10
+app.config['SQL_PROFILE_REPEAT_THRESHOLD'] = 3
+
+query_profiler = QueryProfiler(
+    slow_ms=app.config['SQL_PROFILE_SLOW_MS'],
+    max_queries=app.config['SQL_PROFILE_MAX_QUERIES'],
+    repeat_threshold=app.config['SQL_PROFILE_REPEAT_THRESHOLD']
+)
+
+def record_query(query, args, seconds, rowcount):
+    """Attribute one cursor.execute to the current request"""
+    g.db_queries = g.get('db_queries', 0) + 1
+    g.db_seconds = g.get('db_seconds', 0.0) + seconds
+    if app.config['SQL_PROFILE']:
+        g.setdefault('query_log', []).append((query, args, seconds, rowcount))
+
+def get_db():
+    """Check out one pooled connection per request; it is returned on teardown"""
+    if 'db' not in g:
+        g.db = TimedConnection(pool.acquire(), record_query)
+        g.db_endpoint = request.endpoint
+        uow = g.get('uow')
+        if uow is not None:
+            uow.begin(g.db)
+    return g.db
+
+def get_cursor(cursor_class=MySQLdb.cursors.DictCursor):
+    """The request's cursor of `cursor_class`: created on first use, reused after, closed on teardown"""
+    cursors = g.setdefault('cursors', {})
+    cursor = cursors.get(cursor_class)
+    if cursor is None:
+        cursor = cursors[cursor_class] = get_db().cursor(cursor_class)
+    return cursor
+
+# Routes run as one unit of work (db.UnitOfWork): committed when they answer < 400, rolled back otherwise
+app.config['DB_AUTOCOMMIT_READS'] = True       # off: AUTOCOMMIT routes run READ_ONLY instead
+
+def end_transaction(success):
+    """End the request's unit of work, if it reached the database, and record how it ended"""
+    uow = g.get('uow')
+    if uow is None or not uow.active:
+        return
+    seconds = uow.end(success)
+    g.db_clean_at = g.get('db_queries', 0)
+    metrics.observe_transaction(g.get('db_endpoint'), uow.outcome, seconds)
+
+def transaction(mode=READ_WRITE):
+    """Run the view as one unit of work; the connection (and transaction) start on first use"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            unit_mode = READ_ONLY if mode == AUTOCOMMIT and not app.config['DB_AUTOCOMMIT_READS'] else mode
+            uow = g.uow = UnitOfWork(unit_mode)
+            if 'db' in g:
+                uow.begin(g.db)
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                end_transaction(False)
+                raise
+            # A streamed body still reads from the connection; release_db ends its unit of work
+            if not response.is_streamed:
+                try:
+                    end_transaction(response.status_code < 400)
+                except MySQLdb.Error as e:
+                    app.logger.error(f"Commit error: {str(e)}")
+                    return jsonify({'error': 'Internal server error'}), 500
+            return response
+        return wrapper
+    return decorator
+
+@app.teardown_appcontext
+def release_db(exception):
+    try:
+        end_transaction(exception is None)
+    except MySQLdb.Error as e:
+        app.logger.error(f"Commit error: {str(e)}")
+    conn = g.pop('db', None)
+    if conn is not None:
+        for cursor in g.pop('cursors', {}).values():
+            cursor.close()
+        # Anything still open was created with get_db().cursor() and never closed
+        leaked = conn.close_cursors()
+        if leaked:
+            metrics.observe_leaked_cursors(g.get('db_endpoint'), leaked)
+        # Skip the pool's ROLLBACK when the unit of work ended and nothing ran after it
+        clean = g.get('db_clean_at') == g.get('db_queries', 0)
+        pool.release(conn.raw, rollback=not clean)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe(request.endpoint, response.status_code, time.perf_counter() - started,
+                        None if response.is_streamed else response.content_length,
+                        g.get('db_queries', 0), g.get('db_seconds', 0.0))
+    if app.config['SQL_PROFILE'] and request.endpoint != 'get_query_profile':
+        report = query_profiler.analyze(g.get('query_log', []))
+        query_profiler.record(request.endpoint, report)
+        response.headers['X-Query-Report'] = query_profiler.header(report)
+        if query_profiler.flagged(report):
+            app.logger.warning(f"Query report for {request.endpoint}: {query_profiler.header(report)}",
+                               extra={'operation': 'QUERY_REPORT', 'data': {
+                                   'endpoint': request.endpoint, 'duplicates': report['duplicates'],
+                                   'repeats': report['repeats'], 'slow': report['slow']}})
+    return response
+
+# Profile cache configuration ('local' per process, or 'redis' shared by all workers)
+app.config['PROFILE_CACHE_BACKEND'] = 'local'
+app.config['PROFILE_CACHE_SIZE'] = 10000
+app.config['PROFILE_CACHE_TTL'] = 300
+app.config['PROFILE_CACHE_REDIS_URL'] = 'redis://localhost:6379/0'
+
+profile_cache = create_cache(
+    app.config['PROFILE_CACHE_BACKEND'],
+    maxsize=app.config['PROFILE_CACHE_SIZE'],
+    ttl=app.config['PROFILE_CACHE_TTL'],
+    redis_url=app.config['PROFILE_CACHE_REDIS_URL']
+)
+
+def load_profile(entity, entity_id):
+    """Read-through lookup of an admin/doctor/patient profile row"""
+    key = f'{entity}:{entity_id}'
+    profile = profile_cache.get(key)
+    if profile is not None:
+        return profile
+    
+    cursor = get_cursor()
+    cursor.execute(PROFILE_QUERIES[entity], (entity_id,))
+    profile = convert_row(cursor, cursor.fetchone())
+    if profile is not None:
+        profile_cache.set(key, profile)
+    return profile
+
+def load_profiles(entity, entity_ids):
+    """{id: profile} for many ids: one cache round-trip, one IN query for the misses"""
+    entity_ids = list(dict.fromkeys(entity_ids))
+    cached = profile_cache.get_many(f'{entity}:{entity_id}' for entity_id in entity_ids)
+    profiles = {entity_id: cached[f'{entity}:{entity_id}'] for entity_id in entity_ids
+                if f'{entity}:{entity_id}' in cached}
+    missing = [entity_id for entity_id in entity_ids if entity_id not in profiles]
+    if missing:
+        cursor = get_cursor()
+        cursor.execute(profiles_query(entity, len(missing)), missing)
+        fetched = {row['id']: row for row in convert_rows(cursor, cursor.fetchall())}
+        profile_cache.set_many({f'{entity}:{entity_id}': profile for entity_id, profile in fetched.items()})
+        profiles.update(fetched)
+    return profiles
+
+def invalidate_profile(entity, entity_id):
+    profile_cache.delete(f'{entity}:{entity_id}')
+
+# Dashboard snapshot is recomputed at most this often; writes adjust it in between
+app.config['DASHBOARD_STATS_TTL'] = 30
+
+def compute_dashboard_stats(today):
+    cursor = get_cursor()
+    cursor.execute(DASHBOARD_QUERY, (today, today + timedelta(days=1)))
+    return summarize(cursor.fetchall())
+
+dashboard_counters = DashboardCounters(compute_dashboard_stats, ttl=app.config['DASHBOARD_STATS_TTL'])
+
+# Scheduling configuration: a doctor's day is a grid of SLOT_MINUTES slots
+app.config['WORK_DAY_START'] = '09:00'
+app.config['WORK_DAY_END'] = '17:00'
+app.config['SLOT_MINUTES'] = 30
+app.config['BOOKING_HORIZON_DAYS'] = 90
+app.config['SLOT_INDEX_TTL'] = 300
+
+def load_booked_times(doctor_id, day):
+    cursor = get_cursor(MySQLdb.cursors.Cursor)
+    cursor.execute(BOOKED_SLOTS_QUERY, (doctor_id, day))
+    return [row[0] for row in cursor.fetchall()]
+
+slot_index = SlotIndex(
+    load_booked_times,
+    day_start=app.config['WORK_DAY_START'],
+    day_end=app.config['WORK_DAY_END'],
+    slot_minutes=app.config['SLOT_MINUTES'],
+    horizon_days=app.config['BOOKING_HORIZON_DAYS'],
+    ttl=app.config['SLOT_INDEX_TTL']
+)
+
+def appointment_stats_row(appointment):
+    """The fields of an appointment that the dashboard breakdowns depend on"""
+    doctor = load_profile('doctor', appointment['doctor_id'])
+    return {
+        'doctor_id': appointment['doctor_id'],
+        'appointment_date': appointment['appointment_date'],
+        'status': appointment['status'],
+        'specialization': doctor['specialization'] if doctor else None
+    }
+
+# Fast JSON provider (orjson when available) replaces the stdlib encoder
+app.json = FastJSONProvider(app)
+
+# Password hashing: scheme and cost for new hashes; older hashes are upgraded on login
+app.config['PASSWORD_SCHEME'] = 'scrypt'       # 'scrypt' or 'pbkdf2_sha256'
+app.config['PASSWORD_SCRYPT_N'] = 2 ** 14
+app.config['PASSWORD_PBKDF2_ITERATIONS'] = 600000
+app.config['PASSWORD_HASH_WORKERS'] = None     # KDF threads; None = one per CPU
+app.config['PASSWORD_HASH_QUEUE'] = 64         # waiting derivations before answering 503
+app.config['PASSWORD_HASH_TIMEOUT'] = 10.0
+
+password_hasher = PasswordHasher(
+    scheme=app.config['PASSWORD_SCHEME'],
+    scrypt_n=app.config['PASSWORD_SCRYPT_N'],
+    pbkdf2_iterations=app.config['PASSWORD_PBKDF2_ITERATIONS'],
+    max_workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_QUEUE'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT']
+)
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
+
+def hash_passwords(passwords):
+    return password_hasher.hash_many(passwords)
+
+# Access tokens: signed with AUTH_TOKEN_KEYS[AUTH_TOKEN_CURRENT_KEY]; every listed key still verifies.
+# Keys are never in the source: HOSPITAL_AUTH_TOKEN_KEYS='<key id>:<secret>,...' (current key first).
+# Without it tokens are signed with a random per-process key, which is refused once AUTH_ENFORCE is on.
+app.config['AUTH_TOKEN_KEYS'], app.config['AUTH_TOKEN_CURRENT_KEY'] = \
+    parse_key_ring(os.environ.get('HOSPITAL_AUTH_TOKEN_KEYS', ''))
+app.config['AUTH_TOKEN_KEYS_CONFIGURED'] = bool(app.config['AUTH_TOKEN_KEYS'])
+if not app.config['AUTH_TOKEN_KEYS_CONFIGURED']:
+    app.config['AUTH_TOKEN_KEYS'] = {'ephemeral': os.urandom(32)}
+    app.config['AUTH_TOKEN_CURRENT_KEY'] = 'ephemeral'
+app.config['AUTH_TOKEN_TTL'] = 3600
+app.config['AUTH_REVOCATION_BACKEND'] = 'local'    # 'redis' shares logouts across workers
+app.config['AUTH_REVOCATION_SIZE'] = 100000
+# Reject requests without a valid token; off until every client sends Authorization headers
+app.config['AUTH_ENFORCE'] = False
+if app.config['AUTH_ENFORCE'] and not app.config['AUTH_TOKEN_KEYS_CONFIGURED']:
+    raise RuntimeError('AUTH_ENFORCE needs signing keys in HOSPITAL_AUTH_TOKEN_KEYS')
+
+token_signer = TokenSigner(
+    app.config['AUTH_TOKEN_KEYS'],
+    app.config['AUTH_TOKEN_CURRENT_KEY'],
+    ttl=app.config['AUTH_TOKEN_TTL'],
+    revoked=create_cache(
+        app.config['AUTH_REVOCATION_BACKEND'],
+        maxsize=app.config['AUTH_REVOCATION_SIZE'],
+        ttl=app.config['AUTH_TOKEN_TTL'] + 60,
+        redis_url=app.config['PROFILE_CACHE_REDIS_URL']
+    )
+)
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    return header[7:] if header.startswith('Bearer ') else None
+
+def own_id(auth, role):
+    """The caller's id when it is a `role` account and auth is enforced, else None (no restriction)"""
+    if app.config['AUTH_ENFORCE'] and auth and auth['role'] == role:
+        return auth['sub']
+    return None
+
+def is_other_account(auth, role, user_id):
+    """Whether the caller is a `role` account other than `user_id`; doctors and patients only act on themselves"""
+    caller = own_id(auth, role)
+    return caller is not None and caller != user_id
+
+def is_outsider(auth, appointment):
+    """Whether the caller is a patient or doctor who is not a party to `appointment`"""
+    return (is_other_account(auth, 'patient', appointment['patient_id'])
+            or is_other_account(auth, 'doctor', appointment['doctor_id']))
+
+def require_auth(*roles, owner=None):
+    """Verify the bearer token (no database access) and optionally restrict the route to `roles`.
+
+    `owner` is a (role, URL argument) pair: a caller with that role may only
+    reach its own id, e.g. ('patient', 'patient_id'). Admins are never limited.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if app.config['AUTH_ENFORCE'] and not app.config['AUTH_TOKEN_KEYS_CONFIGURED']:
+                return jsonify({'error': 'Authentication is not configured'}), 503
+            token = bearer_token()
+            g.auth = None
+            if token:
+                try:
+                    g.auth = token_signer.verify(token)
+                except TokenError as e:
+                    if app.config['AUTH_ENFORCE']:
+                        return jsonify({'error': str(e)}), 401
+            if app.config['AUTH_ENFORCE']:
+                if g.auth is None:
+                    return jsonify({'error': 'Authentication required'}), 401
+                if roles and g.auth['role'] not in roles:
+                    return jsonify({'error': 'Forbidden'}), 403
+                if owner and is_other_account(g.auth, owner[0], kwargs[owner[1]]):
+                    return jsonify({'error': 'Forbidden'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Conditional GETs: ETag/Last-Modified from table_version_shards (migration 11), 304 before the route's query
+# Routes that fill in rows from the profile cache are not tagged: a cached profile can lag the table version
+app.config['HTTP_CONDITIONAL'] = True
+app.config['HTTP_VERSION_TTL'] = 0.0           # seconds a versions read is reused; >0 trades freshness across workers
+# Compress JSON bodies at least this large (brotli if installed, else gzip)
+app.config['HTTP_COMPRESS_MIN_BYTES'] = 1024
+app.config['HTTP_GZIP_LEVEL'] = 6
+app.config['HTTP_BROTLI_QUALITY'] = 4
+
+def load_table_versions():
+    cursor = get_cursor()
+    cursor.execute(VERSIONS_QUERY)
+    return cursor.fetchall()
+
+table_versions = TableVersions(load_table_versions, ttl=app.config['HTTP_VERSION_TTL'])
+
+def conditional(*tables):
+    """Tag the route's 200 responses with validators for `tables`; answer 304 when the client's copy is current"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not app.config['HTTP_CONDITIONAL'] or wants_stream():
+                return view(*args, **kwargs)
+            try:
+                etag, last_modified = validators(table_versions.get(), tables, request.full_path)
+            except (MySQLdb.Error, KeyError) as e:
+                app.logger.warning(f"Table versions unavailable, serving without validators: {str(e)}")
+                return view(*args, **kwargs)
+            
+            if not_modified(request, etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.vary.update(('Accept-Encoding', 'Authorization'))
+            return response
+        return wrapper
+    return decorator
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON bodies; registered after record_request so metrics see the bytes sent"""
+    if (request.method != 'GET' or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < app.config['HTTP_COMPRESS_MIN_BYTES']:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+    
+    response.set_data(compress(response.get_data(), encoding, app.config['HTTP_GZIP_LEVEL'],
+                               app.config['HTTP_BROTLI_QUALITY']))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different byte sequence needs its own strong validator
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+@app.after_request
+def forget_table_versions(response):
+    # With HTTP_VERSION_TTL > 0, this process's own writes show up in ETags immediately
+    if request.method != 'GET' and table_versions.ttl > 0:
+        table_versions.invalidate()
+    return response
 
 def log_operation(operation, user_type, data):
-    """Log operations to console and file"""
-    log_message = f"Operation: {operation} | User Type: {user_type} | Data: {data}"
-    app.logger.info(log_message)
-    print(f"[{datetime.now()}] {log_message}")
+    """Log operations as structured records through the queued logging pipeline"""
+    if not log_sampler.should_log(operation):
+        return
+    app.logger.info(f"Operation: {operation} | User Type: {user_type}",
+                    extra={'operation': operation, 'user_type': user_type, 'data': data})
+    if app.config['LOG_ECHO_STDOUT']:
+        print(f"[{datetime.now()}] Operation: {operation} | User Type: {user_type} | Data: {data}")
+
+# Audit trail of every write, batched into audit_log (migration 10) by a background thread
+app.config['AUDIT_ENABLED'] = True
+app.config['AUDIT_BATCH_SIZE'] = 500
+app.config['AUDIT_QUEUE_SIZE'] = 50000
+app.config['AUDIT_ENQUEUE_TIMEOUT'] = 0.0      # seconds a request may wait for queue space before spilling to the log
+app.config['AUDIT_CLOSE_TIMEOUT'] = 10.0
+
+def spill_audit_event(event, reason):
+    # Events the writer could not store still reach the JSON log
+    app.logger.warning(f"Audit event not stored: {reason}", extra={'operation': 'AUDIT_SPILL', 'data': event})
+
+audit_writer = AuditWriter(
+    connect_mysql,
+    batch_size=app.config['AUDIT_BATCH_SIZE'],
+    max_queue=app.config['AUDIT_QUEUE_SIZE'],
+    enqueue_timeout=app.config['AUDIT_ENQUEUE_TIMEOUT'],
+    spill=spill_audit_event
+)
+atexit.register(audit_writer.close, app.config['AUDIT_CLOSE_TIMEOUT'])
+
+def current_actor():
+    """(role, id, username) from the bearer token, else the login session"""
+    auth = g.get('auth')
+    if auth:
+        return auth['role'], auth['sub'], auth['usr']
+    if session.get('loggedin'):
+        return session.get('user_type'), session.get('id'), session.get('username')
+    return None, None, None
+
+def audit(action, entity, entity_id, changes):
+    """Queue the audit event of a committed write"""
+    if app.config['AUDIT_ENABLED']:
+        audit_writer.record(audit_event(action, entity, entity_id, changes, current_actor(),
+                                        request.endpoint, request.remote_addr))
+
+def fetch_list_page(entity):
+    """Fetch one keyset-paginated page for a list route using the request's query string"""
+    query, params, limit = build_list_query(entity, request.args)
+    cursor = get_cursor()
+    cursor.execute(query, params)
+    return paginate(entity, convert_rows(cursor, cursor.fetchall()), limit)
+
+# Doctor searches rank this many matches to count specialization facets
+app.config['SEARCH_FACET_CANDIDATES'] = 500
+
+def fetch_rows(cursor, query, params):
+    cursor.execute(query, params)
+    return convert_rows(cursor, cursor.fetchall())
+
+def search_entity(entity, user_type):
+    """Shared body of the /search routes: prefix pass, then FULLTEXT fallback (see search.py)"""
+    result = run_search(get_cursor(), entity, request.args, fetch_rows, app.config['SEARCH_FACET_CANDIDATES'])
+    log_operation('SEARCH', user_type, {'q': request.args.get('q'), 'count': len(result['results'])})
+    return jsonify(result), 200
+
+def fetch_timeline(entity, owner_id, other, name_fields):
+    """One keyset page of a doctor's/patient's appointments, named from the `other` party's cached profiles"""
+    query, params, limit = build_list_query(entity, request.args, scope=owner_id)
+    cursor = get_cursor()
+    cursor.execute(query, params)
+    appointments, next_cursor = paginate(entity, convert_rows(cursor, cursor.fetchall()), limit)
+    profiles = load_profiles(other, [appointment[f'{other}_id'] for appointment in appointments])
+    for appointment in appointments:
+        profile = profiles.get(appointment[f'{other}_id']) or {}
+        for field, key in name_fields.items():
+            appointment[key] = profile.get(field)
+    return appointments, next_cursor
+
+def wants_stream():
+    """True when the client asked for NDJSON via ?stream=1 or the Accept header"""
+    if request.args.get('stream') == '1':
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def stream_list(entity, user_type):
+    """Stream every row of a list route as NDJSON from an unbuffered server-side cursor"""
+    query, params, _ = build_list_query(entity, request.args, paginated=False)
+    cursor = get_cursor(MySQLdb.cursors.SSDictCursor)
+    cursor.execute(query, params)
+    convert = row_converter(cursor.description)
+
+    def generate():
+        count = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                count += len(rows)
+                yield b''.join(dumps_bytes(convert(row)) + b'\n' for row in rows)
+        finally:
+            cursor.close()
+            log_operation('STREAM_ALL', user_type, {'count': count})
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 # ==================== AUTHENTICATION ROUTES ====================
 
 @app.route('/api/register', methods=['POST'])
+@transaction()
 def api_register():
     try:
         data = request.get_json()
@@ -112,16 +631,9 @@ def api_register():
         if not re.match(r'[^@]+@[^@]+\.[^@]+', email):
             return jsonify({'error': 'Invalid email address'}), 400
         
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if username already exists in any table
-        tables = ['admins', 'doctors', 'patients']
-        for table in tables:
-            cursor.execute(f'SELECT * FROM {table} WHERE username = %s', (username,))
-            if cursor.fetchone():
-                return jsonify({'error': 'Username already exists'}), 409
-        
+        cursor = get_cursor()
         hashed_password = hash_password(password)
+        profile = {'name': name, 'username': username, 'email': email, 'phone': phone}
         
         # Insert based on role
         if role == 'admin':
@@ -129,24 +641,41 @@ def api_register():
                           (name, username, hashed_password, email, phone, datetime.now()))
         elif role == 'doctor':
             specialization = data.get('specialization', 'General')
+            profile['specialization'] = specialization
             cursor.execute('INSERT INTO doctors VALUES (NULL, %s, %s, %s, %s, %s, %s, %s)', 
                           (name, username, hashed_password, email, phone, specialization, datetime.now()))
         else:  # patient
             address = data.get('address', '')
+            profile['address'] = address
             cursor.execute('INSERT INTO patients VALUES (NULL, %s, %s, %s, %s, %s, %s, %s)', 
                           (name, username, hashed_password, email, phone, address, datetime.now()))
+        user_id = cursor.lastrowid
         
-        mysql.connection.commit()
+        # The unique key on users.username rejects names taken in any role table
+        claim_username(cursor, username, role, user_id)
+        get_db().commit()
+        invalidate_profile(role, user_id)
+        dashboard_counters.entity_changed(f'{role}s', 1)
         
         log_operation('REGISTER', role.upper(), {'username': username, 'name': name, 'email': email})
+        audit('CREATE', role, user_id, created(profile))
         
         return jsonify({'message': f'{role.capitalize()} registered successfully', 'username': username}), 201
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_duplicate(e):
+            return jsonify({'error': 'Username already exists'}), 409
+        app.logger.error(f"Registration error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503
     except Exception as e:
         app.logger.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/login', methods=['POST'])
+@transaction()
 def api_login():
     try:
         data = request.get_json()
@@ -154,22 +683,26 @@ def api_login():
         password = data.get('password')
         user_type = data.get('user_type', '').lower()
         
-        if not username or not password or not user_type:
-            return jsonify({'error': 'Username, password, and user_type are required'}), 400
+        if not username or not password:
+            return jsonify({'error': 'Username and password are required'}), 400
         
-        if user_type not in ['admin', 'doctor', 'patient']:
+        # user_type is optional now that the users index knows each username's role
+        if user_type and user_type not in ['admin', 'doctor', 'patient']:
             return jsonify({'error': 'Invalid user_type'}), 400
         
-        hashed_password = hash_password(password)
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
+        account = find_account(cursor, username)
         
-        table_map = {'admin': 'admins', 'doctor': 'doctors', 'patient': 'patients'}
-        table = table_map[user_type]
-        
-        cursor.execute(f'SELECT * FROM {table} WHERE username = %s AND password = %s', (username, hashed_password))
-        account = cursor.fetchone()
-        
-        if account:
+        if account and password_hasher.verify(password, account['password']) \
+                and (not user_type or account['role'] == user_type):
+            user_type = account['role']
+            
+            # Upgrade legacy or outdated hashes while the plaintext is at hand
+            if password_hasher.needs_rehash(account['password']):
+                cursor.execute(f"UPDATE {ROLE_TABLES[user_type]} SET password = %s WHERE id = %s",
+                               (hash_password(password), account['id']))
+                get_db().commit()
+                password_hasher.note_rehash()
             session['loggedin'] = True
             session['id'] = account['id']
             session['username'] = account['username']
@@ -178,10 +711,13 @@ def api_login():
             log_operation('LOGIN', user_type.upper(), {'username': username, 'id': account['id']})
             
             # Serialize the account data
-            serialized_account = serialize_data(account)
+            serialized_account = convert_row(cursor, account)
+            token, claims = token_signer.issue(serialized_account['id'], serialized_account['username'], user_type)
             
             return jsonify({
                 'message': 'Login successful',
+                'token': token,
+                'expires_at': claims['exp'],
                 'user': {
                     'id': serialized_account['id'],
                     'username': serialized_account['username'],
@@ -192,6 +728,8 @@ def api_login():
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503
     except Exception as e:
         app.logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -200,82 +738,77 @@ def api_login():
 def api_logout():
     user_info = {'username': session.get('username'), 'user_type': session.get('user_type')}
     session.clear()
+    
+    # Revoke the presented token for the rest of its lifetime
+    token = bearer_token()
+    if token:
+        try:
+            claims = token_signer.verify(token)
+            token_signer.revoke(claims)
+            user_info = {'username': claims['usr'], 'user_type': claims['role'].upper()}
+        except TokenError:
+            pass
     log_operation('LOGOUT', user_info.get('user_type', 'UNKNOWN'), user_info)
     return jsonify({'message': 'Logged out successfully'}), 200
 
 # ==================== ADMIN CRUD OPERATIONS ====================
 
 @app.route('/api/admins', methods=['GET'])
+@require_auth('admin')
+@conditional('admins')
+@transaction(AUTOCOMMIT)
 def get_all_admins():
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, created_at FROM admins ORDER BY name')
-        admins = cursor.fetchall()
+        if wants_stream():
+            return stream_list('admins', 'ADMIN')
         
-        # Serialize the data
-        serialized_admins = serialize_data(admins)
+        admins, next_cursor = fetch_list_page('admins')
         
         log_operation('GET_ALL', 'ADMIN', {'count': len(admins)})
-        return jsonify({'admins': serialized_admins}), 200
+        return jsonify({'admins': admins, 'next_cursor': next_cursor}), 200
         
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Get admins error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admins/<int:admin_id>', methods=['GET'])
+@require_auth('admin')
+@transaction(AUTOCOMMIT)
 def get_admin(admin_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, created_at FROM admins WHERE id = %s', (admin_id,))
-        admin = cursor.fetchone()
+        admin = load_profile('admin', admin_id)
         
         if not admin:
             return jsonify({'error': 'Admin not found'}), 404
         
-        serialized_admin = serialize_data(admin)
-        
         log_operation('GET', 'ADMIN', {'id': admin_id})
-        return jsonify({'admin': serialized_admin}), 200
+        return jsonify({'admin': admin}), 200
         
     except Exception as e:
         app.logger.error(f"Get admin error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admins/<int:admin_id>', methods=['PUT'])
+@require_auth('admin')
+@transaction()
 def update_admin(admin_id):
     try:
         data = request.get_json()
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if admin exists
-        cursor.execute('SELECT * FROM admins WHERE id = %s', (admin_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Admin not found'}), 404
+        cursor = get_cursor()
         
-        # Build update query dynamically
-        update_fields = []
-        values = []
-        
-        if 'name' in data:
-            update_fields.append('name = %s')
-            values.append(data['name'])
-        if 'email' in data:
-            update_fields.append('email = %s')
-            values.append(data['email'])
-        if 'phone' in data:
-            update_fields.append('phone = %s')
-            values.append(data['phone'])
-        
-        if not update_fields:
+        fields, old = update_by_id(cursor, 'admins', admin_id, data, ['name', 'email', 'phone'])
+        if not fields:
             return jsonify({'error': 'No valid fields to update'}), 400
+        if old is None:
+            return jsonify({'error': 'Admin not found'}), 404
         
-        values.append(admin_id)
-        query = f"UPDATE admins SET {', '.join(update_fields)} WHERE id = %s"
-        
-        cursor.execute(query, values)
-        mysql.connection.commit()
+        get_db().commit()
+        invalidate_profile('admin', admin_id)
         
         log_operation('UPDATE', 'ADMIN', {'id': admin_id, 'updated_fields': list(data.keys())})
+        audit('UPDATE', 'admin', admin_id, diff(old, data, fields))
         return jsonify({'message': 'Admin updated successfully'}), 200
         
     except Exception as e:
@@ -283,20 +816,22 @@ def update_admin(admin_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/admins/<int:admin_id>', methods=['DELETE'])
+@require_auth('admin')
+@transaction()
 def delete_admin(admin_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
         
-        # Check if admin exists
-        cursor.execute('SELECT * FROM admins WHERE id = %s', (admin_id,))
-        admin = cursor.fetchone()
-        if not admin:
+        old = delete_account(cursor, 'admin', admin_id)
+        if old is None:
+            get_db().rollback()
             return jsonify({'error': 'Admin not found'}), 404
+        get_db().commit()
+        invalidate_profile('admin', admin_id)
+        dashboard_counters.entity_changed('admins', -1)
         
-        cursor.execute('DELETE FROM admins WHERE id = %s', (admin_id,))
-        mysql.connection.commit()
-        
-        log_operation('DELETE', 'ADMIN', {'id': admin_id, 'username': admin['username']})
+        log_operation('DELETE', 'ADMIN', {'id': admin_id})
+        audit('DELETE', 'admin', admin_id, deleted(old))
         return jsonify({'message': 'Admin deleted successfully'}), 200
         
     except Exception as e:
@@ -306,22 +841,28 @@ def delete_admin(admin_id):
 # ==================== DOCTOR CRUD OPERATIONS ====================
 
 @app.route('/api/doctors', methods=['GET'])
+@require_auth()
+@conditional('doctors')
+@transaction(AUTOCOMMIT)
 def get_all_doctors():
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, specialization, created_at FROM doctors ORDER BY name')
-        doctors = cursor.fetchall()
+        if wants_stream():
+            return stream_list('doctors', 'DOCTOR')
         
-        serialized_doctors = serialize_data(doctors)
+        doctors, next_cursor = fetch_list_page('doctors')
         
         log_operation('GET_ALL', 'DOCTOR', {'count': len(doctors)})
-        return jsonify({'doctors': serialized_doctors}), 200
+        return jsonify({'doctors': doctors, 'next_cursor': next_cursor}), 200
         
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Get doctors error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/doctors', methods=['POST'])
+@require_auth('admin')
+@transaction()
 def create_doctor():
     try:
         data = request.get_json()
@@ -331,78 +872,71 @@ def create_doctor():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if username exists
-        cursor.execute('SELECT * FROM doctors WHERE username = %s', (data['username'],))
-        if cursor.fetchone():
-            return jsonify({'error': 'Username already exists'}), 409
+        cursor = get_cursor()
         
         hashed_password = hash_password(data['password'])
         cursor.execute('INSERT INTO doctors VALUES (NULL, %s, %s, %s, %s, %s, %s, %s)', 
                       (data['name'], data['username'], hashed_password, data['email'], 
                        data['phone'], data['specialization'], datetime.now()))
-        mysql.connection.commit()
-        
         doctor_id = cursor.lastrowid
+        claim_username(cursor, data['username'], 'doctor', doctor_id)
+        get_db().commit()
+        
+        invalidate_profile('doctor', doctor_id)
+        dashboard_counters.entity_changed('doctors', 1)
         log_operation('CREATE', 'DOCTOR', {'id': doctor_id, 'username': data['username'], 'name': data['name']})
+        audit('CREATE', 'doctor', doctor_id, created({field: data[field] for field in required_fields}))
         
         return jsonify({'message': 'Doctor created successfully', 'id': doctor_id}), 201
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_duplicate(e):
+            return jsonify({'error': 'Username already exists'}), 409
+        app.logger.error(f"Create doctor error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503
     except Exception as e:
         app.logger.error(f"Create doctor error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/doctors/<int:doctor_id>', methods=['GET'])
+@require_auth()
+@transaction(AUTOCOMMIT)
 def get_doctor(doctor_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, specialization, created_at FROM doctors WHERE id = %s', (doctor_id,))
-        doctor = cursor.fetchone()
+        doctor = load_profile('doctor', doctor_id)
         
         if not doctor:
             return jsonify({'error': 'Doctor not found'}), 404
         
-        serialized_doctor = serialize_data(doctor)
-        
         log_operation('GET', 'DOCTOR', {'id': doctor_id})
-        return jsonify({'doctor': serialized_doctor}), 200
+        return jsonify({'doctor': doctor}), 200
         
     except Exception as e:
         app.logger.error(f"Get doctor error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/doctors/<int:doctor_id>', methods=['PUT'])
+@require_auth('admin', 'doctor', owner=('doctor', 'doctor_id'))
+@transaction()
 def update_doctor(doctor_id):
     try:
         data = request.get_json()
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if doctor exists
-        cursor.execute('SELECT * FROM doctors WHERE id = %s', (doctor_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Doctor not found'}), 404
-        
-        # Build update query dynamically
-        update_fields = []
-        values = []
+        cursor = get_cursor()
         
-        allowed_fields = ['name', 'email', 'phone', 'specialization']
-        for field in allowed_fields:
-            if field in data:
-                update_fields.append(f'{field} = %s')
-                values.append(data[field])
-        
-        if not update_fields:
+        fields, old = update_by_id(cursor, 'doctors', doctor_id, data, ['name', 'email', 'phone', 'specialization'])
+        if not fields:
             return jsonify({'error': 'No valid fields to update'}), 400
+        if old is None:
+            return jsonify({'error': 'Doctor not found'}), 404
         
-        values.append(doctor_id)
-        query = f"UPDATE doctors SET {', '.join(update_fields)} WHERE id = %s"
-        
-        cursor.execute(query, values)
-        mysql.connection.commit()
+        get_db().commit()
+        invalidate_profile('doctor', doctor_id)
         
         log_operation('UPDATE', 'DOCTOR', {'id': doctor_id, 'updated_fields': list(data.keys())})
+        audit('UPDATE', 'doctor', doctor_id, diff(old, data, fields))
         return jsonify({'message': 'Doctor updated successfully'}), 200
         
     except Exception as e:
@@ -410,53 +944,126 @@ def update_doctor(doctor_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/doctors/<int:doctor_id>', methods=['DELETE'])
+@require_auth('admin')
+@transaction()
 def delete_doctor(doctor_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
         
-        # Check if doctor exists
-        cursor.execute('SELECT * FROM doctors WHERE id = %s', (doctor_id,))
-        doctor = cursor.fetchone()
-        if not doctor:
+        # The appointments foreign key refuses the delete while any reference this doctor
+        old = delete_account(cursor, 'doctor', doctor_id)
+        if old is None:
+            get_db().rollback()
             return jsonify({'error': 'Doctor not found'}), 404
+        get_db().commit()
+        invalidate_profile('doctor', doctor_id)
+        dashboard_counters.entity_changed('doctors', -1)
         
-        # Check if doctor has appointments
-        cursor.execute('SELECT COUNT(*) as count FROM appointments WHERE doctor_id = %s', (doctor_id,))
-        appointment_count = cursor.fetchone()['count']
+        log_operation('DELETE', 'DOCTOR', {'id': doctor_id})
+        audit('DELETE', 'doctor', doctor_id, deleted(old))
+        return jsonify({'message': 'Doctor deleted successfully'}), 200
         
-        if appointment_count > 0:
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_referenced(e):
             return jsonify({'error': 'Cannot delete doctor with existing appointments'}), 400
+        app.logger.error(f"Delete doctor error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    except Exception as e:
+        app.logger.error(f"Delete doctor error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/doctors/<int:doctor_id>/availability', methods=['GET'])
+@require_auth()
+@transaction(AUTOCOMMIT)
+def get_doctor_availability(doctor_id):
+    try:
+        try:
+            day = slot_index.check_day(request.args.get('date', date.today().isoformat()))
+        except SlotError as e:
+            return jsonify({'error': str(e)}), 400
         
-        cursor.execute('DELETE FROM doctors WHERE id = %s', (doctor_id,))
-        mysql.connection.commit()
+        if not load_profile('doctor', doctor_id):
+            return jsonify({'error': 'Doctor not found'}), 404
         
-        log_operation('DELETE', 'DOCTOR', {'id': doctor_id, 'username': doctor['username']})
-        return jsonify({'message': 'Doctor deleted successfully'}), 200
+        free_slots = slot_index.free_slots(doctor_id, day)
+        
+        log_operation('GET_AVAILABILITY', 'DOCTOR', {'id': doctor_id, 'date': day.isoformat()})
+        return jsonify({
+            'doctor_id': doctor_id,
+            'date': day.isoformat(),
+            'slot_minutes': slot_index.slot_minutes,
+            'free_slots': free_slots
+        }), 200
         
     except Exception as e:
-        app.logger.error(f"Delete doctor error: {str(e)}")
+        app.logger.error(f"Get availability error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/doctors/<int:doctor_id>/appointments', methods=['GET'])
+@require_auth('admin', 'doctor', owner=('doctor', 'doctor_id'))
+@transaction(READ_ONLY)
+def get_doctor_appointments(doctor_id):
+    try:
+        doctor = load_profile('doctor', doctor_id)
+        if not doctor:
+            return jsonify({'error': 'Doctor not found'}), 404
+        
+        appointments, next_cursor = fetch_timeline('doctor_appointments', doctor_id, 'patient',
+                                                   {'name': 'patient_name'})
+        
+        log_operation('GET_TIMELINE', 'DOCTOR', {'id': doctor_id, 'count': len(appointments)})
+        return jsonify({
+            'doctor': {'id': doctor_id, 'name': doctor['name'], 'specialization': doctor['specialization']},
+            'appointments': appointments,
+            'next_cursor': next_cursor
+        }), 200
+        
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Get doctor appointments error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/doctors/search', methods=['GET'])
+@require_auth()
+@conditional('doctors')
+@transaction(READ_ONLY)
+def search_doctors():
+    try:
+        return search_entity('doctors', 'DOCTOR')
+        
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Search doctors error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 # ==================== PATIENT CRUD OPERATIONS ====================
 @app.route('/api/patients', methods=['GET'])
+@require_auth('admin', 'doctor')
+@conditional('patients')
+@transaction(AUTOCOMMIT)
 def get_all_patients():
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, address, created_at FROM patients ORDER BY name')
-        patients = cursor.fetchall()
+        if wants_stream():
+            return stream_list('patients', 'PATIENT')
         
-        # Explicitly serialize each patient dictionary
-        serialized_patients = [serialize_data(patient) for patient in patients]
+        patients, next_cursor = fetch_list_page('patients')
         
         log_operation('GET_ALL', 'PATIENT', {'count': len(patients)})
-        return jsonify({'patients': serialized_patients}), 200
+        return jsonify({'patients': patients, 'next_cursor': next_cursor}), 200
         
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Get patients error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
     
 
 @app.route('/api/patients', methods=['POST'])
+@require_auth('admin')
+@transaction()
 def create_patient():
     try:
         data = request.get_json()
@@ -466,12 +1073,7 @@ def create_patient():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if username exists
-        cursor.execute('SELECT * FROM patients WHERE username = %s', (data['username'],))
-        if cursor.fetchone():
-            return jsonify({'error': 'Username already exists'}), 409
+        cursor = get_cursor()
         
         hashed_password = hash_password(data['password'])
         address = data.get('address', '')
@@ -479,67 +1081,105 @@ def create_patient():
         cursor.execute('INSERT INTO patients VALUES (NULL, %s, %s, %s, %s, %s, %s, %s)', 
                       (data['name'], data['username'], hashed_password, data['email'], 
                        data['phone'], address, datetime.now()))
-        mysql.connection.commit()
-        
         patient_id = cursor.lastrowid
+        claim_username(cursor, data['username'], 'patient', patient_id)
+        get_db().commit()
+        
+        invalidate_profile('patient', patient_id)
+        dashboard_counters.entity_changed('patients', 1)
         log_operation('CREATE', 'PATIENT', {'id': patient_id, 'username': data['username'], 'name': data['name']})
+        audit('CREATE', 'patient', patient_id, created(dict({field: data[field] for field in required_fields},
+                                                            address=address)))
         
         return jsonify({'message': 'Patient created successfully', 'id': patient_id}), 201
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_duplicate(e):
+            return jsonify({'error': 'Username already exists'}), 409
+        app.logger.error(f"Create patient error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503
     except Exception as e:
         app.logger.error(f"Create patient error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/patients/<int:patient_id>/appointments', methods=['GET'])
+@require_auth(owner=('patient', 'patient_id'))
+@transaction(READ_ONLY)
+def get_patient_appointments(patient_id):
+    try:
+        patient = load_profile('patient', patient_id)
+        if not patient:
+            return jsonify({'error': 'Patient not found'}), 404
+        
+        appointments, next_cursor = fetch_timeline('patient_appointments', patient_id, 'doctor',
+                                                   {'name': 'doctor_name', 'specialization': 'specialization'})
+        
+        log_operation('GET_TIMELINE', 'PATIENT', {'id': patient_id, 'count': len(appointments)})
+        return jsonify({
+            'patient': {'id': patient_id, 'name': patient['name']},
+            'appointments': appointments,
+            'next_cursor': next_cursor
+        }), 200
+        
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Get patient appointments error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/patients/search', methods=['GET'])
+@require_auth('admin', 'doctor')
+@conditional('patients')
+@transaction(READ_ONLY)
+def search_patients():
+    try:
+        return search_entity('patients', 'PATIENT')
+        
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Search patients error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/patients/<int:patient_id>', methods=['GET'])
+@require_auth(owner=('patient', 'patient_id'))
+@transaction(AUTOCOMMIT)
 def get_patient(patient_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, name, username, email, phone, address, created_at FROM patients WHERE id = %s', (patient_id,))
-        patient = cursor.fetchone()
+        patient = load_profile('patient', patient_id)
         
         if not patient:
             return jsonify({'error': 'Patient not found'}), 404
         
-        serialized_patient = serialize_data(patient)
-        
         log_operation('GET', 'PATIENT', {'id': patient_id})
-        return jsonify({'patient': serialized_patient}), 200
+        return jsonify({'patient': patient}), 200
         
     except Exception as e:
         app.logger.error(f"Get patient error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/patients/<int:patient_id>', methods=['PUT'])
+@require_auth('admin', 'patient', owner=('patient', 'patient_id'))
+@transaction()
 def update_patient(patient_id):
     try:
         data = request.get_json()
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
         
-        # Check if patient exists
-        cursor.execute('SELECT * FROM patients WHERE id = %s', (patient_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Patient not found'}), 404
-        
-        # Build update query dynamically
-        update_fields = []
-        values = []
-        
-        allowed_fields = ['name', 'email', 'phone', 'address']
-        for field in allowed_fields:
-            if field in data:
-                update_fields.append(f'{field} = %s')
-                values.append(data[field])
-        
-        if not update_fields:
+        fields, old = update_by_id(cursor, 'patients', patient_id, data, ['name', 'email', 'phone', 'address'])
+        if not fields:
             return jsonify({'error': 'No valid fields to update'}), 400
+        if old is None:
+            return jsonify({'error': 'Patient not found'}), 404
         
-        values.append(patient_id)
-        query = f"UPDATE patients SET {', '.join(update_fields)} WHERE id = %s"
-        
-        cursor.execute(query, values)
-        mysql.connection.commit()
+        get_db().commit()
+        invalidate_profile('patient', patient_id)
         
         log_operation('UPDATE', 'PATIENT', {'id': patient_id, 'updated_fields': list(data.keys())})
+        audit('UPDATE', 'patient', patient_id, diff(old, data, fields))
         return jsonify({'message': 'Patient updated successfully'}), 200
         
     except Exception as e:
@@ -547,57 +1187,60 @@ def update_patient(patient_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/patients/<int:patient_id>', methods=['DELETE'])
+@require_auth('admin')
+@transaction()
 def delete_patient(patient_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
         
-        # Check if patient exists
-        cursor.execute('SELECT * FROM patients WHERE id = %s', (patient_id,))
-        patient = cursor.fetchone()
-        if not patient:
+        # The appointments foreign key refuses the delete while any reference this patient
+        old = delete_account(cursor, 'patient', patient_id)
+        if old is None:
+            get_db().rollback()
             return jsonify({'error': 'Patient not found'}), 404
+        get_db().commit()
+        invalidate_profile('patient', patient_id)
+        dashboard_counters.entity_changed('patients', -1)
         
-        # Check if patient has appointments
-        cursor.execute('SELECT COUNT(*) as count FROM appointments WHERE patient_id = %s', (patient_id,))
-        appointment_count = cursor.fetchone()['count']
-        
-        if appointment_count > 0:
-            return jsonify({'error': 'Cannot delete patient with existing appointments'}), 400
-        
-        cursor.execute('DELETE FROM patients WHERE id = %s', (patient_id,))
-        mysql.connection.commit()
-        
-        log_operation('DELETE', 'PATIENT', {'id': patient_id, 'username': patient['username']})
+        log_operation('DELETE', 'PATIENT', {'id': patient_id})
+        audit('DELETE', 'patient', patient_id, deleted(old))
         return jsonify({'message': 'Patient deleted successfully'}), 200
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_referenced(e):
+            return jsonify({'error': 'Cannot delete patient with existing appointments'}), 400
+        app.logger.error(f"Delete patient error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
     except Exception as e:
         app.logger.error(f"Delete patient error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 # ==================== APPOINTMENT OPERATIONS ====================
 @app.route('/api/appointments', methods=['GET'])
+@require_auth('admin', 'doctor')
+@conditional('appointments', 'patients', 'doctors')
+@transaction(AUTOCOMMIT)
 def get_all_appointments():
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('''SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization 
-                          FROM appointments a 
-                          JOIN patients p ON a.patient_id = p.id 
-                          JOIN doctors d ON a.doctor_id = d.id 
-                          ORDER BY a.appointment_date DESC''')
-        appointments = cursor.fetchall()
+        if wants_stream():
+            return stream_list('appointments', 'APPOINTMENT')
         
-        # Explicitly serialize each appointment dictionary
-        serialized_appointments = [serialize_data(appointment) for appointment in appointments]
+        appointments, next_cursor = fetch_list_page('appointments')
         
         log_operation('GET_ALL', 'APPOINTMENT', {'count': len(appointments)})
-        return jsonify({'appointments': serialized_appointments}), 200
+        return jsonify({'appointments': appointments, 'next_cursor': next_cursor}), 200
         
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Get appointments error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
     
 
 @app.route('/api/appointments', methods=['POST'])
+@require_auth()
+@transaction()
 def create_appointment():
     try:
         data = request.get_json()
@@ -607,147 +1250,441 @@ def create_appointment():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        cursor = mysql.connection.cursor()
+        try:
+            doctor_id = int(data['doctor_id'])
+            patient_id = int(data['patient_id'])
+            appointment_date = slot_index.check_day(data['appointment_date'])
+            slot_index.slot_of(data['appointment_time'])
+        except SlotError as e:
+            return jsonify({'error': str(e)}), 400
+        except (TypeError, ValueError):
+            return jsonify({'error': 'doctor_id and patient_id must be integers'}), 400
+        
+        # Patients book for themselves only
+        if is_other_account(g.auth, 'patient', patient_id):
+            return jsonify({'error': 'Forbidden'}), 403
+        
+        # Fast rejection from the in-memory index; the unique slot key is the real guard
+        if slot_index.is_booked(doctor_id, appointment_date, data['appointment_time']):
+            return jsonify({'error': 'Doctor already has an appointment in this slot'}), 409
+        
+        cursor = get_cursor(MySQLdb.cursors.Cursor)
         symptoms = data.get('symptoms', '')
         
-        cursor.execute('INSERT INTO appointments VALUES (NULL, %s, %s, %s, %s, %s, "Scheduled", %s)', 
-                      (data['patient_id'], data['doctor_id'], data['appointment_date'], 
+        cursor.execute('''INSERT INTO appointments
+                          (patient_id, doctor_id, appointment_date, appointment_time, symptoms, status, created_at)
+                          VALUES (%s, %s, %s, %s, %s, 'Scheduled', %s)''', 
+                      (data['patient_id'], doctor_id, appointment_date, 
                        data['appointment_time'], symptoms, datetime.now()))
-        mysql.connection.commit()
+        get_db().commit()
         
         appointment_id = cursor.lastrowid
+        slot_index.book(doctor_id, appointment_date, data['appointment_time'])
+        dashboard_counters.appointment_changed(new=appointment_stats_row({
+            'doctor_id': data['doctor_id'],
+            'appointment_date': data['appointment_date'],
+            'status': 'Scheduled'
+        }))
         log_operation('CREATE', 'APPOINTMENT', {
             'id': appointment_id, 
             'patient_id': data['patient_id'], 
             'doctor_id': data['doctor_id'],
             'date': data['appointment_date']
         })
+        audit('CREATE', 'appointment', appointment_id, created({
+            'patient_id': data['patient_id'],
+            'doctor_id': doctor_id,
+            'appointment_date': appointment_date,
+            'appointment_time': data['appointment_time'],
+            'symptoms': symptoms,
+            'status': 'Scheduled'
+        }))
         
         return jsonify({'message': 'Appointment created successfully', 'id': appointment_id}), 201
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_duplicate(e):
+            slot_index.forget(doctor_id, appointment_date)
+            return jsonify({'error': 'Doctor already has an appointment in this slot'}), 409
+        app.logger.error(f"Create appointment error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
     except Exception as e:
         app.logger.error(f"Create appointment error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/appointments/<int:appointment_id>', methods=['GET'])
+@require_auth()
+@transaction(READ_ONLY)
 def get_appointment(appointment_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('''SELECT a.*, p.name as patient_name, d.name as doctor_name, d.specialization 
-                          FROM appointments a 
-                          JOIN patients p ON a.patient_id = p.id 
-                          JOIN doctors d ON a.doctor_id = d.id 
-                          WHERE a.id = %s''', (appointment_id,))
-        appointment = cursor.fetchone()
+        cursor = get_cursor()
+        cursor.execute(APPOINTMENT_QUERY, (appointment_id,))
+        appointment = convert_row(cursor, cursor.fetchone())
         
         if not appointment:
             return jsonify({'error': 'Appointment not found'}), 404
+        if is_outsider(g.auth, appointment):
+            return jsonify({'error': 'Forbidden'}), 403
         
-        # Explicitly serialize the single appointment dictionary
-        serialized_appointment = serialize_data(appointment)
+        # Names come from the profile cache instead of joining patients/doctors
+        patient = load_profile('patient', appointment['patient_id'])
+        doctor = load_profile('doctor', appointment['doctor_id'])
+        if not patient or not doctor:
+            return jsonify({'error': 'Appointment not found'}), 404
+        
+        appointment['patient_name'] = patient['name']
+        appointment['doctor_name'] = doctor['name']
+        appointment['specialization'] = doctor['specialization']
         
         log_operation('GET', 'APPOINTMENT', {'id': appointment_id})
-        return jsonify({'appointment': serialized_appointment}), 200
+        return jsonify({'appointment': appointment}), 200
         
     except Exception as e:
         app.logger.error(f"Get appointment error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 @app.route('/api/appointments/<int:appointment_id>', methods=['PUT'])
+@require_auth()
+@transaction()
 def update_appointment(appointment_id):
     try:
         data = request.get_json()
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Check if appointment exists
-        cursor.execute('SELECT * FROM appointments WHERE id = %s', (appointment_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Appointment not found'}), 404
-        
-        # Build update query dynamically
-        update_fields = []
-        values = []
+        cursor = get_cursor()
         
         allowed_fields = ['appointment_date', 'appointment_time', 'symptoms', 'status']
-        for field in allowed_fields:
-            if field in data:
-                update_fields.append(f'{field} = %s')
-                values.append(data[field])
-        
-        if not update_fields:
+        fields = [field for field in allowed_fields if field in data]
+        if not fields:
             return jsonify({'error': 'No valid fields to update'}), 400
         
-        values.append(appointment_id)
-        query = f"UPDATE appointments SET {', '.join(update_fields)} WHERE id = %s"
+        # Malformed values are refused before touching the row
+        try:
+            new_date = to_date(data['appointment_date']) if 'appointment_date' in data else None
+            new_time = to_seconds(data['appointment_time']) if 'appointment_time' in data else None
+        except SlotError as e:
+            return jsonify({'error': str(e)}), 400
         
-        cursor.execute(query, values)
-        mysql.connection.commit()
+        appointment = write_appointment(cursor, appointment_id,
+                                        f"UPDATE appointments SET {', '.join(f'{field} = %s' for field in fields)} WHERE id = %s",
+                                        [data[field] for field in fields] + [appointment_id])
+        if not appointment:
+            get_db().rollback()
+            return jsonify({'error': 'Appointment not found'}), 404
+        if is_outsider(g.auth, appointment):
+            get_db().rollback()
+            return jsonify({'error': 'Forbidden'}), 403
+        
+        # Only a date or time that actually changes must be bookable (edit forms resend both, e.g. when
+        # completing a past visit); checked against the locked row, a clash is left to the unique slot key
+        if data.get('status', appointment['status']) not in FREE_STATUSES:
+            try:
+                if new_date is not None and new_date != appointment['appointment_date']:
+                    slot_index.check_day(new_date)
+                if new_time is not None and new_time != to_seconds(appointment['appointment_time']):
+                    slot_index.slot_of(data['appointment_time'])
+            except SlotError as e:
+                get_db().rollback()
+                return jsonify({'error': str(e)}), 400
+        get_db().commit()
+        
+        updated = dict(appointment, **{field: data[field] for field in fields})
+        moves_slot = any(field in data for field in ('appointment_date', 'appointment_time', 'status'))
+        holds_slot = appointment['status'] not in FREE_STATUSES
+        takes_slot = updated['status'] not in FREE_STATUSES
+        if moves_slot:
+            if holds_slot:
+                slot_index.release(appointment['doctor_id'], appointment['appointment_date'], appointment['appointment_time'])
+            if takes_slot:
+                slot_index.book(appointment['doctor_id'], updated['appointment_date'], updated['appointment_time'])
+        dashboard_counters.appointment_changed(old=appointment_stats_row(appointment), new=appointment_stats_row(updated))
         
         log_operation('UPDATE', 'APPOINTMENT', {'id': appointment_id, 'updated_fields': list(data.keys())})
+        audit('UPDATE', 'appointment', appointment_id, diff(appointment, updated, fields))
         return jsonify({'message': 'Appointment updated successfully'}), 200
         
+    except MySQLdb.IntegrityError as e:
+        get_db().rollback()
+        if is_duplicate(e):
+            # The slot index missed that booking; drop the doctor's target day so it reloads
+            cursor.execute('SELECT doctor_id, appointment_date FROM appointments WHERE id = %s', (appointment_id,))
+            row = cursor.fetchone()
+            if row:
+                slot_index.forget(row['doctor_id'], data.get('appointment_date', row['appointment_date']))
+            return jsonify({'error': 'Doctor already has an appointment in this slot'}), 409
+        app.logger.error(f"Update appointment error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
     except Exception as e:
         app.logger.error(f"Update appointment error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/appointments/<int:appointment_id>', methods=['DELETE'])
+@require_auth('admin')
+@transaction()
 def delete_appointment(appointment_id):
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor = get_cursor()
         
-        # Check if appointment exists
-        cursor.execute('SELECT * FROM appointments WHERE id = %s', (appointment_id,))
-        appointment = cursor.fetchone()
+        appointment = write_appointment(cursor, appointment_id, 'DELETE FROM appointments WHERE id = %s',
+                                        (appointment_id,))
         if not appointment:
+            get_db().rollback()
             return jsonify({'error': 'Appointment not found'}), 404
-        
-        cursor.execute('DELETE FROM appointments WHERE id = %s', (appointment_id,))
-        mysql.connection.commit()
+        get_db().commit()
+        if appointment['status'] not in FREE_STATUSES:
+            slot_index.release(appointment['doctor_id'], appointment['appointment_date'], appointment['appointment_time'])
+        dashboard_counters.appointment_changed(old=appointment_stats_row(appointment))
         
         log_operation('DELETE', 'APPOINTMENT', {'id': appointment_id})
+        audit('DELETE', 'appointment', appointment_id, deleted(appointment))
         return jsonify({'message': 'Appointment deleted successfully'}), 200
         
     except Exception as e:
         app.logger.error(f"Delete appointment error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# ==================== BULK OPERATIONS ====================
+
+app.config['BATCH_MAX_ITEMS'] = 10000
+app.config['BATCH_CHUNK_SIZE'] = 500
+
+def batch_response(results):
+    """200 when every item succeeded, 207 with per-item results otherwise"""
+    failed = sum(1 for result in results if result['status'] == 'error')
+    body = {'succeeded': len(results) - failed, 'failed': failed, 'results': results}
+    return jsonify(body), 207 if failed else 200
+
+@app.route('/api/patients:batch', methods=['POST'])
+@require_auth('admin')
+@transaction()
+def create_patients_batch():
+    try:
+        items = batch_items(request.get_json(), 'patients', app.config['BATCH_MAX_ITEMS'])
+        results = create_patients(get_db(), items, hash_passwords, app.config['BATCH_CHUNK_SIZE'])
+        
+        created_ids = [result['id'] for result in results if result['status'] == 'created']
+        for patient_id in created_ids:
+            invalidate_profile('patient', patient_id)
+        dashboard_counters.entity_changed('patients', len(created_ids))
+        
+        log_operation('BATCH_CREATE', 'PATIENT', {'count': len(created_ids), 'failed': len(results) - len(created_ids)})
+        for result in results:
+            if result['status'] == 'created':
+                item = items[result['index']]
+                audit('CREATE', 'patient', result['id'], created(dict(
+                    {field: item[field] for field in ('name', 'username', 'email', 'phone')},
+                    address=item.get('address', ''))))
+        return batch_response(results)
+        
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except HasherBusy:
+        return jsonify({'error': 'Server busy, please retry'}), 503
+    except Exception as e:
+        app.logger.error(f"Batch create patients error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/appointments:batch', methods=['POST'])
+@require_auth('admin')
+@transaction()
+def create_appointments_batch():
+    try:
+        items = batch_items(request.get_json(), 'appointments', app.config['BATCH_MAX_ITEMS'])
+        results, inserted = create_appointments(get_db(), items, slot_index, app.config['BATCH_CHUNK_SIZE'])
+        
+        for row in inserted:
+            slot_index.book(row['doctor_id'], row['appointment_date'], row['appointment_time'])
+            dashboard_counters.appointment_changed(new=appointment_stats_row(row))
+        
+        log_operation('BATCH_CREATE', 'APPOINTMENT', {'count': len(inserted), 'failed': len(results) - len(inserted)})
+        for row in inserted:
+            audit('CREATE', 'appointment', row['id'], created({key: value for key, value in row.items() if key != 'id'}))
+        return batch_response(results)
+        
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Batch create appointments error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/appointments:batchStatus', methods=['POST'])
+@require_auth('admin', 'doctor')
+@transaction()
+def update_appointment_statuses_batch():
+    try:
+        items = batch_items(request.get_json(), 'updates', app.config['BATCH_MAX_ITEMS'])
+        # Doctors only change their own appointments
+        results, changes = update_appointment_statuses(get_db(), items, app.config['BATCH_CHUNK_SIZE'],
+                                                       doctor_id=own_id(g.auth, 'doctor'))
+        
+        for old, status in changes:
+            if old['status'] not in FREE_STATUSES:
+                slot_index.release(old['doctor_id'], old['appointment_date'], old['appointment_time'])
+            if status not in FREE_STATUSES:
+                slot_index.book(old['doctor_id'], old['appointment_date'], old['appointment_time'])
+            dashboard_counters.appointment_changed(old=appointment_stats_row(old),
+                                                   new=appointment_stats_row(dict(old, status=status)))
+        
+        log_operation('BATCH_UPDATE', 'APPOINTMENT', {'count': len(changes), 'failed': len(results) - len(changes)})
+        for old, status in changes:
+            audit('UPDATE', 'appointment', old['id'], diff(old, {'status': status}, ['status']))
+        return batch_response(results)
+        
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Batch update appointments error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 # ==================== DASHBOARD STATISTICS ====================
 
 @app.route('/api/dashboard/stats', methods=['GET'])
+@require_auth('admin')
+@transaction(AUTOCOMMIT)
 def get_dashboard_stats():
     try:
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Get statistics
-        cursor.execute('SELECT COUNT(*) as count FROM patients')
-        total_patients = cursor.fetchone()['count']
+        # One round-trip on a cache miss; concurrent polls share the same snapshot
+        stats = dashboard_counters.get()
+        
+        log_operation('GET_STATS', 'DASHBOARD', {
+            'total_patients': stats['total_patients'],
+            'total_doctors': stats['total_doctors'],
+            'total_admins': stats['total_admins'],
+            'today_appointments': stats['today_appointments'],
+            'total_appointments': stats['total_appointments']
+        })
+        return jsonify({'stats': stats}), 200
         
-        cursor.execute('SELECT COUNT(*) as count FROM doctors')
-        total_doctors = cursor.fetchone()['count']
+    except Exception as e:
+        app.logger.error(f"Get stats error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+# ==================== REPORTS ====================
+
+# Served from appointment_daily_rollup (reports.py), never from appointments itself
+app.config['REPORT_MAX_DAYS'] = 3660
+app.config['REPORT_NO_SHOW_STATUSES'] = ['No-Show']
+
+def load_rollup():
+    """Parse the report query string and load its date range from the rollup"""
+    date_from, date_to, group_by = parse_report_params(request.args, max_days=app.config['REPORT_MAX_DAYS'])
+    cursor = get_cursor()
+    cursor.execute(ROLLUP_QUERY, (date_from, date_to))
+    frame = RollupFrame(cursor.fetchall())
+    specializations = {}
+    if 'specialization' in group_by:
+        specializations = {doctor_id: profile['specialization']
+                           for doctor_id, profile in load_profiles('doctor', set(frame.doctor_id)).items()}
+    return date_from, date_to, group_by, frame, specializations
+
+@app.route('/api/reports/appointments', methods=['GET'])
+@require_auth('admin')
+@transaction(READ_ONLY)
+def get_appointment_report():
+    try:
+        date_from, date_to, group_by, frame, specializations = load_rollup()
+        rows = appointment_counts(frame, group_by, specializations)
         
-        cursor.execute('SELECT COUNT(*) as count FROM admins')
-        total_admins = cursor.fetchone()['count']
+        log_operation('GET_REPORT', 'APPOINTMENT', {'group_by': group_by, 'rows': len(rows)})
+        return jsonify({'date_from': date_from, 'date_to': date_to, 'group_by': group_by, 'rows': rows}), 200
         
-        cursor.execute('SELECT COUNT(*) as count FROM appointments WHERE DATE(appointment_date) = CURDATE()')
-        today_appointments = cursor.fetchone()['count']
+    except InvalidReportParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Appointment report error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/reports/no-shows', methods=['GET'])
+@require_auth('admin')
+@transaction(READ_ONLY)
+def get_no_show_report():
+    try:
+        date_from, date_to, group_by, frame, specializations = load_rollup()
+        rows = no_show_rates(frame, group_by, specializations,
+                             no_show_statuses=app.config['REPORT_NO_SHOW_STATUSES'])
         
-        cursor.execute('SELECT COUNT(*) as count FROM appointments')
-        total_appointments = cursor.fetchone()['count']
+        log_operation('GET_REPORT', 'NO_SHOW', {'group_by': group_by, 'rows': len(rows)})
+        return jsonify({'date_from': date_from, 'date_to': date_to, 'group_by': group_by, 'rows': rows}), 200
         
-        stats = {
-            'total_patients': total_patients,
-            'total_doctors': total_doctors,
-            'total_admins': total_admins,
-            'today_appointments': today_appointments,
-            'total_appointments': total_appointments
-        }
+    except InvalidReportParams as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"No-show report error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+# ==================== AUDIT TRAIL ====================
+
+@app.route('/api/audit', methods=['GET'])
+@require_auth('admin')
+@transaction(AUTOCOMMIT)
+def get_audit_log():
+    try:
+        events, next_cursor = fetch_list_page('audit')
+        for event in events:
+            event['changes'] = json.loads(event['changes'])
         
-        log_operation('GET_STATS', 'DASHBOARD', stats)
-        return jsonify({'stats': stats}), 200
+        log_operation('GET_ALL', 'AUDIT', {'count': len(events)})
+        return jsonify({'events': events, 'next_cursor': next_cursor}), 200
         
+    except InvalidListParams as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        app.logger.error(f"Get stats error: {str(e)}")
+        app.logger.error(f"Get audit log error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# ==================== INTERNAL STATS ====================
+
+# Admin only: these expose pool, cache, queue and auth internals (and, with SQL_PROFILE, query parameters)
+
+@app.route('/api/db/pool', methods=['GET'])
+@require_auth('admin')
+def get_pool_stats():
+    return jsonify({'pool': pool.stats()}), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+@require_auth('admin')
+def get_cache_stats():
+    return jsonify({'profile_cache': profile_cache.stats(), 'slot_index': slot_index.stats()}), 200
+
+@app.route('/api/logging/stats', methods=['GET'])
+@require_auth('admin')
+def get_logging_stats():
+    return jsonify({'logging': {
+        'queued': log_queue_handler.queue.qsize(),
+        'dropped': log_queue_handler.dropped,
+        'sample_rates': app.config['LOG_SAMPLE_RATES']
+    }}), 200
+
+@app.route('/api/audit/stats', methods=['GET'])
+@require_auth('admin')
+def get_audit_stats():
+    return jsonify({'audit': audit_writer.stats(), 'enabled': app.config['AUDIT_ENABLED']}), 200
+
+@app.route('/api/auth/stats', methods=['GET'])
+@require_auth('admin')
+def get_auth_stats():
+    return jsonify({'password_hasher': password_hasher.stats(), 'tokens': token_signer.stats(),
+                    'enforced': app.config['AUTH_ENFORCE']}), 200
+
+@app.route('/metrics', methods=['GET'])
+@require_auth('admin')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/queries', methods=['GET', 'DELETE'])
+@require_auth('admin')
+def get_query_profile():
+    if not app.config['SQL_PROFILE']:
+        return jsonify({'error': 'SQL profiling is disabled (SQL_PROFILE)'}), 404
+    if request.method == 'DELETE':
+        query_profiler.reset()
+        return jsonify({'message': 'Query profile reset'}), 200
+    return jsonify({'profile': query_profiler.summary()}), 200
+
+metrics.add_gauges(lambda: {f'db_pool_{key}': value for key, value in pool.stats().items()
+                            if isinstance(value, (int, float))})
+metrics.add_gauges(lambda: {'log_queue_depth': log_queue_handler.queue.qsize(),
+                            'log_records_dropped': log_queue_handler.dropped})
+metrics.add_gauges(lambda: {f'audit_{key}': value for key, value in audit_writer.stats().items()})
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(404)
@@ -762,6 +1699,9 @@ def method_not_allowed(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# Label sets for every route exist before the first request
+metrics.preallocate(app.view_functions)
+
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
@@ -771,32 +1711,56 @@ if __name__ == '__main__':
     print("Available Endpoints:")
     print("Authentication:")
     print("    POST /api/register - Register new user (admin/doctor/patient)")
-    print("    POST /api/login - User login")
-    print("    POST /api/logout - User logout")
+    print("    POST /api/login - User login (user_type optional); returns a bearer token")
+    print("    POST /api/logout - User logout; revokes the bearer token")
     print("\nAdmin CRUD:")
-    print("    GET /api/admins - Get all admins")
+    print("    GET /api/admins - Get all admins (?limit=&after=)")
     print("    GET /api/admins/<id> - Get specific admin")
     print("    PUT /api/admins/<id> - Update admin")
     print("    DELETE /api/admins/<id> - Delete admin")
     print("\nDoctor CRUD:")
-    print("    GET /api/doctors - Get all doctors")
+    print("    GET /api/doctors - Get all doctors (?limit=&after=&specialization=)")
     print("    POST /api/doctors - Create new doctor")
     print("    GET /api/doctors/<id> - Get specific doctor")
     print("    PUT /api/doctors/<id> - Update doctor")
     print("    DELETE /api/doctors/<id> - Delete doctor")
+    print("    GET /api/doctors/<id>/availability?date= - Free appointment slots")
+    print("    GET /api/doctors/<id>/appointments - Doctor's schedule (?limit=&after=&status=&date_from=&date_to=)")
+    print("    GET /api/doctors/search?q=&specialization=&limit=&fuzzy= - Ranked search with specialization facets")
     print("\nPatient CRUD:")
-    print("    GET /api/patients - Get all patients")
+    print("    GET /api/patients - Get all patients (?limit=&after=)")
     print("    POST /api/patients - Create new patient")
+    print("    GET /api/patients/search?q=&limit=&fuzzy= - Ranked name/username/phone search")
     print("    GET /api/patients/<id> - Get specific patient")
+    print("    GET /api/patients/<id>/appointments - Patient's history, newest first (?limit=&after=&status=&date_from=&date_to=)")
     print("    PUT /api/patients/<id> - Update patient")
     print("    DELETE /api/patients/<id> - Delete patient")
     print("\nAppointment CRUD:")
-    print("    GET /api/appointments - Get all appointments")
+    print("    GET /api/appointments - Get all appointments (?limit=&after=&doctor_id=&patient_id=&status=&date_from=&date_to=&specialization=)")
     print("    POST /api/appointments - Create new appointment")
     print("    PUT /api/appointments/<id> - Update appointment")
     print("    DELETE /api/appointments/<id> - Delete appointment")
+    print("\nBulk:")
+    print("    POST /api/patients:batch - Create many patients {patients: [...]}")
+    print("    POST /api/appointments:batch - Create many appointments {appointments: [...]}")
+    print("    POST /api/appointments:batchStatus - Update many statuses {updates: [{id, status}]}")
     print("\nDashboard:")
     print("    GET /api/dashboard/stats - Get dashboard statistics")
+    print("\nReports (?date_from=&date_to=&group_by=day|week|month|doctor|specialization|status, comma-separated):")
+    print("    GET /api/reports/appointments - Appointment counts from the daily rollup")
+    print("    GET /api/reports/no-shows - Missed appointments and no-show rate")
+    print("\nAudit trail (?entity=&entity_id=&actor_role=&actor_id=&action=&date_from=&date_to=):")
+    print("    GET /api/audit - Who created, updated or deleted what, newest first")
+    print("\nInternal stats:")
+    print("    GET /api/db/pool - Connection pool counters")
+    print("    GET /api/cache/stats - Profile cache hit/miss/eviction counters")
+    print("    GET /api/logging/stats - Log queue depth and dropped records")
+    print("    GET /api/audit/stats - Audit queue depth, batches written and spilled events")
+    print("    GET /api/auth/stats - Password hashing and token verification counters")
+    print("    GET /metrics - Per-route latency, size, error and DB metrics (Prometheus text format)")
+    print("    GET /debug/queries - Per-route SQL profile when SQL_PROFILE is on (DELETE resets)")
+    print("\nList routes stream the full result as NDJSON with ?stream=1 or Accept: application/x-ndjson")
     print("="*60)
     
-    app.run(debug=True, host='0.0.0.0')
+    print("Development server only; run `python serve.py` in production")
+    app.run(debug=app.config['DEV_SERVER_DEBUG'], host='0.0.0.0', threaded=True)
@@ -23,6 +23,150 @@ import {
 
 const API_BASE_URL = "http://localhost:5000/api";
 
+const PAGE_SIZE = 50;
+
+// List routes return one page at a time, plus next_cursor when there is another
+const fetchPage = async <T,>(
+  path: string,
+  key: string,
+  cursor: string | null = null
+): Promise<{ items: T[]; nextCursor: string | null }> => {
+  const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+  if (cursor) params.set("after", cursor);
+  const response = await fetch(`${API_BASE_URL}${path}?${params}`);
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+  const data = await response.json();
+  return { items: data[key] || [], nextCursor: data.next_cursor || null };
+};
+
+// Rows of a list screen: the first page on load, one more page per loadMore()
+const usePagedList = <T,>(path: string, key: string) => {
+  const [items, setItems] = useState<T[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const reload = async () => {
+    try {
+      const page = await fetchPage<T>(path, key);
+      setItems(page.items);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error(`Error fetching ${key}:`, error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage<T>(path, key, nextCursor);
+      setItems((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error(`Error fetching more ${key}:`, error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    reload();
+  }, [path]);
+
+  return { items, loading, loadingMore, hasMore: nextCursor !== null, loadMore, reload };
+};
+
+const LoadMoreButton: React.FC<{
+  hasMore: boolean;
+  loading: boolean;
+  onClick: () => void;
+}> = ({ hasMore, loading, onClick }) =>
+  hasMore ? (
+    <div className="flex justify-center mt-4">
+      <button
+        onClick={onClick}
+        disabled={loading}
+        className="px-4 py-2 bg-gray-200 text-gray-800 rounded-lg hover:bg-gray-300 disabled:opacity-50"
+      >
+        {loading ? "Loading..." : "Load more"}
+      </button>
+    </div>
+  ) : null;
+
+// Picks a doctor or patient through the /search routes instead of listing every row
+const SearchSelect: React.FC<{
+  entity: "doctors" | "patients";
+  placeholder: string;
+  value: string;
+  selectedLabel?: string;
+  describe: (row: any) => string;
+  onChange: (id: string) => void;
+}> = ({ entity, placeholder, value, selectedLabel, describe, onChange }) => {
+  const [query, setQuery] = useState("");
+  const [options, setOptions] = useState<{ id: string; label: string }[]>(
+    value && selectedLabel ? [{ id: String(value), label: selectedLabel }] : []
+  );
+
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) return;
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q, limit: "20" });
+        const response = await fetch(`${API_BASE_URL}/${entity}/search?${params}`);
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        const found = (data.results || []).map((row: any) => ({
+          id: String(row.id),
+          label: describe(row),
+        }));
+        // Keep the current choice listed so a new search does not clear it
+        setOptions((current) => {
+          const selected = current.find((option) => option.id === String(value));
+          return selected && !found.some((option: { id: string }) => option.id === selected.id)
+            ? [selected, ...found]
+            : found;
+        });
+      } catch (error) {
+        console.error(`Error searching ${entity}:`, error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [query, entity]);
+
+  return (
+    <div className="space-y-2">
+      <input
+        type="search"
+        placeholder={`Search ${entity} by name, username or phone`}
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        className="w-full px-4 py-2 border border-gray-300 rounded-lg"
+      />
+      <select
+        value={value}
+        onChange={(e) => onChange(e.target.value)}
+        className="w-full px-4 py-2 border border-gray-300 rounded-lg"
+        required
+      >
+        <option value="">{placeholder}</option>
+        {options.map((option) => (
+          <option key={option.id} value={option.id}>
+            {option.label}
+          </option>
+        ))}
+      </select>
+    </div>
+  );
+};
+
 // types.ts or at the top of page.tsx
 
 interface User {
@@ -717,27 +861,17 @@ const ActivityItem: React.FC<ActivityItemProps> = ({ text, time }) => (
 
 // CRUD Views
 const AdminsView: React.FC = () => {
-  const [admins, setAdmins] = useState<Admin[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: admins,
+    loading,
+    loadingMore,
+    hasMore,
+    loadMore,
+    reload: fetchAdmins,
+  } = usePagedList<Admin>("/admins", "admins");
   const [showModal, setShowModal] = useState(false);
   const [editingAdmin, setEditingAdmin] = useState<Admin | null>(null);
 
-  useEffect(() => {
-    fetchAdmins();
-  }, []);
-
-  const fetchAdmins = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/admins`);
-      const data = await response.json();
-      setAdmins(data.admins);
-    } catch (error) {
-      console.error("Error fetching admins:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleDelete = async (id: string) => {
     if (window.confirm("Are you sure you want to delete this admin?")) {
       try {
@@ -785,6 +919,7 @@ const AdminsView: React.FC = () => {
           onDelete={handleDelete}
         />
       )}
+      <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
 
       {showModal && (
         <AdminModal
@@ -805,27 +940,17 @@ const AdminsView: React.FC = () => {
 };
 
 const DoctorsView: React.FC = () => {
-  const [doctors, setDoctors] = useState<Doctor[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: doctors,
+    loading,
+    loadingMore,
+    hasMore,
+    loadMore,
+    reload: fetchDoctors,
+  } = usePagedList<Doctor>("/doctors", "doctors");
   const [showModal, setShowModal] = useState(false);
   const [editingDoctor, setEditingDoctor] = useState<Doctor | null>(null);
 
-  useEffect(() => {
-    fetchDoctors();
-  }, []);
-
-  const fetchDoctors = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/doctors`);
-      const data = await response.json();
-      setDoctors(data.doctors);
-    } catch (error) {
-      console.error("Error fetching doctors:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleDelete = async (id: string) => {
     if (window.confirm("Are you sure you want to delete this doctor?")) {
       try {
@@ -874,6 +999,7 @@ const DoctorsView: React.FC = () => {
           onDelete={handleDelete}
         />
       )}
+      <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
 
       {showModal && (
         <DoctorModal
@@ -894,27 +1020,17 @@ const DoctorsView: React.FC = () => {
 };
 
 const PatientsView: React.FC = () => {
-  const [patients, setPatients] = useState<Patient[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: patients,
+    loading,
+    loadingMore,
+    hasMore,
+    loadMore,
+    reload: fetchPatients,
+  } = usePagedList<Patient>("/patients", "patients");
   const [showModal, setShowModal] = useState(false);
   const [editingPatient, setEditingPatient] = useState<Patient | null>(null);
 
-  useEffect(() => {
-    fetchPatients();
-  }, []);
-
-  const fetchPatients = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/patients`);
-      const data = await response.json();
-      setPatients(data.patients);
-    } catch (error) {
-      console.error("Error fetching patients:", error);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleDelete = async (id: string) => {
     if (window.confirm("Are you sure you want to delete this patient?")) {
       try {
@@ -965,6 +1081,7 @@ const PatientsView: React.FC = () => {
           onDelete={handleDelete}
         />
       )}
+      <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
 
       {showModal && (
         <PatientModal
@@ -998,33 +1115,18 @@ interface Appointment {
 }
 
 const AppointmentsView: React.FC<AppointmentsViewProps> = ({ currentUser }) => {
-  const [appointments, setAppointments] = useState<Appointment[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: appointments,
+    loading,
+    loadingMore,
+    hasMore,
+    loadMore,
+    reload: fetchAppointments,
+  } = usePagedList<Appointment>("/appointments", "appointments");
   const [showModal, setShowModal] = useState(false);
   const [editingAppointment, setEditingAppointment] =
     useState<Appointment | null>(null);
 
-  useEffect(() => {
-    fetchAppointments();
-  }, []);
-
-  const fetchAppointments = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/appointments`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      console.log("Appointments data:", data); // Debug log
-      setAppointments(data.appointments || []);
-    } catch (error) {
-      console.error("Error fetching appointments:", error);
-      setAppointments([]); // Set empty array on error
-    } finally {
-      setLoading(false);
-    }
-  };
-
   // New function to get a specific appointment by ID
   const getAppointment = async (id: string): Promise<Appointment | null> => {
     try {
@@ -1130,6 +1232,7 @@ const AppointmentsView: React.FC<AppointmentsViewProps> = ({ currentUser }) => {
           onDelete={handleDelete}
         />
       )}
+      <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
 
       {showModal && (
         <AppointmentModal
@@ -1628,8 +1731,6 @@ const AppointmentModal = ({
   onSave,
   currentUser,
 }: AppointmentModalProps) => {
-  const [doctors, setDoctors] = useState<Doctor[]>([]);
-  const [patients, setPatients] = useState<Patient[]>([]);
   const [formData, setFormData] = useState({
     patient_id: appointment?.patient_id || "", // You'll need to add patient_id to your appointment interface
     doctor_id: appointment?.doctor_id || "", // You'll need to add doctor_id to your appointment interface
@@ -1641,34 +1742,6 @@ const AppointmentModal = ({
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
 
-  useEffect(() => {
-    // Fetch doctors and patients only if the current user is admin or doctor
-    if (
-      currentUser.user_type === "admin" ||
-      currentUser.user_type === "doctor"
-    ) {
-      const fetchDependencies = async () => {
-        try {
-          const [doctorsRes, patientsRes] = await Promise.all([
-            fetch(`${API_BASE_URL}/doctors`),
-            fetch(`${API_BASE_URL}/patients`),
-          ]);
-          const doctorsData = await doctorsRes.json();
-          const patientsData = await patientsRes.json();
-          setDoctors(doctorsData.doctors);
-          setPatients(patientsData.patients);
-        } catch (err) {
-          console.error(
-            "Error fetching doctors/patients for appointment modal:",
-            err
-          );
-          setError("Failed to load doctor and patient data.");
-        }
-      };
-      fetchDependencies();
-    }
-  }, [currentUser.user_type]);
-
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setLoading(true);
@@ -1711,36 +1784,26 @@ const AppointmentModal = ({
           </div>
         )}
         <form onSubmit={handleSubmit} className="space-y-4">
-          <select
+          <SearchSelect
+            entity="patients"
+            placeholder="Select Patient"
             value={formData.patient_id}
-            onChange={(e) =>
-              setFormData({ ...formData, patient_id: e.target.value })
-            }
-            className="w-full px-4 py-2 border border-gray-300 rounded-lg"
-            required
-          >
-            <option value="">Select Patient</option>
-            {patients.map((p) => (
-              <option key={p.id} value={p.id}>
-                {p.name}
-              </option>
-            ))}
-          </select>
-          <select
+            selectedLabel={appointment?.patient_name}
+            describe={(p: Patient) => p.name}
+            onChange={(patient_id) => setFormData({ ...formData, patient_id })}
+          />
+          <SearchSelect
+            entity="doctors"
+            placeholder="Select Doctor"
             value={formData.doctor_id}
-            onChange={(e) =>
-              setFormData({ ...formData, doctor_id: e.target.value })
+            selectedLabel={
+              appointment
+                ? `${appointment.doctor_name} (${appointment.specialization})`
+                : undefined
             }
-            className="w-full px-4 py-2 border border-gray-300 rounded-lg"
-            required
-          >
-            <option value="">Select Doctor</option>
-            {doctors.map((d) => (
-              <option key={d.id} value={d.id}>
-                {d.name} ({d.specialization})
-              </option>
-            ))}
-          </select>
+            describe={(d: Doctor) => `${d.name} (${d.specialization})`}
+            onChange={(doctor_id) => setFormData({ ...formData, doctor_id })}
+          />
           <input
             type="date"
             placeholder="Appointment Date"
@@ -0,0 +1,142 @@
+import json
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+MySQLdb = pytest.importorskip('MySQLdb')
+
+from audit import AUDIT_COLUMNS, AuditWriter, audit_event, created, deleted, diff  # noqa: E402
+
+
+def event(i):
+    return audit_event('UPDATE', 'appointment', i, {'status': ['Scheduled', 'Completed']}, ('admin', 1, 'root'),
+                       'update_appointment', '127.0.0.1')
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def executemany(self, sql, rows):
+        if self.conn.failures:
+            self.conn.failures -= 1
+            raise MySQLdb.OperationalError(2006, 'MySQL server has gone away')
+        if any(row[6] in self.conn.poison for row in rows):
+            raise MySQLdb.DataError(1406, 'Data too long')
+        self.conn.pending.extend(rows)
+
+
+class FakeConnection:
+    def __init__(self, store, failures=0, poison=()):
+        self.store = store
+        self.failures = failures
+        self.poison = set(poison)
+        self.pending = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.store.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        self.closed = True
+
+
+def test_diff_ignores_unchanged_values_in_request_form():
+    old = {'appointment_date': date(2025, 3, 1), 'appointment_time': timedelta(hours=10), 'status': 'Scheduled'}
+    new = {'appointment_date': '2025-03-01', 'appointment_time': '10:00', 'status': 'Completed'}
+    assert diff(old, new, list(new)) == {'status': ['Scheduled', 'Completed']}
+
+
+def test_diff_reports_changed_times_normalized():
+    old = {'appointment_time': timedelta(hours=10)}
+    assert diff(old, {'appointment_time': '10:30'}, ['appointment_time']) == {
+        'appointment_time': ['10:00:00', '10:30:00']}
+
+
+def test_secrets_are_never_copied():
+    assert diff({'password': 'old'}, {'password': 'new'}, ['password']) == {'password': ['[changed]', '[changed]']}
+    assert 'password' not in created({'username': 'a', 'password': 'x'})
+    assert deleted({'id': 1, 'password': 'x'}) == {'id': [1, None]}
+
+
+def test_audit_event_row_shape():
+    row = event(5)
+    assert len(row) == len(AUDIT_COLUMNS)
+    values = dict(zip(AUDIT_COLUMNS, row))
+    assert values['entity_id'] == 5 and values['actor_username'] == 'root'
+    assert json.loads(values['changes']) == {'status': ['Scheduled', 'Completed']}
+
+
+def test_writer_batches_and_drains_on_close():
+    store = []
+    writer = AuditWriter(lambda: FakeConnection(store), batch_size=10)
+    for i in range(25):
+        writer.record(event(i))
+    assert writer.close(timeout=5)
+    assert [row[6] for row in store] == list(range(25))
+    stats = writer.stats()
+    assert stats['written'] == 25 and stats['spilled'] == 0
+    assert stats['batches'] >= 3
+
+
+def test_writer_retries_then_spills():
+    store, spilled = [], []
+    connections = iter([FakeConnection(store, failures=1), FakeConnection(store)])
+    writer = AuditWriter(lambda: next(connections), retries=2,
+                         spill=lambda values, reason: spilled.append((values['entity_id'], reason)))
+    writer._write(None, [event(1)])
+    assert [row[6] for row in store] == [1]
+
+    connections = iter([FakeConnection(store, failures=1), FakeConnection(store, failures=1)])
+    assert writer._write(None, [event(2)]) is None
+    assert spilled == [(2, 'write failed')]
+    assert writer.stats()['failed_batches'] == 1
+
+
+def test_bad_event_is_spilled_alone_without_retries():
+    store, spilled, connections = [], [], []
+
+    def connect():
+        connections.append(FakeConnection(store, poison={3}))
+        return connections[-1]
+
+    writer = AuditWriter(connect, spill=lambda values, reason: spilled.append((values['entity_id'], reason)))
+    assert writer._write(None, [event(i) for i in range(6)]) is connections[0]
+    assert [row[6] for row in store] == [0, 1, 2, 4, 5]
+    assert spilled == [(3, 'rejected')]
+    stats = writer.stats()
+    assert stats['rejected'] == 1 and stats['failed_batches'] == 0 and len(connections) == 1
+
+
+def test_full_queue_spills_instead_of_blocking():
+    release = threading.Event()
+    store, spilled = [], []
+
+    def connect():
+        release.wait()
+        return FakeConnection(store)
+
+    writer = AuditWriter(connect, max_queue=2, spill=lambda values, reason: spilled.append(reason))
+    for i in range(6):
+        writer.record(event(i))
+    release.set()
+    writer.close(timeout=5)
+    stats = writer.stats()
+    assert stats['overflowed'] == len(spilled) > 0
+    assert stats['written'] + stats['overflowed'] == 6
+
+
+def test_record_after_close_spills():
+    spilled = []
+    writer = AuditWriter(lambda: FakeConnection([]), spill=lambda values, reason: spilled.append(reason))
+    writer.close()
+    writer.record(event(1))
+    assert spilled == ['writer closed']
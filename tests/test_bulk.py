@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+from bulk import (BatchError, batch_items, create_appointments, create_patients,  # noqa: E402
+                  update_appointment_statuses)
+from scheduling import SlotIndex  # noqa: E402
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+class FakeCursor:
+    """Answers the statements bulk.py issues from an in-memory appointments/users store"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        self.db.statements.append(sql)
+        params = list(params)
+        if sql.startswith('SELECT doctor_id, appointment_date, booked_time'):
+            keys = set(zip(params[::2], params[1::2]))
+            self.result = [row for row in self.db.appointments if (row['doctor_id'], row['appointment_date']) in keys]
+        elif sql.startswith('SELECT id, doctor_id, appointment_date, appointment_time FROM appointments'):
+            keys = set(zip(params[::3], params[1::3], [timedelta(hours=int(t[:2]), minutes=int(t[3:5]))
+                                                       for t in params[2::3]]))
+            self.result = [row for row in self.db.appointments
+                           if (row['doctor_id'], row['appointment_date'], row['booked_time']) in keys]
+        elif sql.startswith('SELECT id, doctor_id, appointment_date, appointment_time, status'):
+            self.result = [dict(row) for row in self.db.appointments if row['id'] in params]
+        elif sql.startswith('SELECT username FROM users'):
+            self.result = [{'username': name} for name in self.db.usernames if name in params]
+        elif sql.startswith('SELECT id, username FROM patients'):
+            self.result = [{'id': i, 'username': name} for i, name in enumerate(params, 100)]
+        elif sql.startswith('UPDATE appointments SET status'):
+            for row in self.db.appointments:
+                if row['id'] in params[1:]:
+                    row['status'] = params[0]
+
+    def executemany(self, sql, rows):
+        sql = ' '.join(sql.split())
+        self.db.statements.append(sql)
+        if sql.startswith('INSERT INTO appointments'):
+            for patient_id, doctor_id, day, appointment_time, symptoms, created_at in rows:
+                hours, minutes = map(int, appointment_time.split(':'))
+                self.db.appointments.append({'id': len(self.db.appointments) + 1, 'doctor_id': doctor_id,
+                                             'appointment_date': day, 'appointment_time': appointment_time,
+                                             'booked_time': timedelta(hours=hours, minutes=minutes),
+                                             'status': 'Scheduled'})
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self, appointments=(), usernames=()):
+        self.appointments = [dict(row) for row in appointments]
+        self.usernames = set(usernames)
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def count(self, prefix):
+        return sum(sql.startswith(prefix) for sql in self.statements)
+
+
+def slots():
+    return SlotIndex(lambda doctor_id, day: pytest.fail('booked slots loaded one day at a time'))
+
+
+def booking(doctor_id, appointment_time, day=TOMORROW):
+    return {'patient_id': 1, 'doctor_id': doctor_id, 'appointment_date': day.isoformat(),
+            'appointment_time': appointment_time}
+
+
+def test_batch_items():
+    assert batch_items({'updates': [1]}, 'updates', 5) == [1]
+    for data in (None, {'updates': []}, {'updates': {}}, {'updates': [1] * 6}):
+        with pytest.raises(BatchError):
+            batch_items(data, 'updates', 5)
+
+
+def test_create_appointments_reads_booked_slots_once_per_chunk():
+    db = FakeDB([{'id': 1, 'doctor_id': 1, 'appointment_date': TOMORROW, 'appointment_time': '09:00',
+                  'booked_time': timedelta(hours=9), 'status': 'Scheduled'}])
+    items = [booking(1, '09:00'), booking(1, '09:30'), booking(2, '09:00'), booking(1, '09:30'),
+             booking(1, '09:10'), {'patient_id': 'x', 'doctor_id': 1}]
+    results, inserted = create_appointments(db, items, slots(), chunk_size=50)
+    assert [result['status'] for result in results] == ['error', 'created', 'created', 'error', 'error', 'error']
+    assert results[0]['error'] == 'Doctor already has an appointment in this slot'
+    assert results[3]['error'] == 'Duplicate slot in batch'
+    assert results[5]['error'] == 'Missing required field: appointment_date'
+    assert [row['id'] for row in inserted] == [results[1]['id'], results[2]['id']]
+    assert db.count('SELECT doctor_id, appointment_date, booked_time') == 1
+    assert db.count('INSERT INTO appointments') == 1
+
+
+def test_loaded_days_are_not_read_again():
+    db = FakeDB()
+    index = slots()
+    create_appointments(db, [booking(3, '10:00')], index, chunk_size=50)
+    index.book(3, TOMORROW, '10:00')
+    results, _ = create_appointments(db, [booking(3, '10:00'), booking(3, '10:30')], index, chunk_size=50)
+    assert [result['status'] for result in results] == ['error', 'created']
+    assert db.count('SELECT doctor_id, appointment_date, booked_time') == 1
+
+
+def test_status_updates_lock_rows_and_respect_doctor():
+    db = FakeDB([{'id': 1, 'doctor_id': 1, 'appointment_date': TOMORROW, 'appointment_time': '09:00',
+                  'status': 'Scheduled'},
+                 {'id': 2, 'doctor_id': 2, 'appointment_date': TOMORROW, 'appointment_time': '09:00',
+                  'status': 'Scheduled'}])
+    updates = [{'id': 1, 'status': 'Completed'}, {'id': 2, 'status': 'Completed'}, {'id': 9, 'status': 'Completed'},
+               {'id': 1, 'status': 'Cancelled'}, {'id': 'one', 'status': 'Completed'}]
+    results, changes = update_appointment_statuses(db, updates, chunk_size=50, doctor_id=1)
+    assert [result.get('error') for result in results] == [None, 'Forbidden', 'Appointment not found',
+                                                          'Duplicate id in batch', 'id must be an integer']
+    assert [(old['id'], old['status'], status) for old, status in changes] == [(1, 'Scheduled', 'Completed')]
+    assert [sql for sql in db.statements if sql.startswith('SELECT')][0].endswith('FOR UPDATE')
+    assert db.appointments[1]['status'] == 'Scheduled'
+
+
+def test_create_patients_skips_taken_and_invalid():
+    db = FakeDB(usernames={'taken'})
+    items = [{'name': 'A', 'username': 'amy', 'password': 'pw', 'email': 'amy@example.com', 'phone': '1'},
+             {'name': 'B', 'username': 'taken', 'password': 'pw', 'email': 'b@example.com', 'phone': '2'},
+             {'name': 'C', 'username': 'cat', 'password': 'pw', 'email': 'not-an-email', 'phone': '3'},
+             {'name': 'D', 'username': 'amy', 'password': 'pw', 'email': 'd@example.com', 'phone': '4'}]
+    results = create_patients(db, items, lambda passwords: ['hashed'] * len(passwords), chunk_size=50)
+    assert [result.get('error') for result in results] == [None, 'Username already exists', 'Invalid email address',
+                                                          'Duplicate username in batch']
+    assert results[0] == {'index': 0, 'status': 'created', 'id': 100}
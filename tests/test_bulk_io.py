@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+from bulk_io import ENTITIES, prepare_rows, validate_appointment  # noqa: E402
+from scheduling import SlotIndex  # noqa: E402
+
+slots = SlotIndex(lambda doctor_id, day: ())
+
+
+def appointment(**fields):
+    row = {'patient_id': '1', 'doctor_id': '2', 'appointment_date': '2025-03-01', 'appointment_time': '09:30'}
+    row.update(fields)
+    return row
+
+
+def test_valid_appointment_is_normalized():
+    record = dict(appointment(), status='Scheduled')
+    assert validate_appointment(record, slots) is None
+    assert record['doctor_id'] == 2 and str(record['appointment_date']) == '2025-03-01'
+
+
+@pytest.mark.parametrize('fields', [{'doctor_id': 'two'}, {'appointment_date': '2025-02-30'},
+                                    {'appointment_time': '09:10'}, {'appointment_time': '25:00'},
+                                    {'status': 'Maybe'}])
+def test_invalid_appointment_is_reported(fields):
+    record = dict(appointment(), status='Scheduled')
+    record.update(fields)
+    assert validate_appointment(record, slots)
+
+
+def test_prepare_rows_rejects_with_line_numbers():
+    rows = [appointment(), appointment(doctor_id=''), appointment(status='Maybe'),
+            appointment(appointment_time='10:00')]
+    values, lines, rejected = prepare_rows(ENTITIES['appointments'], rows, None, False, slots, first_line=10)
+    assert lines == [10, 13]
+    assert [line for line, _ in rejected] == [11, 12]
+    assert rejected[0][1] == 'Missing required field: doctor_id'
+    assert values[0][ENTITIES['appointments']['columns'].index('status')] == 'Scheduled'
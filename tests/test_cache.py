@@ -0,0 +1,96 @@
+import pytest
+
+from cache import LRUCache, RedisCache, create_cache
+
+
+class FakeRedis:
+    """The slice of the redis-py client RedisCache uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip('*'))]
+
+    def info(self, section):
+        return {'evicted_keys': 4}
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    def execute(self):
+        for key, value in self.commands:
+            self.client.set(key, value)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 2)
+
+
+def test_lru_entries_expire_after_ttl():
+    cache = LRUCache(ttl=-1)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1 and cache.stats()['size'] == 0
+
+
+def test_lru_delete_and_clear():
+    cache = LRUCache()
+    cache.set_many({'a': 1, 'b': 2})
+    cache.delete('a')
+    assert cache.get('a') is None and cache.stats()['invalidations'] == 1
+    cache.clear()
+    assert cache.get('b') is None
+
+
+def test_redis_cache_round_trips_json_under_prefix():
+    client = FakeRedis()
+    cache = RedisCache(client, prefix='t:')
+    cache.set('doctor:1', {'id': 1, 'name': 'House'})
+    cache.set_many({'doctor:2': {'id': 2}, 'doctor:3': {'id': 3}})
+    assert set(client.data) == {'t:doctor:1', 't:doctor:2', 't:doctor:3'}
+    assert cache.get('doctor:1') == {'id': 1, 'name': 'House'}
+    assert cache.get_many(['doctor:2', 'doctor:9']) == {'doctor:2': {'id': 2}}
+    assert cache.get_many([]) == {}
+    cache.delete('doctor:2')
+    assert cache.get('doctor:2') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations'], stats['evictions']) == (2, 2, 1, 4)
+    cache.clear()
+    assert client.data == {}
+
+
+def test_create_cache():
+    assert isinstance(create_cache('local', maxsize=5), LRUCache)
+    with pytest.raises(ValueError):
+        create_cache('memcached')
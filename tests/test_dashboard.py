@@ -0,0 +1,81 @@
+import threading
+from datetime import date
+
+from dashboard import DashboardCounters, summarize
+
+ROWS = [
+    {'metric': 'patients', 'label': None, 'specialization': None, 'count': 12},
+    {'metric': 'doctors', 'label': None, 'specialization': None, 'count': 3},
+    {'metric': 'admins', 'label': None, 'specialization': None, 'count': 1},
+    {'metric': 'appointments', 'label': None, 'specialization': None, 'count': 9},
+    {'metric': 'status', 'label': 'Scheduled', 'specialization': None, 'count': 7},
+    {'metric': 'status', 'label': 'Completed', 'specialization': None, 'count': 2},
+    {'metric': 'today', 'label': 4, 'specialization': 'Cardiology', 'count': 2},
+    {'metric': 'today', 'label': 5, 'specialization': None, 'count': 1},
+]
+
+
+def test_summarize_folds_query_rows():
+    stats = summarize(ROWS)
+    assert (stats['total_patients'], stats['total_doctors'], stats['total_admins']) == (12, 3, 1)
+    assert stats['total_appointments'] == 9 and stats['today_appointments'] == 3
+    assert stats['appointments_by_status'] == {'Scheduled': 7, 'Completed': 2}
+    assert stats['today_by_doctor'] == {'4': 2, '5': 1}
+    assert stats['today_by_specialization'] == {'Cardiology': 2, 'Unknown': 1}
+
+
+def test_snapshot_is_computed_once_while_fresh():
+    calls = []
+    counters = DashboardCounters(lambda today: calls.append(today) or summarize(ROWS), ttl=60)
+    assert counters.peek() is None
+    first = counters.get()
+    first['total_patients'] = 0
+    assert counters.get()['total_patients'] == 12
+    assert calls == [date.today()] and counters.refreshes == 1
+    counters.invalidate()
+    counters.get()
+    assert len(calls) == 2
+
+
+def test_concurrent_pollers_share_one_refresh():
+    release = threading.Event()
+    calls = []
+
+    def compute(today):
+        calls.append(today)
+        release.wait(5)
+        return summarize(ROWS)
+
+    counters = DashboardCounters(compute)
+    threads = [threading.Thread(target=counters.get) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_writes_adjust_the_snapshot():
+    counters = DashboardCounters(lambda today: summarize(ROWS))
+    counters.get()
+    counters.entity_changed('patients', 1)
+    today = date.today().isoformat()
+    old = {'doctor_id': 5, 'appointment_date': today, 'status': 'Scheduled', 'specialization': None}
+    counters.appointment_changed(old, dict(old, status='Completed'))
+    counters.appointment_changed(new={'doctor_id': 6, 'appointment_date': '2000-01-01', 'status': 'Scheduled'})
+    counters.appointment_changed(old=old)
+    stats = counters.peek()
+    assert stats['total_patients'] == 13 and stats['total_appointments'] == 9
+    assert stats['appointments_by_status'] == {'Scheduled': 6, 'Completed': 3}
+    assert stats['today_appointments'] == 2
+    # Buckets that drop to zero are removed
+    assert stats['today_by_doctor'] == {'4': 2}
+    assert stats['today_by_specialization'] == {'Cardiology': 2}
+
+
+def test_changes_without_snapshot_are_ignored():
+    counters = DashboardCounters(lambda today: summarize(ROWS))
+    counters.entity_changed('doctors', 1)
+    counters.appointment_changed(new={'doctor_id': 1, 'appointment_date': '2025-01-01', 'status': 'Scheduled'})
+    assert counters.get()['total_doctors'] == 3
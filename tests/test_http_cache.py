@@ -0,0 +1,67 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from http_cache import TableVersions, choose_encoding, compress, not_modified, validators
+
+MARCH = datetime(2025, 3, 1, 12, 0, 0, 500000)
+APRIL = datetime(2025, 4, 1, 8, 30, 0)
+VERSIONS = {'doctors': (3, MARCH), 'appointments': (7, APRIL)}
+
+
+def request(**headers):
+    return EnvironBuilder(headers=headers).get_request()
+
+
+def test_validators_follow_versions_and_key():
+    etag, last_modified = validators(VERSIONS, ('doctors', 'appointments'), '/api/appointments?limit=10')
+    assert last_modified == APRIL
+    assert validators(VERSIONS, ('doctors', 'appointments'), '/api/appointments?limit=10')[0] == etag
+    assert validators(VERSIONS, ('doctors', 'appointments'), '/api/appointments?limit=20')[0] != etag
+    bumped = dict(VERSIONS, doctors=(4, MARCH))
+    assert validators(bumped, ('doctors', 'appointments'), '/api/appointments?limit=10')[0] != etag
+
+
+def test_not_modified_prefers_etag():
+    etag, last_modified = validators(VERSIONS, ('doctors',), '/api/doctors')
+    assert not_modified(request(**{'If-None-Match': f'"{etag}"'}), etag, last_modified)
+    assert not_modified(request(**{'If-None-Match': f'"{etag}-gzip"'}), etag, last_modified)
+    stale = request(**{'If-None-Match': '"other"', 'If-Modified-Since': 'Sat, 01 Mar 2025 13:00:00 GMT'})
+    assert not not_modified(stale, etag, last_modified)
+
+
+def test_not_modified_since_ignores_microseconds():
+    assert not_modified(request(**{'If-Modified-Since': 'Sat, 01 Mar 2025 12:00:00 GMT'}), 'x', MARCH)
+    assert not not_modified(request(**{'If-Modified-Since': 'Sat, 01 Mar 2025 11:59:59 GMT'}), 'x', MARCH)
+    assert not not_modified(request(), 'x', MARCH)
+
+
+@pytest.mark.parametrize('header, encoding', [('gzip, deflate', 'gzip'), ('gzip;q=0', None), ('identity', None),
+                                              ('GZIP;q=0.5', 'gzip'), ('gzip;q=x', None)])
+def test_choose_encoding(header, encoding):
+    assert choose_encoding(header) == encoding
+
+
+def test_gzip_is_deterministic():
+    body = b'{"doctors":[]}' * 100
+    assert compress(body, 'gzip') == compress(body, 'gzip')
+    assert gzip.decompress(compress(body, 'gzip')) == body
+
+
+def test_table_versions_reuse_reads_within_ttl():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [{'name': 'doctors', 'version': len(loads), 'updated_at': MARCH}]
+
+    assert TableVersions(load).get() == {'doctors': (1, MARCH)}
+    assert TableVersions(load).peek() is None
+
+    cached = TableVersions(load, ttl=60)
+    assert cached.get() is cached.get()
+    cached.invalidate()
+    assert cached.get()['doctors'][0] == len(loads)
+    assert len(loads) == 3
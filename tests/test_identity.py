@@ -0,0 +1,75 @@
+import pytest
+
+MySQLdb = pytest.importorskip('MySQLdb')
+
+from identity import (ER_DUP_ENTRY, ROLE_TABLES, backfill, claim_usernames, existing_usernames,  # noqa: E402
+                      find_account, is_duplicate)
+
+
+class FakeCursor:
+    """Records statements and answers each fetch from a queue of canned results"""
+
+    def __init__(self, results=(), rowcount=0):
+        self.results = list(results)
+        self.rowcount = rowcount
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+
+    def executemany(self, sql, rows):
+        self.statements.append((' '.join(sql.split()), list(rows)))
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+
+    def cursor(self, cursor_class=None):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_is_duplicate():
+    assert is_duplicate(MySQLdb.IntegrityError(ER_DUP_ENTRY, "Duplicate entry 'bob'"))
+    assert not is_duplicate(MySQLdb.IntegrityError(1452, 'foreign key constraint fails'))
+    assert not is_duplicate(MySQLdb.OperationalError(ER_DUP_ENTRY, 'not an integrity error'))
+
+
+def test_existing_usernames_is_one_query():
+    cursor = FakeCursor([[{'username': 'bob'}]])
+    assert existing_usernames(cursor, ['bob', 'amy']) == {'bob'}
+    assert cursor.statements == [('SELECT username FROM users WHERE username IN (%s, %s)', ['bob', 'amy'])]
+    assert existing_usernames(cursor, []) == set() and len(cursor.statements) == 1
+
+
+def test_claim_usernames_is_one_executemany():
+    cursor = FakeCursor()
+    claim_usernames(cursor, [('bob', 'patient', 1), ('amy', 'patient', 2)])
+    (sql, rows), = cursor.statements
+    assert sql.startswith('INSERT INTO users') and rows == [('bob', 'patient', 1), ('amy', 'patient', 2)]
+
+
+def test_find_account_probes_by_username():
+    account = {'role': 'doctor', 'id': 3, 'username': 'house', 'name': 'House', 'password': 'x'}
+    cursor = FakeCursor([account])
+    assert find_account(cursor, 'house') == account
+    assert cursor.statements[0][0].endswith('WHERE u.username = %s') and cursor.statements[0][1] == ('house',)
+
+
+def test_backfill_reports_conflicts_per_role():
+    cursor = FakeCursor([[], [{'id': 7, 'username': 'bob'}], []], rowcount=2)
+    conn = FakeConnection(cursor)
+    inserted, conflicts = backfill(conn)
+    assert inserted == 2 * len(ROLE_TABLES)
+    assert conflicts == [('doctor', 7, 'bob')]
+    assert conn.commits == len(ROLE_TABLES)
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    # Tiny costs: the tests are about the encoding and the pool, not the KDF strength
+    hasher = PasswordHasher(scrypt_n=2 ** 4, pbkdf2_iterations=10, max_workers=2)
+    yield hasher
+    hasher.close()
+
+
+def test_hash_and_verify(hasher):
+    encoded = hasher.hash('s3cret')
+    assert encoded.startswith('scrypt$16$8$1$')
+    assert hasher.verify('s3cret', encoded)
+    assert not hasher.verify('wrong', encoded)
+    assert hasher.hash('s3cret') != encoded
+
+
+def test_pbkdf2_scheme():
+    hasher = PasswordHasher(scheme='pbkdf2_sha256', pbkdf2_iterations=10, max_workers=1)
+    try:
+        encoded = hasher.hash('s3cret')
+        assert encoded.startswith('pbkdf2_sha256$10$')
+        assert hasher.verify('s3cret', encoded)
+    finally:
+        hasher.close()
+
+
+def test_legacy_hashes_verify_and_need_rehash(hasher):
+    legacy = hashlib.sha256(b's3cret').hexdigest()
+    assert hasher.verify('s3cret', legacy)
+    assert not hasher.verify('wrong', legacy)
+    assert hasher.needs_rehash(legacy)
+
+
+def test_needs_rehash_on_cost_change(hasher):
+    encoded = hasher.hash('s3cret')
+    assert not hasher.needs_rehash(encoded)
+    stronger = PasswordHasher(scrypt_n=2 ** 5, max_workers=1)
+    try:
+        assert stronger.needs_rehash(encoded)
+        assert stronger.verify('s3cret', encoded)
+    finally:
+        stronger.close()
+
+
+@pytest.mark.parametrize('encoded', ['', 'bcrypt$x$y', 'scrypt$16$8$1$zz$00', 'scrypt$16'])
+def test_unknown_or_broken_hashes_fail(hasher, encoded):
+    assert not hasher.verify('s3cret', encoded)
+
+
+def test_hash_many_keeps_order(hasher):
+    passwords = [f'pw{i}' for i in range(7)]
+    hashes = hasher.hash_many(passwords)
+    assert all(hasher.verify(password, encoded) for password, encoded in zip(passwords, hashes))
+    assert hasher.stats()['derivations'] >= 7
+
+
+def test_saturated_pool_raises_busy():
+    hasher = PasswordHasher(scrypt_n=2 ** 4, max_workers=1, max_pending=0, timeout=0.05, verified_cache_size=0)
+    release = threading.Event()
+    try:
+        blocker = hasher._submit(release.wait)
+        with pytest.raises(HasherBusy):
+            hasher.hash('s3cret')
+        with pytest.raises(HasherBusy):
+            hasher.hash_many(['a', 'b'])
+        release.set()
+        blocker.result()
+        assert hasher.verify('s3cret', hasher.hash('s3cret'))
+        assert hasher.stats()['rejected'] == 2
+    finally:
+        release.set()
+        hasher.close()
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY)')
+    return path
+
+
+def is_open(conn):
+    try:
+        conn.execute('SELECT 1')
+        return True
+    except sqlite3.ProgrammingError:
+        return False
+
+
+def test_warms_to_min_size_and_reuses_connections(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database), min_size=2, max_size=3)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    stats = pool.stats()
+    assert stats['created'] == 2 and stats['size'] == 2 and stats['in_use'] == 1
+
+
+def test_checkout_times_out_when_exhausted(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database), max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_expired_connections_are_recycled(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database))
+    conn = pool.acquire()
+    pool.max_age = -1
+    pool.release(conn)
+    assert not is_open(conn) and pool.stats()['size'] == 0
+
+    pool.max_age = 3600
+    kept = pool.acquire()
+    pool.release(kept)
+    pool.max_age = -1
+    # An idle connection that aged out is swapped on checkout
+    assert pool.acquire() is not kept and not is_open(kept)
+    stats = pool.stats()
+    assert stats['recycled'] == 2 and stats['created'] == 3 and stats['size'] == 1
+
+
+def test_failed_ping_replaces_the_connection(database):
+    dead = set()
+
+    def ping(conn):
+        if id(conn) in dead:
+            raise sqlite3.OperationalError('server has gone away')
+
+    pool = ConnectionPool(lambda: sqlite3.connect(database), ping=ping)
+    conn = pool.acquire()
+    pool.release(conn)
+    dead.add(id(conn))
+    fresh = pool.acquire()
+    assert fresh is not conn and not is_open(conn)
+    assert pool.stats()['broken'] == 1
+
+
+def test_release_rolls_back_open_transaction(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database))
+    conn = pool.acquire()
+    conn.execute('INSERT INTO items (id) VALUES (1)')
+    pool.release(conn)
+    with sqlite3.connect(database) as other:
+        assert other.execute('SELECT COUNT(*) FROM items').fetchone() == (0,)
+
+
+def test_release_discards_connection_that_cannot_roll_back(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database))
+    conn = pool.acquire()
+    conn.close()
+    pool.release(conn)
+    stats = pool.stats()
+    assert stats['size'] == 0 and stats['idle'] == 0 and stats['broken'] == 1
+    assert pool.acquire() is not conn
+
+
+def test_after_fork_forgets_inherited_connections(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database), min_size=2, max_size=4)
+    inherited = pool.acquire()
+    pool.after_fork(max_size=1)
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['in_use'], stats['max_size'], stats['min_size']) == (0, 0, 0, 1, 1)
+    # The parent's sessions stay open
+    assert is_open(inherited)
+    assert pool.acquire() is not inherited
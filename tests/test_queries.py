@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from queries import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidListParams, build_list_query, decode_cursor,
+                     encode_cursor, paginate, parse_limit, profiles_query)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor([date(2025, 3, 1), 42])
+    assert decode_cursor(token, 2) == ['2025-03-01', 42]
+
+
+@pytest.mark.parametrize('token', ['not base64!', encode_cursor([1]), encode_cursor({'a': 1})])
+def test_bad_cursor(token):
+    with pytest.raises(InvalidListParams):
+        decode_cursor(token, 2)
+
+
+def test_parse_limit():
+    assert parse_limit({}) == DEFAULT_PAGE_SIZE
+    assert parse_limit({'limit': str(MAX_PAGE_SIZE)}) == MAX_PAGE_SIZE
+    for raw in ('0', str(MAX_PAGE_SIZE + 1), 'ten'):
+        with pytest.raises(InvalidListParams):
+            parse_limit({'limit': raw})
+
+
+def test_list_query_fetches_one_extra_row():
+    query, params, limit = build_list_query('doctors', {'limit': '10'})
+    assert query.endswith('ORDER BY name ASC, id ASC LIMIT %s')
+    assert params == [11]
+    assert limit == 10
+
+
+def test_list_query_filters_and_keyset():
+    after = encode_cursor(['2025-03-01', 7])
+    query, params, _ = build_list_query('appointments', {'doctor_id': '3', 'status': '', 'after': after})
+    assert 'a.doctor_id = %s' in query
+    assert 'a.status' not in query
+    assert '((a.appointment_date < %s) OR (a.appointment_date = %s AND a.id < %s))' in query
+    assert params == [3, '2025-03-01', '2025-03-01', 7, DEFAULT_PAGE_SIZE + 1]
+
+
+def test_list_query_rejects_bad_filter():
+    with pytest.raises(InvalidListParams, match='date_from'):
+        build_list_query('appointments', {'date_from': '03/01/2025'})
+
+
+def test_scoped_query_always_applies_scope():
+    query, params, _ = build_list_query('patient_appointments', {}, scope=5)
+    assert 'WHERE patient_id = %s' in query
+    assert params[0] == 5
+
+
+def test_unpaginated_query_has_no_limit():
+    query, params, limit = build_list_query('patients', {'limit': '10'}, paginated=False)
+    assert 'LIMIT' not in query
+    assert params == [] and limit is None
+
+
+def test_paginate():
+    rows = [{'name': f'n{i}', 'id': i} for i in range(3)]
+    page, cursor = paginate('doctors', rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor, 2) == ['n1', 1]
+    assert paginate('doctors', rows, 3) == (rows, None)
+
+
+def test_profiles_query():
+    assert profiles_query('doctor', 3).endswith('WHERE id IN (%s, %s, %s)')
@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+from reports import (InvalidReportParams, RollupFrame, appointment_counts, no_show_rates,  # noqa: E402
+                     parse_report_params)
+
+TODAY = date(2025, 3, 12)
+
+ROWS = [
+    {'day': date(2025, 3, 10), 'doctor_id': 1, 'status': 'Completed', 'appointments': 4},
+    {'day': date(2025, 3, 10), 'doctor_id': 1, 'status': 'No-Show', 'appointments': 1},
+    {'day': date(2025, 3, 11), 'doctor_id': 2, 'status': 'Scheduled', 'appointments': 2},
+    {'day': date(2025, 3, 11), 'doctor_id': 2, 'status': 'Cancelled', 'appointments': 3},
+    {'day': date(2025, 3, 14), 'doctor_id': 1, 'status': 'Scheduled', 'appointments': 5},
+]
+SPECIALIZATIONS = {1: 'Cardiology'}
+
+
+def test_parse_report_params_defaults():
+    assert parse_report_params({}, today=TODAY) == (date(2025, 2, 11), TODAY, ['day'])
+    assert parse_report_params({'date_from': '2025-01-01', 'date_to': '2025-01-31', 'group_by': 'doctor,status'},
+                               today=TODAY) == (date(2025, 1, 1), date(2025, 1, 31), ['doctor', 'status'])
+
+
+@pytest.mark.parametrize('args', [{'date_from': '2025-13-01'}, {'date_from': '2025-03-02', 'date_to': '2025-03-01'},
+                                  {'date_from': '2000-01-01'}, {'group_by': 'hour'}, {'group_by': 'day,day'}])
+def test_parse_report_params_rejects(args):
+    with pytest.raises(InvalidReportParams):
+        parse_report_params(args, today=TODAY)
+
+
+def test_counts_by_calendar_groupings():
+    frame = RollupFrame(ROWS)
+    assert appointment_counts(frame, ['week'], SPECIALIZATIONS) == [
+        {'week': '2025-03-10', 'appointments': 15}]
+    assert appointment_counts(frame, ['day'], SPECIALIZATIONS)[0] == {'day': '2025-03-10', 'appointments': 5}
+    assert appointment_counts(frame, [], SPECIALIZATIONS) == [{'appointments': 15}]
+
+
+def test_counts_by_specialization_and_status():
+    rows = appointment_counts(RollupFrame(ROWS), ['specialization', 'status'], SPECIALIZATIONS)
+    assert {(row['specialization'], row['status']): row['appointments'] for row in rows} == {
+        ('Cardiology', 'Completed'): 4, ('Cardiology', 'No-Show'): 1, ('Cardiology', 'Scheduled'): 5,
+        ('Unknown', 'Scheduled'): 2, ('Unknown', 'Cancelled'): 3}
+
+
+def test_no_show_rates_count_past_non_cancelled_appointments():
+    rows = no_show_rates(RollupFrame(ROWS), ['doctor'], SPECIALIZATIONS, today=TODAY)
+    # Doctor 1: 4 completed + 1 no-show are due, the future 5 are not; doctor 2: 2 still Scheduled are missed
+    assert rows == [{'doctor': 1, 'appointments': 5, 'no_shows': 1, 'no_show_rate': 0.2},
+                    {'doctor': 2, 'appointments': 2, 'no_shows': 2, 'no_show_rate': 1.0}]
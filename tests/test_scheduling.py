@@ -0,0 +1,97 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from scheduling import SlotError, SlotIndex, to_date, to_minutes, to_seconds
+
+
+def index(booked=None, **kwargs):
+    booked = booked or {}
+    return SlotIndex(lambda doctor_id, day: booked.get((doctor_id, day), []), **kwargs)
+
+
+def test_to_seconds_accepts_column_and_request_values():
+    assert to_seconds('09:30') == to_seconds('09:30:00') == 9 * 3600 + 30 * 60
+    assert to_seconds(timedelta(hours=9, minutes=30)) == 9 * 3600 + 30 * 60
+    assert to_seconds(time(9, 30, 15)) == 9 * 3600 + 30 * 60 + 15
+    assert to_minutes('09:30:59') == 9 * 60 + 30
+
+
+@pytest.mark.parametrize('value', ['9', '24:00', '09:60', '09:00:60', 'nine:00', '09:00:00:00'])
+def test_to_seconds_rejects_invalid_times(value):
+    with pytest.raises(SlotError):
+        to_seconds(value)
+
+
+@pytest.mark.parametrize('value', [900, 9.5, None, ['09:00'], {'time': '09:00'}])
+def test_non_time_values_are_slot_errors(value):
+    with pytest.raises(SlotError):
+        to_seconds(value)
+    with pytest.raises(SlotError):
+        index().slot_of(value)
+
+
+def test_to_date():
+    assert to_date('2025-03-01') == to_date('2025-03-01T10:00:00') == date(2025, 3, 1)
+    with pytest.raises(SlotError):
+        to_date('2025-02-30')
+
+
+def test_slot_of_grid():
+    slots = index()
+    assert slots.slot_of('09:00') == 0
+    assert slots.slot_of('16:30') == slots.slot_count - 1
+    for value in ('08:30', '17:00', '09:15', '09:00:30'):
+        with pytest.raises(SlotError):
+            slots.slot_of(value)
+
+
+def test_check_day_horizon():
+    today = date(2025, 3, 1)
+    slots = index(horizon_days=10)
+    assert slots.check_day('2025-03-11', today) == date(2025, 3, 11)
+    for day in ('2025-02-28', '2025-03-12'):
+        with pytest.raises(SlotError):
+            slots.check_day(day, today)
+
+
+def test_booked_slots_come_from_the_loader_once():
+    day = date(2025, 3, 1)
+    slots = index({(1, day): [timedelta(hours=9), timedelta(hours=10)]})
+    assert slots.is_booked(1, day, '09:00')
+    assert not slots.is_booked(1, day, '09:30')
+    assert '09:00' not in slots.free_slots(1, day)
+    assert slots.loads == 1
+
+
+def test_off_grid_rows_block_their_slot():
+    day = date(2025, 3, 1)
+    slots = index({(1, day): [timedelta(hours=9, minutes=10)]})
+    assert slots.is_booked(1, day, '09:00')
+
+
+def test_primed_days_skip_the_loader():
+    day = date(2025, 3, 1)
+    slots = SlotIndex(lambda doctor_id, day: pytest.fail('loaded one day at a time'))
+    assert sorted(slots.unloaded([(1, '2025-03-01'), (2, day), (1, day)])) == [(1, day), (2, day)]
+    slots.prime({(1, day): [timedelta(hours=9)], (2, day): []})
+    assert slots.unloaded([(1, day), (2, day)]) == []
+    assert slots.is_booked(1, day, '09:00') and not slots.is_booked(2, day, '09:00')
+
+
+def test_book_and_release_update_loaded_days():
+    day = date(2025, 3, 1)
+    slots = index()
+    assert not slots.is_booked(2, day, '11:00')
+    slots.book(2, day, '11:00')
+    assert slots.is_booked(2, day, '11:00')
+    slots.release(2, day, '11:00')
+    assert not slots.is_booked(2, day, '11:00')
+    assert slots.loads == 1
+
+
+def test_days_are_evicted_beyond_max_days():
+    slots = index(max_days=2)
+    for day in range(1, 4):
+        slots.free_slots(1, date(2025, 3, day))
+    assert slots.stats()['days_cached'] == 2
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+
+from queries import InvalidListParams
+from search import MAX_LIMIT, escape_like, fuzzy_query, parse_search, prefix_query, run_search
+
+
+def test_parse_search():
+    assert parse_search({'q': '  Jane   Doe ', 'limit': '5', 'fuzzy': '0', 'specialization': 'Cardiology'}) == (
+        'Jane Doe', 5, False, 'Cardiology')
+    assert parse_search({'q': 'x'})[1:] == (20, True, None)
+
+
+@pytest.mark.parametrize('args', [{}, {'q': '   '}, {'q': 'x' * 101}, {'q': 'x', 'limit': 'ten'},
+                                  {'q': 'x', 'limit': '0'}, {'q': 'x', 'limit': str(MAX_LIMIT + 1)}])
+def test_parse_search_rejects(args):
+    with pytest.raises(InvalidListParams):
+        parse_search(args)
+
+
+def test_escape_like():
+    assert escape_like('50%_off\\') == '50\\%\\_off\\\\'
+
+
+def test_prefix_query_skips_branches_that_cannot_match():
+    _, params = prefix_query('patients', 'jane doe', 10)
+    # name only: usernames have no spaces, phones start with a digit
+    assert params == ['jane doe%', 10, 10]
+    query, params = prefix_query('patients', '+4412', 10)
+    assert 'username LIKE' in query and 'phone LIKE' in query and 'name LIKE' in query
+    assert params == ['+4412%', 10] * 3 + [10]
+
+
+def test_fuzzy_query_excludes_prefix_hits():
+    query, params = fuzzy_query('doctors', 'smiht', 5, [3, 4])
+    assert 'id NOT IN (%s, %s)' in query
+    assert params == ['smiht', 'smiht', 3, 4, 5]
+    assert 'NOT IN' not in fuzzy_query('doctors', 'smiht', 5, [])[0]
+
+
+def fake_fetch(prefix_rows, fuzzy_rows):
+    calls = []
+
+    def fetch_rows(cursor, query, params):
+        calls.append(query)
+        rows = fuzzy_rows if 'MATCH(' in query else prefix_rows
+        return [dict(row) for row in rows]
+    return fetch_rows, calls
+
+
+def doctor(i, specialization, score=2):
+    return {'id': i, 'name': f'Dr {i}', 'specialization': specialization, 'score': Decimal(score)}
+
+
+def test_fuzzy_pass_fills_up_prefix_hits():
+    fetch_rows, calls = fake_fetch([{'id': 1, 'score': 3}], [{'id': 2, 'score': 0.5}])
+    result = run_search(None, 'patients', {'q': 'smi', 'limit': '5'}, fetch_rows)
+    assert [(row['id'], row['match'], row['score']) for row in result['results']] == [(1, 'prefix', 3.0),
+                                                                                     (2, 'fuzzy', 0.5)]
+    assert 'facets' not in result and len(calls) == 2
+
+
+@pytest.mark.parametrize('args', [{'q': 'sm', 'limit': '5'}, {'q': 'smith', 'limit': '1'},
+                                  {'q': 'smith', 'fuzzy': '0'}])
+def test_fuzzy_pass_is_skipped(args):
+    fetch_rows, calls = fake_fetch([{'id': 1, 'score': 3}], [{'id': 2, 'score': 1}])
+    run_search(None, 'patients', args, fetch_rows)
+    assert len(calls) == 1
+
+
+def test_doctor_facets_count_every_candidate():
+    rows = [doctor(1, 'Cardiology'), doctor(2, 'Neurology'), doctor(3, 'Cardiology')]
+    fetch_rows, _ = fake_fetch(rows, [])
+    result = run_search(None, 'doctors', {'q': 'dr', 'limit': '1', 'specialization': 'Cardiology'}, fetch_rows,
+                        facet_candidates=3)
+    assert [row['id'] for row in result['results']] == [1]
+    assert result['facets'] == {'specialization': {'Cardiology': 2, 'Neurology': 1}}
+    assert result['facets_truncated']
@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+
+from serializers import (FIELD_DATE, FIELD_DATETIME, FIELD_NEWDECIMAL, FIELD_TIME, convert_row, convert_rows,
+                         dumps_bytes, format_timedelta, row_converter)
+
+# (name, type_code) pairs are all row_converter reads from a cursor description
+DESCRIPTION = [('id', 3), ('appointment_date', FIELD_DATE), ('appointment_time', FIELD_TIME),
+               ('created_at', FIELD_DATETIME), ('fee', FIELD_NEWDECIMAL)]
+
+
+class FakeCursor:
+    description = DESCRIPTION
+
+
+@pytest.mark.parametrize('value, text', [(timedelta(hours=9, minutes=30), '09:30:00'),
+                                         (timedelta(hours=26, seconds=5), '26:00:05'),
+                                         (timedelta(0), '00:00:00')])
+def test_format_timedelta(value, text):
+    assert format_timedelta(value) == text
+
+
+def test_row_converter_touches_only_typed_columns():
+    row = {'id': 7, 'appointment_date': date(2025, 3, 1), 'appointment_time': timedelta(hours=10),
+           'created_at': datetime(2025, 2, 1, 8, 15), 'fee': Decimal('12.50')}
+    assert row_converter(DESCRIPTION)(row) == {'id': 7, 'appointment_date': '2025-03-01',
+                                               'appointment_time': '10:00:00',
+                                               'created_at': '2025-02-01T08:15:00', 'fee': '12.50'}
+
+
+def test_row_converter_keeps_nulls_and_accepts_time_values():
+    convert = row_converter(DESCRIPTION)
+    row = convert({'id': 1, 'appointment_date': None, 'appointment_time': time(14, 5),
+                   'created_at': None, 'fee': None})
+    assert row == {'id': 1, 'appointment_date': None, 'appointment_time': '14:05:00', 'created_at': None,
+                   'fee': None}
+
+
+def test_untyped_result_sets_pass_through():
+    row = {'id': 1}
+    assert row_converter([('id', 3)])(row) is row
+    assert row_converter(None)(row) is row
+
+
+def test_convert_helpers():
+    assert convert_row(FakeCursor(), None) is None
+    rows = convert_rows(FakeCursor(), [{'id': i, 'appointment_date': date(2025, 1, i), 'appointment_time': None,
+                                        'created_at': None, 'fee': None} for i in (1, 2)])
+    assert [row['appointment_date'] for row in rows] == ['2025-01-01', '2025-01-02']
+
+
+def test_dumps_bytes_encodes_unconverted_values():
+    payload = {'at': datetime(2025, 3, 1, 9), 'time': timedelta(hours=9), 'fee': Decimal('1.10')}
+    assert json.loads(dumps_bytes(payload)) == {'at': '2025-03-01T09:00:00', 'time': '09:00:00', 'fee': '1.10'}
+    with pytest.raises(TypeError):
+        dumps_bytes({'x': object()})
@@ -0,0 +1,87 @@
+import pytest
+
+from cache import LRUCache
+from tokens import TokenError, TokenSigner, parse_key_ring
+
+
+def signer(**kwargs):
+    kwargs.setdefault('revoked', LRUCache(maxsize=100, ttl=60))
+    return TokenSigner({'k1': 'secret-one', 'k2': 'secret-two'}, 'k1', **kwargs)
+
+
+def test_issue_and_verify():
+    tokens = signer()
+    token, claims = tokens.issue(7, 'alice', 'patient')
+    verified = tokens.verify(token)
+    assert verified == claims
+    assert (verified['sub'], verified['usr'], verified['role']) == (7, 'alice', 'patient')
+
+
+def test_tampered_payload_is_rejected():
+    tokens = signer()
+    token, _ = tokens.issue(7, 'alice', 'patient')
+    other, _ = tokens.issue(1, 'root', 'admin')
+    kid, _, signature = token.split('.')
+    forged = f"{kid}.{other.split('.')[1]}.{signature}"
+    with pytest.raises(TokenError, match='Bad signature'):
+        tokens.verify(forged)
+
+
+@pytest.mark.parametrize('token', ['', 'abc', 'a.b.c.d', None])
+def test_malformed_tokens(token):
+    with pytest.raises(TokenError):
+        signer().verify(token)
+
+
+def test_expired_token():
+    tokens = signer(ttl=-60, leeway=0)
+    token, _ = tokens.issue(7, 'alice', 'patient')
+    with pytest.raises(TokenError, match='expired'):
+        tokens.verify(token)
+
+
+def test_revoked_token():
+    tokens = signer()
+    token, claims = tokens.issue(7, 'alice', 'patient')
+    tokens.revoke(claims)
+    with pytest.raises(TokenError, match='revoked'):
+        tokens.verify(token)
+
+
+def test_rotation_keeps_old_tokens_valid_until_the_key_is_dropped():
+    old = signer()
+    token, _ = old.issue(7, 'alice', 'patient')
+    rotated = TokenSigner({'k1': 'secret-one', 'k2': 'secret-two'}, 'k2')
+    assert rotated.verify(token)['sub'] == 7
+    assert rotated.issue(7, 'alice', 'patient')[0].startswith('k2.')
+    dropped = TokenSigner({'k2': 'secret-two'}, 'k2')
+    with pytest.raises(TokenError, match='Unknown signing key'):
+        dropped.verify(token)
+
+
+def test_current_key_must_exist():
+    with pytest.raises(ValueError):
+        TokenSigner({'k1': 'secret'}, 'k2')
+
+
+def test_stats_count_outcomes():
+    tokens = signer()
+    token, _ = tokens.issue(7, 'alice', 'patient')
+    tokens.verify(token)
+    with pytest.raises(TokenError):
+        tokens.verify('bad')
+    stats = tokens.stats()
+    assert (stats['issued'], stats['verified'], stats['rejected']) == (1, 1, 1)
+
+
+def test_parse_key_ring():
+    keys, current = parse_key_ring('2026-2:' + 'b' * 32 + ', 2026-1:' + 'a' * 32)
+    assert current == '2026-2'
+    assert keys == {'2026-2': 'b' * 32, '2026-1': 'a' * 32}
+    assert parse_key_ring('') == ({}, None)
+
+
+@pytest.mark.parametrize('text', ['no-separator', ':' + 'a' * 32, 'k1:short'])
+def test_parse_key_ring_rejects_bad_entries(text):
+    with pytest.raises(ValueError):
+        parse_key_ring(text)
@@ -0,0 +1,94 @@
+import pytest
+
+from db import AUTOCOMMIT, READ_ONLY, READ_WRITE, UnitOfWork
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql):
+        self.log.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, autocommit=False, fail_commit=False):
+        self._autocommit = autocommit
+        self.fail_commit = fail_commit
+        self.log = []
+
+    def get_autocommit(self):
+        return self._autocommit
+
+    def autocommit(self, value):
+        self._autocommit = value
+        self.log.append(f'autocommit={int(value)}')
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append('COMMIT')
+        if self.fail_commit:
+            raise RuntimeError('lost connection')
+
+    def rollback(self):
+        self.log.append('ROLLBACK')
+
+
+def test_read_write_commits_on_success():
+    conn = FakeConnection()
+    uow = UnitOfWork(READ_WRITE)
+    uow.begin(conn)
+    assert uow.active
+    assert uow.end(True) >= 0
+    assert conn.log == ['COMMIT']
+    assert uow.outcome == 'commit' and not uow.active
+
+
+def test_read_write_rolls_back_on_failure():
+    conn = FakeConnection()
+    uow = UnitOfWork()
+    uow.begin(conn)
+    uow.end(False)
+    assert conn.log == ['ROLLBACK']
+    assert uow.outcome == 'rollback'
+
+
+def test_failed_commit_rolls_back_and_raises():
+    conn = FakeConnection(fail_commit=True)
+    uow = UnitOfWork(READ_WRITE)
+    uow.begin(conn)
+    with pytest.raises(RuntimeError):
+        uow.end(True)
+    assert conn.log == ['COMMIT', 'ROLLBACK']
+    assert uow.outcome == 'rollback'
+
+
+def test_read_only_starts_a_read_only_transaction():
+    conn = FakeConnection()
+    uow = UnitOfWork(READ_ONLY)
+    uow.begin(conn)
+    uow.end(True)
+    assert conn.log == ['START TRANSACTION READ ONLY', 'COMMIT']
+
+
+def test_autocommit_switches_the_session_only_when_needed():
+    conn = FakeConnection()
+    uow = UnitOfWork(AUTOCOMMIT)
+    uow.begin(conn)
+    uow.end(True)
+    UnitOfWork(AUTOCOMMIT).begin(conn)
+    assert conn.log == ['autocommit=1']
+    assert uow.outcome == 'autocommit'
+
+    UnitOfWork(READ_WRITE).begin(conn)
+    assert conn.log[-1] == 'autocommit=0'
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        UnitOfWork('SERIALIZABLE')
@@ -0,0 +1,124 @@
+"""Compact signed access tokens: verified with one HMAC, no database lookup.
+
+A token is `<key id>.<payload>.<signature>`, where the payload is
+base64url JSON claims (sub, usr, role, iat, exp, jti) and the signature is
+base64url HMAC-SHA256 over `<key id>.<payload>`. New tokens are signed
+with the current key; any key still listed verifies, so keys rotate by
+adding a new one, making it current, and dropping the old one once its
+tokens have expired. Logout puts the token id in a revocation cache that
+only has to remember it until the token would expire anyway.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+
+class TokenError(ValueError):
+    """The token is malformed, badly signed, expired or revoked"""
+
+
+def parse_key_ring(text):
+    """({key id: secret}, current key id) from '<key id>:<secret>[,<key id>:<secret>...]', current first.
+
+    An empty `text` gives ({}, None); a malformed entry raises ValueError.
+    """
+    keys = {}
+    for entry in filter(None, (part.strip() for part in text.split(','))):
+        kid, sep, secret = entry.partition(':')
+        if not sep or not kid or len(secret) < 16:
+            raise ValueError(f'Token key {kid!r} must be written <key id>:<secret of at least 16 characters>')
+        keys[kid] = secret
+    return keys, next(iter(keys), None)
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class TokenSigner:
+    def __init__(self, keys, current, ttl=3600, revoked=None, leeway=30):
+        if current not in keys:
+            raise ValueError(f'Current token key {current!r} is not in the key set')
+        self.keys = {kid: secret.encode() if isinstance(secret, str) else secret for kid, secret in keys.items()}
+        self.current = current
+        self.ttl = ttl
+        self.leeway = leeway
+        # Anything with get/set (LRUCache or RedisCache); its TTL should be at least `ttl`
+        self.revoked = revoked
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+        self.verify_seconds = 0.0
+
+    def _sign(self, kid, signing_input):
+        return _b64encode(hmac.new(self.keys[kid], signing_input.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id, username, role):
+        now = int(time.time())
+        claims = {'sub': user_id, 'usr': username, 'role': role, 'iat': now, 'exp': now + self.ttl,
+                  'jti': _b64encode(os.urandom(12))}
+        signing_input = f'{self.current}.{_b64encode(json.dumps(claims, separators=(",", ":")).encode())}'
+        with self._lock:
+            self.issued += 1
+        return f'{signing_input}.{self._sign(self.current, signing_input)}', claims
+
+    def verify(self, token):
+        """Claims of a valid token; TokenError otherwise"""
+        start = time.perf_counter()
+        try:
+            claims = self._verify(token)
+        except TokenError:
+            with self._lock:
+                self.rejected += 1
+                self.verify_seconds += time.perf_counter() - start
+            raise
+        with self._lock:
+            self.verified += 1
+            self.verify_seconds += time.perf_counter() - start
+        return claims
+
+    def _verify(self, token):
+        try:
+            signing_input, signature = token.rsplit('.', 1)
+            kid, payload = signing_input.split('.')
+        except (AttributeError, ValueError):
+            raise TokenError('Malformed token')
+        if kid not in self.keys:
+            raise TokenError('Unknown signing key')
+        if not hmac.compare_digest(signature, self._sign(kid, signing_input)):
+            raise TokenError('Bad signature')
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise TokenError('Malformed token')
+        if claims.get('exp', 0) + self.leeway < time.time():
+            raise TokenError('Token expired')
+        if self.revoked is not None and self.revoked.get(f'revoked:{claims.get("jti")}'):
+            raise TokenError('Token revoked')
+        return claims
+
+    def revoke(self, claims):
+        if self.revoked is not None:
+            self.revoked.set(f'revoked:{claims["jti"]}', True)
+
+    def stats(self):
+        with self._lock:
+            checked = self.verified + self.rejected
+            return {
+                'current_key': self.current,
+                'keys': sorted(self.keys),
+                'ttl': self.ttl,
+                'issued': self.issued,
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'avg_verify_us': round(self.verify_seconds / checked * 1e6, 2) if checked else None,
+            }
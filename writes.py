@@ -0,0 +1,77 @@
+"""Primary-key writes that answer "not found" without a separate existence check.
+
+A SELECT before an UPDATE/DELETE by id only adds a round-trip and a
+window in which the row can change. Plain writes go by the rowcount
+(connections must be opened with CLIENT.FOUND_ROWS so an UPDATE that
+leaves the values unchanged still counts its row as matched).
+
+Where the old values are needed afterwards (appointment slots, the
+dashboard and the audit trail), `execute_batch` sends a locking read and
+the write as one multi-statement round-trip.
+"""
+import MySQLdb
+
+from identity import ROLE_TABLES, RELEASE_USERNAME
+
+# MySQL error code for deleting a row that a foreign key still references
+ER_ROW_IS_REFERENCED = 1451
+
+# An appointment as it was before the write, locked until the write commits
+LOCK_APPOINTMENT = '''SELECT id, patient_id, doctor_id, appointment_date, appointment_time, symptoms, status
+                      FROM appointments WHERE id = %s FOR UPDATE'''
+
+
+def is_referenced(error):
+    return isinstance(error, MySQLdb.IntegrityError) and error.args and error.args[0] == ER_ROW_IS_REFERENCED
+
+
+def execute_batch(cursor, statements):
+    """Run [(sql, params)] in one round-trip; returns [(rows, rowcount)] per statement"""
+    cursor.execute('; '.join(sql for sql, _ in statements), [value for _, params in statements for value in params])
+    results = []
+    while True:
+        rows = cursor.fetchall() if cursor.description else ()
+        results.append((rows, cursor.rowcount))
+        if not cursor.nextset():
+            return results
+
+
+def update_by_id(cursor, table, row_id, data, allowed_fields):
+    """UPDATE the allowed fields present in `data`, reading their old values in the same round-trip.
+
+    Returns (fields, old): `fields` is empty when `data` has none of them
+    (nothing is sent), `old` is None when there is no such row.
+    """
+    fields = [field for field in allowed_fields if field in data]
+    if not fields:
+        return fields, None
+    (rows, _), _ = execute_batch(cursor, [
+        (f"SELECT {', '.join(fields)} FROM {table} WHERE id = %s FOR UPDATE", (row_id,)),
+        (f"UPDATE {table} SET {', '.join(f'{field} = %s' for field in fields)} WHERE id = %s",
+         [data[field] for field in fields] + [row_id]),
+    ])
+    return fields, rows[0] if rows else None
+
+
+def delete_account(cursor, role, user_id):
+    """Delete an admin/doctor/patient and free its username in one round-trip.
+
+    Returns the deleted row (None if there was none); raises IntegrityError
+    (see is_referenced) while appointments still point at the row.
+    """
+    table = ROLE_TABLES[role]
+    (rows, _), _, _ = execute_batch(cursor, [
+        (f'SELECT * FROM {table} WHERE id = %s FOR UPDATE', (user_id,)),
+        (f'DELETE FROM {table} WHERE id = %s', (user_id,)),
+        (RELEASE_USERNAME, (role, user_id)),
+    ])
+    return rows[0] if rows else None
+
+
+def write_appointment(cursor, appointment_id, sql, params):
+    """Run `sql` against one appointment, returning its previous row (None if missing)"""
+    (rows, _), _ = execute_batch(cursor, [
+        (LOCK_APPOINTMENT, (appointment_id,)),
+        (sql, params),
+    ])
+    return rows[0] if rows else None